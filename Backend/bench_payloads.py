@@ -0,0 +1,190 @@
+"""
+Offline benchmark for the large payload endpoints.
+Builds synthetic responses shaped like /history/questions/answered and
+/history/sessions/available and measures serialization CPU per request and
+the bytes sent on the wire with and without compression, plus the CPU per
+1,000 rows of building list responses model by model versus in bulk.
+
+Usage:
+    python bench_payloads.py [rows] [iterations]
+"""
+
+import asyncio
+import sys
+import time
+import uuid
+import zlib
+from typing import Callable, Dict, List, Type
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import BaseModel
+
+from bulk_models import validate_rows, model_response
+from models import (
+    AnsweredQuestionStats, AnsweredQuestionsHistoryResponse,
+    Session, Lesson, AvailableSessionsResponse,
+    PassedSession, PassedSessionsResponse
+)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def build_answered_questions(rows: int) -> AnsweredQuestionsHistoryResponse:
+    """Build an answered questions response with realistic Spanish text lengths."""
+    questions = []
+    for i in range(rows):
+        questions.append(AnsweredQuestionStats(
+            id=str(uuid.uuid4()),
+            concept_id=str(uuid.uuid4()),
+            text=f"¿Cuál es el plazo máximo de detención preventiva según el artículo {i} de la Constitución?",
+            option_a="Setenta y dos horas",
+            option_b="Cuarenta y ocho horas",
+            option_c="Veinticuatro horas",
+            correct_option="a",
+            explanation="La detención preventiva no podrá durar más del tiempo estrictamente necesario "
+                        "para la realización de las averiguaciones tendentes al esclarecimiento de los hechos.",
+            difficulty=(i % 10) + 1,
+            source="Constitución Española",
+            total_attempts=(i % 7) + 1,
+            correct_answers=i % 5
+        ))
+    return AnsweredQuestionsHistoryResponse(answered_questions=questions)
+
+
+def build_available_sessions(rows: int) -> AvailableSessionsResponse:
+    """Build an available sessions response with one lesson per ten sessions."""
+    lessons = []
+    sessions = []
+    for i in range(rows):
+        if i % 10 == 0:
+            lessons.append(Lesson(
+                id=str(uuid.uuid4()),
+                name=f"Lección {len(lessons) + 1}",
+                order=len(lessons) + 1,
+                xp_reward=50,
+                status="active"
+            ))
+        sessions.append(Session(
+            id=str(uuid.uuid4()),
+            name=f"Sesión {i + 1}",
+            lesson_id=lessons[-1].id,
+            number_of_questions=10,
+            order=(i % 10) + 1,
+            question_selection_strategy="random_not_repeated",
+            concept_id=str(uuid.uuid4()),
+            min_difficulty=1,
+            max_difficulty=10
+        ))
+    return AvailableSessionsResponse(
+        sessions=sessions,
+        lessons=lessons,
+        passed_session_ids=[s.id for s in sessions[:-1]]
+    )
+
+
+def time_per_call(fn: Callable[[], object], iterations: int) -> float:
+    """Return the mean CPU time of fn in milliseconds."""
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations * 1000
+
+
+def bench(name: str, model, iterations: int) -> Dict[str, float]:
+    content = jsonable_encoder(model)
+
+    std_ms = time_per_call(lambda: JSONResponse(content), iterations)
+    orjson_ms = time_per_call(lambda: ORJSONResponse(content), iterations)
+
+    raw = ORJSONResponse(content).body
+    gzip_body = zlib.compress(raw, 6, wbits=31)
+    gzip_ms = time_per_call(lambda: zlib.compress(raw, 6, wbits=31), iterations)
+
+    results = {
+        "json_ms": std_ms,
+        "orjson_ms": orjson_ms,
+        "raw_bytes": len(raw),
+        "gzip_bytes": len(gzip_body),
+        "gzip_ms": gzip_ms,
+    }
+    if brotli is not None:
+        results["br_bytes"] = len(brotli.compress(raw, quality=4))
+        results["br_ms"] = time_per_call(lambda: brotli.compress(raw, quality=4), iterations)
+
+    print(f"\n{name}")
+    print("-" * 60)
+    print(f"{'json.dumps render':<28} {std_ms:>10.3f} ms/request")
+    print(f"{'orjson render':<28} {orjson_ms:>10.3f} ms/request "
+          f"({(1 - orjson_ms / std_ms) * 100:.0f}% less CPU)")
+    print(f"{'uncompressed':<28} {len(raw):>10} bytes")
+    print(f"{'gzip (level 6)':<28} {len(gzip_body):>10} bytes "
+          f"({(1 - len(gzip_body) / len(raw)) * 100:.0f}% smaller, +{gzip_ms:.3f} ms)")
+    if brotli is not None:
+        print(f"{'brotli (quality 4)':<28} {results['br_bytes']:>10} bytes "
+              f"({(1 - results['br_bytes'] / len(raw)) * 100:.0f}% smaller, +{results['br_ms']:.3f} ms)")
+    return results
+
+
+def bench_construction(
+    name: str,
+    response_model: Type[BaseModel],
+    list_field: str,
+    item_model: Type[BaseModel],
+    rows: List[Dict],
+    iterations: int
+) -> Dict[str, float]:
+    """
+    Compare building a list response row by row and letting FastAPI serialize it
+    through response_model against bulk validation with a pre-serialized response.
+    """
+    loop = asyncio.new_event_loop()
+    response_field = create_response_field(name=f"Response_{response_model.__name__}", type_=response_model)
+
+    def per_row():
+        model = response_model(**{list_field: [item_model(**row) for row in rows]})
+        # What FastAPI does with a returned model: dump, re-validate, encode
+        content = loop.run_until_complete(serialize_response(field=response_field, response_content=model))
+        ORJSONResponse(content)
+
+    def bulk():
+        model_response(response_model(**{list_field: validate_rows(item_model, rows)}))
+
+    per_row_ms = time_per_call(per_row, iterations) / len(rows) * 1000
+    bulk_ms = time_per_call(bulk, iterations) / len(rows) * 1000
+    loop.close()
+
+    print(f"\n{name} (model construction + response)")
+    print("-" * 60)
+    print(f"{'per-row + response_model':<28} {per_row_ms:>10.3f} ms/1000 rows")
+    print(f"{'bulk TypeAdapter':<28} {bulk_ms:>10.3f} ms/1000 rows "
+          f"({(1 - bulk_ms / per_row_ms) * 100:.0f}% less CPU)")
+    return {"per_row_ms_per_1000": per_row_ms, "bulk_ms_per_1000": bulk_ms}
+
+
+def main(rows: int = 2000, iterations: int = 50) -> List[Dict[str, float]]:
+    print(f"Payload benchmark: {rows} rows, {iterations} iterations")
+    answered = build_answered_questions(rows)
+    available = build_available_sessions(rows)
+    return [
+        bench("/history/questions/answered", answered, iterations),
+        bench("/history/sessions/available", available, iterations),
+        bench_construction(
+            "/history/questions/answered", AnsweredQuestionsHistoryResponse, "answered_questions",
+            AnsweredQuestionStats, answered.model_dump()["answered_questions"], iterations
+        ),
+        bench_construction(
+            "/history/sessions/passed", PassedSessionsResponse, "sessions",
+            PassedSession, available.model_dump()["sessions"], iterations
+        ),
+    ]
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
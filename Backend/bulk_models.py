@@ -0,0 +1,52 @@
+"""
+Bulk model construction for large list responses.
+Rows coming from the database are validated once per list with a cached
+TypeAdapter instead of one model constructor call per row, and the finished
+response model is serialized straight to JSON bytes so FastAPI does not dump
+and re-validate it a second time through response_model.
+"""
+
+from functools import lru_cache
+from typing import Dict, Iterable, List, Type, TypeVar
+
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """Return the (cached) TypeAdapter validating a list of model."""
+    return TypeAdapter(List[model])
+
+
+def validate_rows(model: Type[ModelT], rows: Iterable[Dict]) -> List[ModelT]:
+    """
+    Validate a list of database rows into models in a single pydantic-core call.
+
+    Args:
+        model: Pydantic model class of each row
+        rows: Row dictionaries as returned by PostgREST
+
+    Returns:
+        List of model instances
+    """
+    if not isinstance(rows, list):
+        rows = list(rows)
+    return list_adapter(model).validate_python(rows)
+
+
+def model_response(model: BaseModel, status_code: int = 200) -> Response:
+    """
+    Serialize an already validated response model to a JSON response.
+
+    Returning a Response from an endpoint bypasses FastAPI's response_model
+    serialization, which would otherwise dump the model to a dict, validate
+    it again and encode it. Keep response_model on the route for the docs.
+    """
+    return Response(
+        content=model.model_dump_json(),
+        status_code=status_code,
+        media_type="application/json"
+    )
@@ -0,0 +1,400 @@
+"""
+Challenge engine for challenge_templates.
+Question pools for challenges are built from a per-user index of answered
+questions (attempts and correct answers per question), loaded once from the
+aggregated stats RPC and kept current as the user answers, so starting a challenge
+never scans user_questions_history. Running challenges are held in memory with the
+questions they served, their deadline and their answers.
+
+Challenge availability is decided in memory: each template's unlock_criteria is
+compiled once per template version into a predicate, and all templates are evaluated
+in one pass against the user's user_gamification_stats row and cached last attempts.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from supabase import Client
+
+from etags import get_catalog_version
+from pool_algorithms import select_random, select_random_not_repeated, select_error_review
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Users whose answered-question index and last attempts are kept in memory, and how
+# long they are trusted before a reload picks up what other workers recorded
+CHALLENGE_USER_CACHE_MAX_USERS = 10_000
+CHALLENGE_USER_CACHE_TTL_SECONDS = 600
+ANSWERED_INDEX_PAGE_SIZE = 1000
+
+# Answers are accepted this long past time_limit, to absorb network latency
+CHALLENGE_TIME_GRACE_SECONDS = 2
+# Runs older than this are dropped from memory
+CHALLENGE_RUN_MAX_AGE_SECONDS = 24 * 3600
+
+# review_weak_topics: questions answered correctly less often than this
+WEAK_QUESTION_ACCURACY = 0.5
+# A finished challenge is passed with at least this share of correct answers
+CHALLENGE_PASS_RATIO = 0.5
+
+# unlock_criteria keys are min_<name> or max_<name>, with name one of these
+# user_gamification_stats values
+CRITERIA_FIELDS: Dict[str, Callable[[Dict], float]] = {
+    "level": lambda stats: stats.get("current_level") or 1,
+    "xp": lambda stats: stats.get("total_xp") or 0,
+    "lessons_completed": lambda stats: stats.get("total_lessons_completed") or 0,
+    "sessions_completed": lambda stats: stats.get("total_sessions_completed") or 0,
+    "questions_answered": lambda stats: stats.get("total_questions_answered") or 0,
+    "correct_answers": lambda stats: stats.get("total_correct_answers") or 0,
+    "streak": lambda stats: stats.get("current_streak") or 0,
+    "longest_streak": lambda stats: stats.get("longest_streak") or 0,
+    "accuracy": lambda stats: (stats.get("total_correct_answers") or 0) / max(1, stats.get("total_questions_answered") or 0),
+}
+
+STATS_COLUMNS = (
+    "total_xp, current_level, current_streak, longest_streak, total_lessons_completed, "
+    "total_sessions_completed, total_questions_answered, total_correct_answers"
+)
+
+TEMPLATE_COLUMNS = (
+    "id, name, challenge_type, description, icon_url, time_limit, number_of_questions, "
+    "question_selection_algorithm, scoring_formula, xp_multiplier, unlock_criteria, "
+    "cooldown_period, updated_at"
+)
+
+
+@dataclass
+class QuestionStats:
+    attempts: int = 0
+    correct: int = 0
+
+    @property
+    def wrong(self) -> int:
+        return self.attempts - self.correct
+
+
+class AnsweredIndex:
+    """Per-user answered question stats, LRU-bounded."""
+
+    def __init__(self):
+        self._users: "OrderedDict[str, Tuple[Dict[str, QuestionStats], float]]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    @traced("AnsweredIndex.get")
+    async def get(self, supabase: Client, token: str, user_id: str) -> Dict[str, QuestionStats]:
+        """Return question_id -> stats for every question the user answered."""
+        cached = self._users.get(user_id)
+        if cached and time.monotonic() - cached[1] < CHALLENGE_USER_CACHE_TTL_SECONDS:
+            self._users.move_to_end(user_id)
+            return cached[0]
+
+        async with self._lock:
+            cached = self._users.get(user_id)
+            if cached and time.monotonic() - cached[1] < CHALLENGE_USER_CACHE_TTL_SECONDS:
+                return cached[0]
+            stats = self._load(supabase, token, user_id)
+            self._users[user_id] = (stats, time.monotonic())
+            self._users.move_to_end(user_id)
+            while len(self._users) > CHALLENGE_USER_CACHE_MAX_USERS:
+                self._users.popitem(last=False)
+            return stats
+
+    def _load(self, supabase: Client, token: str, user_id: str) -> Dict[str, QuestionStats]:
+        stats: Dict[str, QuestionStats] = {}
+        after = None
+        while True:
+            page = supabase.postgrest.auth(token).rpc("get_answered_questions_stats_page", {
+                "p_user_id": user_id,
+                "p_after_question_id": after,
+                "p_limit": ANSWERED_INDEX_PAGE_SIZE
+            }).execute().data or []
+            for record in page:
+                stats[record["question_id"]] = QuestionStats(record["total_attempts"], record["correct_answers"])
+            if len(page) < ANSWERED_INDEX_PAGE_SIZE:
+                return stats
+            after = page[-1]["question_id"]
+
+    def record(self, user_id: str, question_id: str, correct: bool) -> None:
+        """Count a new answer, if the user's index is loaded in this process."""
+        cached = self._users.get(user_id)
+        if cached is None:
+            return
+        entry = cached[0].setdefault(question_id, QuestionStats())
+        entry.attempts += 1
+        entry.correct += int(correct)
+
+
+# Eligible pool of each challenge type, from the user's answered-question stats
+CHALLENGE_POOLS: Dict[str, Callable[[Dict[str, QuestionStats]], List[str]]] = {
+    "lightning_round": lambda stats: list(stats),
+    "speed_run": lambda stats: list(stats),
+    "accuracy_challenge": lambda stats: list(stats),
+    "spaced_repetition_review": lambda stats: list(stats),
+    "review_mistakes": lambda stats: [q for q, s in stats.items() if s.wrong > 0],
+    "review_weak_topics": lambda stats: [
+        q for q, s in stats.items() if s.attempts and s.correct / s.attempts < WEAK_QUESTION_ACCURACY
+    ],
+}
+
+
+def eligible_pool(challenge_type: str, stats: Dict[str, QuestionStats]) -> List[str]:
+    """Question ids a challenge of this type may ask the user."""
+    return CHALLENGE_POOLS.get(challenge_type, CHALLENGE_POOLS["lightning_round"])(stats)
+
+
+def select_challenge_questions(
+    template: Dict,
+    stats: Dict[str, QuestionStats],
+    recently_served: List[str]
+) -> List[str]:
+    """
+    Pick the template's number_of_questions with its question_selection_algorithm.
+
+    random_not_repeated treats the questions served in the user's previous run of the
+    template as already answered, so consecutive runs overlap as little as possible.
+    """
+    pool = eligible_pool(template["challenge_type"], stats)
+    n = template["number_of_questions"]
+    algorithm = template["question_selection_algorithm"]
+
+    if algorithm == "random_not_repeated":
+        return select_random_not_repeated(n, pool, recently_served)
+    if algorithm == "error_review":
+        return select_error_review(n, [(q, stats[q].correct, stats[q].wrong) for q in pool])
+    if algorithm != "random":
+        logger.warning("Unknown challenge algorithm %r, defaulting to random", algorithm)
+    return select_random(n, pool)
+
+
+# Returns the unmet criteria keys of a user_gamification_stats row, empty when unlocked
+UnlockPredicate = Callable[[Dict], List[str]]
+
+
+def compile_unlock_criteria(criteria: Any) -> UnlockPredicate:
+    """
+    Compile a template's unlock_criteria into a predicate over user_gamification_stats.
+
+    Unknown keys and non-numeric bounds can never be met, so a typo in the dashboard
+    locks the challenge instead of opening it to everyone.
+    """
+    if isinstance(criteria, str):
+        criteria = json.loads(criteria)
+    if not criteria:
+        return lambda stats: []
+
+    checks: List[Tuple[str, Callable[[Dict], float], bool, float]] = []
+    invalid: List[str] = []
+    for key, bound in criteria.items():
+        kind, _, name = key.partition("_")
+        getter = CRITERIA_FIELDS.get(name)
+        if kind not in ("min", "max") or getter is None or isinstance(bound, bool) or not isinstance(bound, (int, float)):
+            invalid.append(key)
+            continue
+        checks.append((key, getter, kind == "min", bound))
+    if invalid:
+        logger.warning("Unsupported unlock_criteria %s, the challenge stays locked", invalid)
+
+    def predicate(stats: Dict) -> List[str]:
+        unmet = list(invalid)
+        for key, getter, at_least, bound in checks:
+            value = getter(stats)
+            if value < bound if at_least else value > bound:
+                unmet.append(key)
+        return unmet
+
+    return predicate
+
+
+@dataclass
+class ChallengeAvailability:
+    unmet_criteria: List[str]
+    # End of the cooldown after the last attempt, None when not cooling down
+    available_at: Optional[datetime]
+
+    @property
+    def unlocked(self) -> bool:
+        return not self.unmet_criteria
+
+    @property
+    def available(self) -> bool:
+        return self.unlocked and self.available_at is None
+
+
+def parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+class ChallengeTemplates:
+    """Active challenge templates, reloaded when the table's catalog version changes."""
+
+    def __init__(self):
+        self._version: Optional[str] = None
+        self._templates: Dict[str, Dict] = {}
+        # template_id -> (updated_at, compiled unlock_criteria)
+        self._predicates: Dict[str, Tuple[str, UnlockPredicate]] = {}
+
+    async def all(self, supabase: Client, token: str) -> Dict[str, Dict]:
+        version = await get_catalog_version(supabase, token, "challenge_templates")
+        if version != self._version:
+            rows = supabase.postgrest.auth(token).from_("challenge_templates")\
+                .select(TEMPLATE_COLUMNS)\
+                .eq("active", True)\
+                .order("name")\
+                .execute().data or []
+            self._templates = {row["id"]: row for row in rows}
+            # Recompile only the templates edited since the last load
+            self._predicates = {
+                row["id"]: cached if (cached := self._predicates.get(row["id"])) and cached[0] == row["updated_at"]
+                else (row["updated_at"], compile_unlock_criteria(row.get("unlock_criteria")))
+                for row in rows
+            }
+            self._version = version
+        return self._templates
+
+    def evaluate(
+        self,
+        stats: Dict,
+        last_attempts: Dict[str, datetime],
+        now: datetime
+    ) -> Dict[str, ChallengeAvailability]:
+        """Availability of every loaded template for one user, in a single pass."""
+        availability = {}
+        for template_id, template in self._templates.items():
+            available_at = None
+            last_attempt = last_attempts.get(template_id)
+            if last_attempt is not None and template.get("cooldown_period"):
+                cooldown_end = last_attempt + timedelta(hours=template["cooldown_period"])
+                available_at = cooldown_end if cooldown_end > now else None
+            availability[template_id] = ChallengeAvailability(self._predicates[template_id][1](stats), available_at)
+        return availability
+
+    async def get(self, supabase: Client, token: str, template_id: str) -> Optional[Dict]:
+        return (await self.all(supabase, token)).get(template_id)
+
+
+class LastAttempts:
+    """Per-user latest challenge start per template, LRU-bounded, for cooldowns."""
+
+    def __init__(self):
+        self._users: "OrderedDict[str, Tuple[Dict[str, datetime], float]]" = OrderedDict()
+
+    @traced("LastAttempts.get")
+    async def get(self, supabase: Client, token: str, user_id: str) -> Dict[str, datetime]:
+        cached = self._users.get(user_id)
+        if cached and time.monotonic() - cached[1] < CHALLENGE_USER_CACHE_TTL_SECONDS:
+            self._users.move_to_end(user_id)
+            return cached[0]
+
+        rows = supabase.postgrest.auth(token).rpc("get_last_challenge_attempts", {
+            "p_user_id": user_id
+        }).execute().data or []
+        attempts = {row["challenge_template_id"]: parse_timestamp(row["last_started_at"]) for row in rows}
+        self._users[user_id] = (attempts, time.monotonic())
+        self._users.move_to_end(user_id)
+        while len(self._users) > CHALLENGE_USER_CACHE_MAX_USERS:
+            self._users.popitem(last=False)
+        return attempts
+
+    def record(self, user_id: str, template_id: str, started_at: datetime) -> None:
+        cached = self._users.get(user_id)
+        if cached is not None:
+            cached[0][template_id] = started_at
+
+
+async def load_user_stats(supabase: Client, token: str, user_id: str) -> Dict:
+    """The user's user_gamification_stats row, empty when it does not exist yet."""
+    response = supabase.postgrest.auth(token).from_("user_gamification_stats")\
+        .select(STATS_COLUMNS)\
+        .eq("user_id", user_id)\
+        .execute()
+    return response.data[0] if response.data else {}
+
+
+@dataclass
+class ChallengeRun:
+    """A started challenge: its served questions, deadline and answers so far."""
+    history_id: str
+    user_id: str
+    template: Dict
+    started_at: datetime
+    # None when the run was restored from the database and the served set is unknown
+    question_ids: Optional[List[str]] = None
+    # Student view of the served questions, and question_id -> (correct_option, explanation)
+    questions: Optional[List[Dict]] = None
+    answer_keys: Dict[str, Tuple[str, Optional[str]]] = field(default_factory=dict)
+    # question_id -> correct
+    answers: Dict[str, bool] = field(default_factory=dict)
+    created: float = field(default_factory=time.monotonic)
+
+    @property
+    def deadline(self) -> Optional[datetime]:
+        time_limit = self.template.get("time_limit")
+        return self.started_at + timedelta(seconds=time_limit) if time_limit else None
+
+    def seconds_remaining(self, now: datetime) -> Optional[int]:
+        deadline = self.deadline
+        return None if deadline is None else max(0, int((deadline - now).total_seconds()))
+
+    def timed_out(self, now: datetime) -> bool:
+        deadline = self.deadline
+        return deadline is not None and now > deadline + timedelta(seconds=CHALLENGE_TIME_GRACE_SECONDS)
+
+    @property
+    def correct_answers(self) -> int:
+        return sum(self.answers.values())
+
+    @property
+    def number_of_questions(self) -> int:
+        if self.question_ids is not None:
+            return len(self.question_ids)
+        return self.template["number_of_questions"]
+
+    def passed(self) -> bool:
+        return self.correct_answers >= CHALLENGE_PASS_RATIO * self.number_of_questions
+
+
+class ChallengeRuns:
+    """In-memory registry of running challenges, plus the last served set per template."""
+
+    def __init__(self):
+        self._runs: Dict[str, ChallengeRun] = {}
+        self._last_served: Dict[Tuple[str, str], List[str]] = {}
+
+    def add(self, run: ChallengeRun) -> None:
+        self._expire()
+        self._runs[run.history_id] = run
+        if run.question_ids is not None:
+            self._last_served[(run.user_id, run.template["id"])] = run.question_ids
+
+    def get(self, history_id: str) -> Optional[ChallengeRun]:
+        return self._runs.get(history_id)
+
+    def pop(self, history_id: str) -> Optional[ChallengeRun]:
+        return self._runs.pop(history_id, None)
+
+    def pop_user(self, user_id: str) -> None:
+        """Forget every run of the user (they were abandoned by a new start)."""
+        for history_id in [h for h, run in self._runs.items() if run.user_id == user_id]:
+            del self._runs[history_id]
+
+    def last_served(self, user_id: str, template_id: str) -> List[str]:
+        return self._last_served.get((user_id, template_id), [])
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - CHALLENGE_RUN_MAX_AGE_SECONDS
+        for history_id in [h for h, run in self._runs.items() if run.created < cutoff]:
+            del self._runs[history_id]
+
+
+# Process-wide challenge state
+answered_index = AnsweredIndex()
+challenge_templates = ChallengeTemplates()
+challenge_runs = ChallengeRuns()
+last_attempts = LastAttempts()
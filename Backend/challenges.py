@@ -0,0 +1,509 @@
+"""
+Challenge router for the algorithmic challenges defined in challenge_templates
+(lightning rounds, mistake reviews, ...).
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Security
+from fastapi.security import HTTPAuthorizationCredentials
+from postgrest.types import ReturnMethod
+from supabase import Client
+from datetime import datetime, timezone
+import logging
+import uuid
+
+from config import get_supabase
+from models import (
+    ChallengeTemplate, ChallengeListResponse, StartChallengeRequest, StartChallengeResponse,
+    ChallengeQuestionsResponse, ChallengeAnswerRequest, ChallengeAnswerResponse,
+    FinishChallengeRequest, FinishChallengeResponse, LearningQuestion
+)
+from middleware import get_current_user, security
+from challenge_engine import (
+    ChallengeRun, answered_index, challenge_runs, challenge_templates, last_attempts,
+    load_user_stats, parse_timestamp, select_challenge_questions
+)
+from leaderboard import leaderboards
+from lives_service import LivesService
+from user_events import user_events
+from gamification_scheduler import gamification_scheduler
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/challenges", tags=["Challenges"])
+
+
+def _validate_uuid(value: str, field: str) -> None:
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {field} format"
+        )
+
+
+async def _get_run(
+    supabase: Client, token: str, user_id: str, history_id: str, check_status: bool = True
+) -> ChallengeRun:
+    """
+    Return the running challenge, restoring it from user_challenges_history when this
+    process did not start it. A restored run keeps its answers but not its served set
+    (see _load_questions). A cached run is still checked against the history row's
+    status, since another process may have abandoned or finished it, unless the
+    caller's own write is guarded on the status (check_status=False).
+    """
+    run = challenge_runs.get(history_id)
+    if run is not None and run.user_id == user_id:
+        if not check_status:
+            return run
+        status_response = supabase.postgrest.auth(token).from_("user_challenges_history")\
+            .select("status")\
+            .eq("id", history_id)\
+            .eq("user_id", user_id)\
+            .execute()
+        if status_response.data and status_response.data[0]["status"] == "started":
+            return run
+        challenge_runs.pop(history_id)
+        if not status_response.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Challenge history not found"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Challenge is already {status_response.data[0]['status']}"
+        )
+
+    history_response = supabase.postgrest.auth(token).from_("user_challenges_history")\
+        .select("id, challenge_template_id, started_at, status")\
+        .eq("id", history_id)\
+        .eq("user_id", user_id)\
+        .execute()
+    if not history_response.data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Challenge history not found"
+        )
+    row = history_response.data[0]
+    if row["status"] != "started":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Challenge is already {row['status']}"
+        )
+    template = await challenge_templates.get(supabase, token, row["challenge_template_id"])
+    if template is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Challenge not found"
+        )
+
+    answers_response = supabase.postgrest.auth(token).from_("user_questions_history")\
+        .select("question_id, correct")\
+        .eq("user_challenges_history_id", history_id)\
+        .execute()
+    run = ChallengeRun(
+        history_id=history_id,
+        user_id=user_id,
+        template=template,
+        started_at=parse_timestamp(row["started_at"]),
+        answers={a["question_id"]: a["correct"] for a in answers_response.data or []}
+    )
+    challenge_runs.add(run)
+    logger.info("Challenge run restored", extra={"history_id": history_id, "user_id": user_id, "answered": len(run.answers)})
+    return run
+
+
+async def _load_questions(supabase: Client, token: str, user_id: str, run: ChallengeRun) -> None:
+    """
+    Fill in the run's served questions and answer keys. A restored run first gets a
+    served set: the questions it already answered plus a fresh selection for the rest.
+    """
+    if run.question_ids is None:
+        stats = await answered_index.get(supabase, token, user_id)
+        remaining = max(0, run.template["number_of_questions"] - len(run.answers))
+        run.question_ids = list(run.answers) + [
+            qid for qid in select_challenge_questions(run.template, stats, list(run.answers))
+            if qid not in run.answers
+        ][:remaining]
+
+    questions_map = {}
+    if run.question_ids:
+        with span("challenge.fetch_questions", questions=len(run.question_ids)):
+            questions_response = supabase.postgrest.auth(token).from_("questions")\
+                .select("id, text, option_a, option_b, option_c, correct_option, explanation")\
+                .in_("id", run.question_ids)\
+                .execute()
+        questions_map = {q["id"]: q for q in questions_response.data}
+    run.questions = [
+        {"id": qid, "question": q["text"], "a": q["option_a"], "b": q["option_b"], "c": q["option_c"]}
+        for qid in run.question_ids if (q := questions_map.get(qid))
+    ]
+    run.answer_keys = {qid: (q["correct_option"], q.get("explanation")) for qid, q in questions_map.items()}
+
+
+@router.get("/list", response_model=ChallengeListResponse)
+async def list_challenges(
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    List the active challenge templates with the user's access to each.
+
+    unlock_criteria are evaluated against the user's gamification stats and
+    cooldown_period against the user's last attempt of each template, in memory:
+    the whole listing costs one stats read.
+    """
+    try:
+        token = credentials.credentials
+        user_id = current_user.id
+
+        templates = await challenge_templates.all(supabase, token)
+        stats = await load_user_stats(supabase, token, user_id)
+        attempts = await last_attempts.get(supabase, token, user_id)
+        availability = challenge_templates.evaluate(stats, attempts, datetime.now(timezone.utc))
+
+        return ChallengeListResponse(challenges=[
+            ChallengeTemplate(
+                **template,
+                unlocked=availability[template_id].unlocked,
+                unmet_criteria=availability[template_id].unmet_criteria,
+                available_at=availability[template_id].available_at
+            )
+            for template_id, template in templates.items()
+        ])
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error listing challenges: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to list challenges"
+        )
+
+
+@router.post("/start", response_model=StartChallengeResponse, status_code=status.HTTP_201_CREATED)
+async def start_challenge(
+    request: StartChallengeRequest,
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    Start a challenge.
+
+    Steps:
+    1. Check the template's unlock_criteria (403) and cooldown_period (409).
+    2. Build the user's eligible pool from the cached answered-question index.
+    3. Select the template's number_of_questions with its question_selection_algorithm.
+    4. Mark previous started challenges as abandoned and create the user_challenges_history row.
+    5. Return the row id and, for timed challenges, when the time limit runs out.
+    """
+    try:
+        _validate_uuid(request.challenge_template_id, "challenge_template_id")
+
+        token = credentials.credentials
+        user_id = current_user.id
+
+        template = await challenge_templates.get(supabase, token, request.challenge_template_id)
+        if template is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Challenge not found"
+            )
+
+        # Step 1: Check unlock_criteria and cooldown_period
+        stats = await load_user_stats(supabase, token, user_id)
+        attempts = await last_attempts.get(supabase, token, user_id)
+        availability = challenge_templates.evaluate(stats, attempts, datetime.now(timezone.utc))[template["id"]]
+        if not availability.unlocked:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Challenge locked, unmet criteria: {', '.join(availability.unmet_criteria)}"
+            )
+        if availability.available_at is not None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Challenge available again at {availability.available_at.isoformat()}"
+            )
+
+        # Step 2 & 3: Select from the answered-question index, no history scan
+        answered = await answered_index.get(supabase, token, user_id)
+        with span("challenge.select", challenge_type=template["challenge_type"]):
+            question_ids = select_challenge_questions(
+                template, answered, challenge_runs.last_served(user_id, template["id"])
+            )
+        if not question_ids:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="No questions available for this challenge yet. Answer more questions first."
+            )
+
+        # Step 4: Only one challenge runs at a time
+        supabase.postgrest.auth(token).from_("user_challenges_history")\
+            .update({"status": "abandoned"}, returning=ReturnMethod.minimal)\
+            .eq("user_id", user_id)\
+            .eq("status", "started")\
+            .execute()
+        # The abandoned runs can no longer be answered or finished
+        challenge_runs.pop_user(user_id)
+
+        started_at = datetime.now(timezone.utc)
+        insert_response = supabase.postgrest.auth(token).from_("user_challenges_history").insert({
+            "challenge_template_id": template["id"],
+            "user_id": user_id,
+            "started_at": started_at.isoformat(),
+            "status": "started"
+        }).execute()
+        if not insert_response.data:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to create challenge history record"
+            )
+
+        run = ChallengeRun(
+            history_id=insert_response.data[0]["id"],
+            user_id=user_id,
+            template=template,
+            started_at=started_at,
+            question_ids=question_ids
+        )
+        challenge_runs.add(run)
+        last_attempts.record(user_id, template["id"], started_at)
+
+        logger.info("Challenge started", extra={
+            "challenge_template_id": template["id"],
+            "user_id": user_id,
+            "history_id": run.history_id,
+            "questions": len(question_ids)
+        })
+
+        return StartChallengeResponse(
+            id=run.history_id,
+            challenge_template_id=template["id"],
+            started_at=started_at,
+            expires_at=run.deadline,
+            number_of_questions=len(question_ids)
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error starting challenge: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to start challenge"
+        )
+
+
+@router.get("/questions", response_model=ChallengeQuestionsResponse)
+async def get_challenge_questions(
+    history_id: str = Query(..., description="The id of the user challenge history row"),
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    Return the questions of a running challenge not answered yet, in the order to ask them.
+    """
+    try:
+        _validate_uuid(history_id, "history_id")
+
+        token = credentials.credentials
+        user_id = current_user.id
+
+        run = await _get_run(supabase, token, user_id, history_id)
+        if run.questions is None:
+            await _load_questions(supabase, token, user_id, run)
+
+        return ChallengeQuestionsResponse(
+            questions=[LearningQuestion(**q) for q in run.questions if q["id"] not in run.answers],
+            seconds_remaining=run.seconds_remaining(datetime.now(timezone.utc))
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error fetching challenge questions: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch challenge questions"
+        )
+
+
+@router.post("/answer", response_model=ChallengeAnswerResponse)
+async def answer_challenge_question(
+    request: ChallengeAnswerRequest,
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    Answer a question of a running challenge.
+
+    Answers after the time limit, to questions the challenge did not serve, or to a
+    question answered before are rejected with 409. Challenges do not consume lives.
+    """
+    try:
+        _validate_uuid(request.history_id, "history_id")
+        _validate_uuid(request.question_id, "question_id")
+        if request.answer not in ['a', 'b', 'c']:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Answer must be 'a', 'b', or 'c'"
+            )
+
+        token = credentials.credentials
+        user_id = current_user.id
+
+        run = await _get_run(supabase, token, user_id, request.history_id)
+        now = datetime.now(timezone.utc)
+        if run.timed_out(now):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="The challenge time limit has run out"
+            )
+        if run.questions is None:
+            # Restored run: settle its served set before accepting answers
+            await _load_questions(supabase, token, user_id, run)
+        if request.question_id not in run.question_ids:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Question is not part of this challenge"
+            )
+        if request.question_id in run.answers:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Question already answered in this challenge"
+            )
+        if len(run.answers) >= run.number_of_questions:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="All the challenge questions have been answered"
+            )
+
+        answer_key = run.answer_keys.get(request.question_id)
+        if answer_key is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Question not found"
+            )
+        correct_option, explanation = answer_key
+        is_correct = request.answer == correct_option
+
+        with span("challenge.record_answer", correct=is_correct):
+            supabase.postgrest.auth(token).from_("user_questions_history").insert({
+                "user_id": user_id,
+                "user_challenges_history_id": run.history_id,
+                "question_id": request.question_id,
+                "started_at": request.started_at.isoformat(),
+                "answered_at": now.isoformat(),
+                "asked_for_explanation": request.asked_for_explanation,
+                "answer": request.answer,
+                "correct": is_correct
+            }, returning=ReturnMethod.minimal).execute()
+        run.answers[request.question_id] = is_correct
+        answered_index.record(user_id, request.question_id, is_correct)
+
+        xp_gained = 0
+        if is_correct:
+            # Credited by the XP trigger on user_questions_history
+            xp_gained = await LivesService(supabase, token).get_config_int("xp_per_correct_answer", 10)
+            leaderboards.record_xp(user_id, xp_gained)
+        user_events.record_answer(user_id, xp_gained)
+        gamification_scheduler.record_activity(user_id)
+
+        logger.info("Challenge question answered", extra={
+            "history_id": run.history_id,
+            "user_id": user_id,
+            "question_id": request.question_id,
+            "correct": is_correct
+        })
+
+        return ChallengeAnswerResponse(
+            correct=is_correct,
+            explanation=explanation,
+            correct_answer=correct_option,
+            xp_gained=xp_gained,
+            answered=len(run.answers),
+            correct_answers=run.correct_answers,
+            seconds_remaining=run.seconds_remaining(now)
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error answering challenge question: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to answer challenge question"
+        )
+
+
+@router.post("/finish", response_model=FinishChallengeResponse)
+async def finish_challenge(
+    request: FinishChallengeRequest,
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    Finish a challenge: mark the history row completed and return the result.
+
+    The challenge is passed when at least half of its questions were answered
+    correctly; a passed challenge counts towards the streak (see the activity trigger).
+    """
+    try:
+        _validate_uuid(request.history_id, "history_id")
+
+        token = credentials.credentials
+        user_id = current_user.id
+
+        # The update below only matches a started challenge
+        run = await _get_run(supabase, token, user_id, request.history_id, check_status=False)
+        now = datetime.now(timezone.utc)
+        passed = run.passed()
+
+        update_response = supabase.postgrest.auth(token).from_("user_challenges_history")\
+            .update({"status": "completed", "completed_at": now.isoformat(), "passed": passed})\
+            .eq("id", run.history_id)\
+            .eq("user_id", user_id)\
+            .eq("status", "started")\
+            .execute()
+        challenge_runs.pop(run.history_id)
+        if not update_response.data:
+            # Abandoned by a newer start (possibly in another process) or already finished
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Challenge is no longer running"
+            )
+        user_events.record_activity(user_id)
+        gamification_scheduler.record_activity(user_id)
+
+        logger.info("Challenge finished", extra={
+            "history_id": run.history_id,
+            "user_id": user_id,
+            "answered": len(run.answers),
+            "correct": run.correct_answers,
+            "passed": passed
+        })
+
+        return FinishChallengeResponse(
+            id=run.history_id,
+            answered=len(run.answers),
+            correct_answers=run.correct_answers,
+            number_of_questions=run.number_of_questions,
+            passed=passed,
+            timed_out=run.timed_out(now)
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error finishing challenge: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to finish challenge"
+        )
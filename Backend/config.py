@@ -1,9 +1,11 @@
 """
 Configuration module for the Polilingo backend.
-Loads environment variables and initializes the Supabase client.
+Loads environment variables and lazily initializes the Supabase client.
 """
 
 import os
+import threading
+from typing import Optional
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from pydantic_settings import BaseSettings
@@ -17,6 +19,9 @@ class Settings(BaseSettings):
     
     supabase_url: str
     supabase_key: str
+    # Service role key, needed by jobs that bypass RLS (league_rollover.py, the
+    # gamification scheduler) and to write notifications
+    supabase_service_key: Optional[str] = None
     
     # CORS settings
     cors_origins: list[str] = ["http://localhost:3000", "http://localhost:5173"]
@@ -24,6 +29,34 @@ class Settings(BaseSettings):
     # API settings
     api_prefix: str = ""
     
+    # Response compression settings (bytes / encoder levels)
+    compression_minimum_size: int = 1024
+    gzip_level: int = 6
+    brotli_quality: int = 4
+    
+    # Logging: root level, per-module overrides ("learning=DEBUG,httpx=WARNING") and "text" or "json"
+    log_level: str = "INFO"
+    log_levels: str = "httpx=WARNING"
+    log_format: str = "text"
+    
+    # Startup warm-up. Catalog and config tables are only readable by authenticated
+    # users, so preloading them needs a dedicated account; without one only the
+    # username filter is compiled.
+    warmup_enabled: bool = True
+    warmup_email: Optional[str] = None
+    warmup_password: Optional[str] = None
+    
+    # Request tracing (Zipkin v2 JSON, one trace per line)
+    tracing_enabled: bool = True
+    trace_sample_rate: float = 0.01
+    trace_slow_ms: float = 1000.0
+    trace_file: Optional[str] = "traces.jsonl"
+    trace_collector_url: Optional[str] = None
+    
+    # Life refill and streak reminder notifications. Needs supabase_service_key;
+    # enable it in exactly one process.
+    gamification_scheduler_enabled: bool = False
+    
     class Config:
         env_file = ".env"
         extra = "allow"
@@ -38,8 +71,9 @@ if not settings.supabase_url or not settings.supabase_key:
         "SUPABASE_URL and SUPABASE_KEY must be set in .env file"
     )
 
-# Initialize Supabase client
-supabase: Client = create_client(settings.supabase_url, settings.supabase_key)
+# Supabase client, created on first use (normally by the app lifespan)
+_supabase: Optional[Client] = None
+_supabase_lock = threading.Lock()
 
 
 def get_supabase() -> Client:
@@ -49,4 +83,19 @@ def get_supabase() -> Client:
     Returns:
         Client: Configured Supabase client
     """
-    return supabase
+    global _supabase
+    if _supabase is None:
+        with _supabase_lock:
+            if _supabase is None:
+                _supabase = create_client(settings.supabase_url, settings.supabase_key)
+    return _supabase
+
+
+def close_supabase() -> None:
+    """Close the Supabase client's HTTP connection pools."""
+    global _supabase
+    with _supabase_lock:
+        if _supabase is not None:
+            _supabase.postgrest.session.close()
+            _supabase.auth._http_client.close()
+            _supabase = None
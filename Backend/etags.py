@@ -0,0 +1,142 @@
+"""
+Conditional GET support for catalog and per-user read endpoints.
+Builds strong ETags from content versions so clients holding a fresh copy get a 304
+before the endpoint queries the payload or builds any Pydantic model.
+"""
+
+import hashlib
+import logging
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import Request, Response, status
+from supabase import Client
+
+logger = logging.getLogger(__name__)
+
+# Catalog versions are shared by every user, user progress versions are per user.
+# Both are cached in memory and re-read from the database once their TTL expires.
+# Progress changes through any worker, so a conditional request always re-reads it.
+CATALOG_VERSION_TTL_SECONDS = 60
+USER_PROGRESS_VERSION_TTL_SECONDS = 30
+
+_catalog_versions: Dict[str, Tuple[str, float]] = {}
+_user_progress_versions: Dict[str, Tuple[str, float]] = {}
+
+
+async def get_catalog_version(supabase: Client, token: str, table: str) -> str:
+    """
+    Return the content version of a catalog table.
+
+    The version combines the row count (catches inserts and deletes) with the latest
+    updated_at (catches edits). It is read with a single one-row query and cached.
+
+    Args:
+        supabase: Supabase client instance
+        token: Access token used for RLS
+        table: Catalog table name (blocks, topics, lessons, ...)
+
+    Returns:
+        Opaque version string
+    """
+    now = time.monotonic()
+    cached = _catalog_versions.get(table)
+    if cached and now - cached[1] < CATALOG_VERSION_TTL_SECONDS:
+        return cached[0]
+
+    response = supabase.postgrest.auth(token).from_(table)\
+        .select("updated_at", count="exact")\
+        .order("updated_at", desc=True)\
+        .limit(1)\
+        .execute()
+
+    latest = response.data[0]["updated_at"] if response.data else ""
+    version = f"{response.count}:{latest}"
+    _catalog_versions[table] = (version, now)
+    return version
+
+
+def invalidate_catalog_version(table: Optional[str] = None) -> None:
+    """Drop the cached version of one catalog table, or of all of them."""
+    if table is None:
+        _catalog_versions.clear()
+    else:
+        _catalog_versions.pop(table, None)
+
+
+async def get_user_progress_version(supabase: Client, token: str, user_id: str, fresh: bool = False) -> str:
+    """
+    Return the progress version of a user.
+
+    Per-user read endpoints only change when the set of passed sessions changes,
+    so the number of passed session history rows is used as the version.
+
+    Args:
+        supabase: Supabase client instance
+        token: Access token used for RLS
+        user_id: The id of the user
+        fresh: Read the database even when a cached version is available. The cache
+            only sees invalidations from this worker, so a version that decides a
+            304 must be fresh.
+
+    Returns:
+        Opaque version string
+    """
+    now = time.monotonic()
+    cached = _user_progress_versions.get(user_id)
+    if not fresh and cached and now - cached[1] < USER_PROGRESS_VERSION_TTL_SECONDS:
+        return cached[0]
+
+    response = supabase.postgrest.auth(token).from_("user_session_history")\
+        .select("id", count="exact")\
+        .eq("user_id", user_id)\
+        .eq("passed", True)\
+        .limit(1)\
+        .execute()
+
+    version = str(response.count or 0)
+    _user_progress_versions[user_id] = (version, now)
+    return version
+
+
+def invalidate_user_progress_version(user_id: str) -> None:
+    """Drop the cached progress version of a user after their progress changed."""
+    _user_progress_versions.pop(user_id, None)
+
+
+def make_etag(*parts: str) -> str:
+    """Build a strong ETag from the given version parts."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+async def catalog_etag(supabase: Client, token: str, table: str, ids: Iterable[str]) -> str:
+    """Build the ETag for a `*/fetch` response of the given table and ids."""
+    version = await get_catalog_version(supabase, token, table)
+    return make_etag(table, version, *sorted(set(ids)))
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check whether the request's If-None-Match header matches the given ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so a W/ prefix is ignored
+    candidates = [c.strip().removeprefix("W/") for c in header.split(",")]
+    return etag in candidates
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """Attach the ETag and revalidation headers to a 200 response."""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+
+def not_modified(etag: str) -> Response:
+    """Build an empty 304 response for the given ETag."""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={"ETag": etag, "Cache-Control": "private, no-cache"}
+    )
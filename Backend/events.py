@@ -0,0 +1,95 @@
+"""
+Event stream router: server-sent events with the user's lives, XP and streak.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.responses import StreamingResponse
+from supabase import Client
+from typing import Optional
+import asyncio
+import logging
+
+import orjson
+
+from config import get_supabase
+from middleware import bearer_token, get_user_from_token
+from lives_service import LivesService
+from user_events import user_events
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+# A comment is sent after this long without events so proxies keep the connection open
+SSE_KEEPALIVE_SECONDS = 15
+
+STATS_COLUMNS = "total_xp, current_level, current_streak, longest_streak, last_streak_date, lives, last_life_lost_at"
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    token: Optional[str] = Query(None, description="Access token, when it cannot be sent as a Bearer header"),
+    supabase: Client = Depends(get_supabase)
+):
+    """
+    Stream the user's gamification changes as server-sent events, replacing
+    /users/profile polling for the lives countdown, XP and streak.
+
+    Events: snapshot (everything below, sent first), lives (current_lives,
+    next_life_at, seconds_to_next_life; on a lost life and on each refill), xp
+    (xp_gained, total_xp) and streak (current_streak, longest_streak,
+    last_streak_date). Every event carries absolute values.
+    """
+    # EventSource cannot set headers, so the token may come as ?token=
+    access_token = bearer_token(request.headers, token)
+    user = get_user_from_token(supabase, access_token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentication failed",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user_id = user.id
+
+    try:
+        stats_response = supabase.postgrest.auth(access_token).from_("user_gamification_stats")\
+            .select(STATS_COLUMNS)\
+            .eq("user_id", user_id)\
+            .execute()
+        if not stats_response.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User gamification stats not found"
+            )
+        stats = stats_response.data[0]
+        lives_status = await LivesService(supabase, access_token).get_current_lives(user_id, stats_data=stats)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error opening event stream: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to open event stream"
+        )
+
+    async def event_source():
+        # Starlette cancels the stream when the client disconnects, which runs the finally
+        queue = user_events.subscribe(user_id, access_token, stats, lives_status)
+        try:
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+        finally:
+            user_events.unsubscribe(user_id, queue)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
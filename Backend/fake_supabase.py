@@ -0,0 +1,1155 @@
+"""
+Local Supabase stand-in for offline benchmarking and load testing.
+
+Serves the subset of PostgREST (/rest/v1) and GoTrue (/auth/v1) the routers use,
+so the backend runs unmodified with SUPABASE_URL pointing at it. Tables are held
+in memory; their columns, defaults and primary keys are read from the Database/
+migrations, and the rows inserted there (learning_path_config, ...) are loaded too.
+A synthetic catalog and confirmed test users can be seeded on top.
+
+Supported:
+    PostgREST: select (columns, embedded joins incl. !inner), eq, neq, gt, gte, lt,
+        lte, like, ilike, in, is, not.*, order, limit/offset, count=exact, single,
+        insert, update, upsert, delete, rpc
+    GoTrue: sign up, password and refresh_token grants, get/update user, logout,
+        recover, verify
+
+The seeded users are grouped into active bronze leagues for the current week.
+
+Not emulated: RLS, and database triggers other than updated_at and the
+gamification stats row created for a new user.
+
+Usage:
+    python fake_supabase.py [--port 54321] [--latency-ms 20] [--jitter-ms 5] \\
+        [--users 50] [--users-file load_users.csv] [--lessons 10] [--fixture rows.json]
+
+Then start the backend with the SUPABASE_URL and SUPABASE_KEY it prints.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import random
+import re
+import secrets
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+logger = logging.getLogger(__name__)
+
+DATABASE_DIR = Path(__file__).resolve().parent.parent / "Database"
+JWT_SECRET = "fake-supabase-jwt-secret"
+ACCESS_TOKEN_TTL_SECONDS = 3600
+
+# Query parameters that are not column filters
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+class PostgrestError(Exception):
+    """Error answered in the PostgREST JSON error format."""
+
+    def __init__(self, status_code: int, code: str, message: str, details: Optional[str] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+        self.details = details
+
+
+def utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# ============================================================================
+# SCHEMA
+# ============================================================================
+
+@dataclass
+class TableSchema:
+    """Columns (name -> DEFAULT expression or None), primary key and single-column UNIQUE constraints of a table."""
+    columns: Dict[str, Optional[str]] = field(default_factory=dict)
+    primary_key: Tuple[str, ...] = ()
+    unique: List[str] = field(default_factory=list)
+
+
+def _strip_comments(sql: str) -> str:
+    """Remove -- comments and $$-quoted function bodies, keeping string literals intact."""
+    out = []
+    i, n = 0, len(sql)
+    while i < n:
+        c = sql[i]
+        if c == "'":
+            end = i + 1
+            while end < n:
+                if sql[end] == "'" and (end + 1 >= n or sql[end + 1] != "'"):
+                    break
+                end += 2 if sql[end] == "'" else 1
+            out.append(sql[i:end + 1])
+            i = end + 1
+        elif sql.startswith("--", i):
+            newline = sql.find("\n", i)
+            i = n if newline < 0 else newline
+        elif c == "$":
+            tag = re.match(r"\$\w*\$", sql[i:])
+            if tag:
+                end = sql.find(tag.group(0), i + len(tag.group(0)))
+                i = n if end < 0 else end + len(tag.group(0))
+            else:
+                out.append(c)
+                i += 1
+        else:
+            out.append(c)
+            i += 1
+    return "".join(out)
+
+
+def _split_top_level(text: str, sep: str = ",") -> List[str]:
+    """Split on sep outside parentheses and single-quoted strings."""
+    parts, depth, quoted, current = [], 0, False, []
+    for c in text:
+        if c == "'":
+            quoted = not quoted
+        elif not quoted and c == "(":
+            depth += 1
+        elif not quoted and c == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and c == sep:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(c)
+    if "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+
+_DEFAULT_RE = re.compile(
+    r"\bDEFAULT\s+(.+?)(?=\s+(?:NOT\s+NULL|NULL|CHECK|REFERENCES|PRIMARY|UNIQUE|CONSTRAINT|GENERATED)\b|$)",
+    re.IGNORECASE | re.DOTALL
+)
+
+
+def _parse_column(definition: str) -> Tuple[str, Optional[str], bool]:
+    """Return (name, default expression, is primary key) of a column definition."""
+    name = definition.split(None, 1)[0].strip('"')
+    default = _DEFAULT_RE.search(definition)
+    return name, default.group(1).strip() if default else None, bool(re.search(r"\bPRIMARY\s+KEY\b", definition, re.I))
+
+
+def _parse_literal(expr: Optional[str]) -> Any:
+    """Evaluate a SQL literal or column default. Unknown expressions evaluate to None."""
+    if expr is None:
+        return None
+    expr = re.sub(r"::[\w ]+(\[\])?$", "", expr.strip()).strip()
+    upper = expr.upper()
+    if upper in ("GEN_RANDOM_UUID()", "UUID_GENERATE_V4()", "EXTENSIONS.UUID_GENERATE_V4()"):
+        return str(uuid.uuid4())
+    if upper in ("NOW()", "CURRENT_TIMESTAMP") or upper.startswith("TIMEZONE("):
+        return utc_now()
+    if upper == "CURRENT_DATE":
+        return datetime.now(timezone.utc).date().isoformat()
+    if upper in ("TRUE", "FALSE"):
+        return upper == "TRUE"
+    if upper == "NULL":
+        return None
+    if expr.startswith("'") and expr.endswith("'"):
+        value = expr[1:-1].replace("''", "'")
+        if value[:1] in "{[" and value[-1:] in "}]":
+            try:
+                return json.loads(value)
+            except ValueError:
+                return [] if value == "{}" else value
+        return value
+    try:
+        return int(expr)
+    except ValueError:
+        pass
+    try:
+        return float(expr)
+    except ValueError:
+        return None
+
+
+def load_schema(database_dir: Path = DATABASE_DIR) -> Tuple[Dict[str, TableSchema], Dict[str, List[Dict]]]:
+    """
+    Read tables and seed rows from the numbered migration files.
+
+    Applies CREATE TABLE, ALTER TABLE (add/drop/rename column, rename table),
+    DROP TABLE and literal INSERT ... VALUES statements in file order.
+
+    Returns:
+        Tuple of (table name -> schema, table name -> seed rows)
+    """
+    schemas: Dict[str, TableSchema] = {}
+    seeds: Dict[str, List[Dict]] = defaultdict(list)
+    table_name = r'(?:IF\s+(?:NOT\s+)?EXISTS\s+)?(?:ONLY\s+)?(?:public\.)?"?(\w+)"?'
+
+    for path in sorted(database_dir.glob("*.sql")):
+        for statement in _strip_comments(path.read_text(encoding="utf-8")).split(";"):
+            statement = statement.strip()
+
+            create = re.match(rf"CREATE\s+TABLE\s+{table_name}\s*\((.*)\)\s*$", statement, re.I | re.S)
+            if create:
+                if create.group(1) in schemas and re.match(r"CREATE\s+TABLE\s+IF\s+NOT\s+EXISTS", statement, re.I):
+                    continue
+                schema = TableSchema()
+                for part in _split_top_level(create.group(2)):
+                    keyword = part.split(None, 1)[0].upper()
+                    if keyword in ("CONSTRAINT", "PRIMARY", "UNIQUE", "FOREIGN", "CHECK", "EXCLUDE"):
+                        pk = re.search(r"PRIMARY\s+KEY\s*\(([^)]*)\)", part, re.I)
+                        if pk:
+                            schema.primary_key = tuple(c.strip().strip('"') for c in pk.group(1).split(","))
+                        unique = re.search(r"UNIQUE\s*\(\s*\"?(\w+)\"?\s*\)", part, re.I)
+                        if unique:
+                            schema.unique.append(unique.group(1))
+                        continue
+                    name, default, is_pk = _parse_column(part)
+                    schema.columns[name] = default
+                    if is_pk:
+                        schema.primary_key = (name,)
+                    elif re.search(r"\bUNIQUE\b", part, re.I):
+                        schema.unique.append(name)
+                schemas[create.group(1)] = schema
+                continue
+
+            alter = re.match(rf"ALTER\s+TABLE\s+{table_name}\s+(.*)$", statement, re.I | re.S)
+            if alter:
+                name, rest = alter.group(1), alter.group(2)
+                rename_table = re.match(r"RENAME\s+TO\s+\"?(\w+)\"?", rest, re.I)
+                if rename_table:
+                    if name in schemas:
+                        schemas[rename_table.group(1)] = schemas.pop(name)
+                    continue
+                schema = schemas.get(name)
+                if schema is None:
+                    continue
+                for clause in _split_top_level(rest):
+                    add = re.match(r"ADD\s+COLUMN\s+(?:IF\s+NOT\s+EXISTS\s+)?(.*)$", clause, re.I | re.S)
+                    drop = re.match(r"DROP\s+COLUMN\s+(?:IF\s+EXISTS\s+)?\"?(\w+)\"?", clause, re.I)
+                    rename = re.match(r"RENAME\s+COLUMN\s+\"?(\w+)\"?\s+TO\s+\"?(\w+)\"?", clause, re.I)
+                    if add:
+                        column, default, _ = _parse_column(add.group(1))
+                        schema.columns[column] = default
+                    elif drop:
+                        schema.columns.pop(drop.group(1), None)
+                    elif rename and rename.group(1) in schema.columns:
+                        schema.columns[rename.group(2)] = schema.columns.pop(rename.group(1))
+                continue
+
+            drop_table = re.match(rf"DROP\s+TABLE\s+{table_name}", statement, re.I)
+            if drop_table:
+                schemas.pop(drop_table.group(1), None)
+                continue
+
+            insert = re.match(
+                rf"INSERT\s+INTO\s+{table_name}\s*\(([^)]*)\)\s*VALUES\s*(.*?)(?:\s+ON\s+CONFLICT.*)?$",
+                statement, re.I | re.S
+            )
+            if insert:
+                columns = [c.strip().strip('"') for c in insert.group(2).split(",")]
+                for values in _split_top_level(insert.group(3)):
+                    if not (values.startswith("(") and values.endswith(")")):
+                        continue
+                    literals = _split_top_level(values[1:-1])
+                    if len(literals) == len(columns):
+                        seeds[insert.group(1)].append(dict(zip(columns, (_parse_literal(v) for v in literals))))
+
+    return schemas, seeds
+
+
+# ============================================================================
+# STORE
+# ============================================================================
+
+def _singular(table: str) -> str:
+    return table[:-1] if table.endswith("s") else table
+
+
+def _coerce(raw: str, sample: Any) -> Any:
+    """Convert a filter argument to the type of the column value it is compared with."""
+    if isinstance(sample, bool):
+        return raw.lower() == "true"
+    if isinstance(sample, int):
+        try:
+            return int(raw)
+        except ValueError:
+            return float(raw)
+    if isinstance(sample, float):
+        return float(raw)
+    return raw
+
+
+def _like_to_regex(pattern: str, case_insensitive: bool) -> "re.Pattern":
+    out, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        out.append(".*" if c in "%*" else "." if c == "_" else re.escape(c))
+        i += 1
+    return re.compile("^" + "".join(out) + "$", re.I | re.S if case_insensitive else re.S)
+
+
+def _parse_in_list(raw: str) -> List[str]:
+    inner = raw[1:-1] if raw.startswith("(") and raw.endswith(")") else raw
+    return [v.strip().strip('"') for v in _split_top_level(inner)] if inner else []
+
+
+def _make_predicate(column: str, expression: str) -> Callable[[Dict], bool]:
+    """Build a row predicate from a PostgREST filter such as `eq.5` or `not.in.(a,b)`."""
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[4:]
+    op, _, raw = expression.partition(".")
+
+    if op == "is":
+        expected = {"null": None, "true": True, "false": False}.get(raw.lower(), None)
+        test = lambda v: v is expected
+    elif op in ("like", "ilike"):
+        regex = _like_to_regex(raw, op == "ilike")
+        test = lambda v: v is not None and bool(regex.match(str(v)))
+    elif op == "in":
+        values = _parse_in_list(raw)
+        cache: Dict[type, set] = {}
+        test = lambda v: v is not None and _coerce_in(v, values, cache)
+    elif op in ("eq", "neq", "gt", "gte", "lt", "lte"):
+        compare = {
+            "eq": lambda a, b: a == b, "neq": lambda a, b: a != b,
+            "gt": lambda a, b: a > b, "gte": lambda a, b: a >= b,
+            "lt": lambda a, b: a < b, "lte": lambda a, b: a <= b,
+        }[op]
+        test = lambda v: v is not None and compare(v, _coerce(raw, v))
+    else:
+        raise PostgrestError(400, "PGRST100", f'"failed to parse filter ({op}.{raw})" (line 1, column 1)')
+
+    return (lambda row: not test(row.get(column))) if negate else (lambda row: test(row.get(column)))
+
+
+def _coerce_in(value: Any, values: List[str], cache: Dict[type, set]) -> bool:
+    # The list is coerced once per value type, not once per row
+    coerced = cache.get(type(value))
+    if coerced is None:
+        coerced = cache[type(value)] = {_coerce(v, value) for v in values}
+    return value in coerced
+
+
+@dataclass
+class SelectItem:
+    """One entry of a select list: a column or an embedded resource."""
+    name: str
+    alias: str
+    children: Optional[List["SelectItem"]] = None
+    inner: bool = False
+
+
+def parse_select(select: str) -> List[SelectItem]:
+    items = []
+    for part in _split_top_level(select or "*"):
+        alias = None
+        if ":" in part.split("(", 1)[0] and "::" not in part:
+            alias, part = part.split(":", 1)
+        part = part.split("::", 1)[0].strip()
+        embed = re.match(r"^\"?(\w+)\"?(?:!(\w+))?\((.*)\)$", part, re.S)
+        if embed:
+            name = embed.group(1)
+            items.append(SelectItem(name, alias or name, parse_select(embed.group(3)), embed.group(2) == "inner"))
+        else:
+            name = part.strip('"')
+            items.append(SelectItem(name, alias or name))
+    return items
+
+
+class FakeDatabase:
+    """In-memory tables shaped by the migration schema."""
+
+    def __init__(self, schemas: Dict[str, TableSchema], seeds: Optional[Dict[str, List[Dict]]] = None):
+        self.schemas = schemas
+        self.tables: Dict[str, List[Dict]] = {name: [] for name in schemas}
+        self._pk_index: Dict[str, Dict[Any, Dict]] = {name: {} for name in schemas}
+        for table, rows in (seeds or {}).items():
+            if table in self.schemas:
+                self.insert(table, rows)
+
+    # --- helpers -------------------------------------------------------------
+
+    def _table(self, table: str) -> List[Dict]:
+        if table not in self.tables:
+            raise PostgrestError(404, "42P01", f'relation "public.{table}" does not exist')
+        return self.tables[table]
+
+    def _check_column(self, table: str, column: str) -> None:
+        if column not in self.schemas[table].columns:
+            raise PostgrestError(400, "42703", f"column {table}.{column} does not exist")
+
+    def _pk_value(self, table: str, row: Dict) -> Any:
+        pk = self.schemas[table].primary_key
+        return tuple(row.get(c) for c in pk) if pk else None
+
+    def _with_defaults(self, table: str, row: Dict) -> Dict:
+        full = {}
+        for column, default in self.schemas[table].columns.items():
+            full[column] = row[column] if column in row else _parse_literal(default)
+        for column in row:
+            self._check_column(table, column)
+        return full
+
+    def _after_insert(self, table: str, row: Dict) -> None:
+        # Mirrors the create_gamification_stats_for_new_user trigger
+        if table == "users" and "user_gamification_stats" in self.tables:
+            if not self._pk_index["user_gamification_stats"].get((row["id"],)):
+                self.insert("user_gamification_stats", [{"user_id": row["id"]}])
+
+    # --- reads ---------------------------------------------------------------
+
+    def filter_rows(self, table: str, filters: List[Tuple[str, str]]) -> List[Dict]:
+        rows = self._table(table)
+        pk = self.schemas[table].primary_key
+        predicates = []
+        for column, expression in filters:
+            column = column.strip('"')
+            if column == "or":
+                predicates.append(self._or_predicate(table, expression))
+                continue
+            self._check_column(table, column)
+            # Primary key equality is an index lookup instead of a scan
+            if pk == (column,) and expression.startswith("eq.") and rows is self.tables[table]:
+                hit = self._pk_index[table].get((expression[3:],))
+                rows = [hit] if hit else []
+                continue
+            predicates.append(_make_predicate(column, expression))
+        return [row for row in rows if all(p(row) for p in predicates)]
+
+    def _or_predicate(self, table: str, expression: str) -> Callable[[Dict], bool]:
+        """`or=(a.eq.1,b.eq.2)`: a row matches when any of the filters does."""
+        alternatives = []
+        for part in _parse_in_list(expression):
+            column, _, condition = part.partition(".")
+            self._check_column(table, column)
+            alternatives.append(_make_predicate(column, condition))
+        return lambda row: any(p(row) for p in alternatives)
+
+    def _relation(self, base: str, embedded: str) -> Tuple[str, str, bool]:
+        """
+        Resolve how `embedded` joins to `base`.
+
+        Returns:
+            (base column, embedded column, returns a single object)
+        """
+        if embedded not in self.schemas:
+            raise PostgrestError(400, "PGRST200", f"Could not find a relationship between '{base}' and '{embedded}'")
+        fk = f"{_singular(embedded)}_id"
+        if fk in self.schemas[base].columns:
+            return fk, "id", True
+        back = f"{_singular(base)}_id"
+        if back in self.schemas[embedded].columns:
+            # A foreign key that is also the primary key is one-to-one
+            return "id", back, self.schemas[embedded].primary_key == (back,)
+        raise PostgrestError(400, "PGRST200", f"Could not find a relationship between '{base}' and '{embedded}'")
+
+    def project(self, table: str, rows: List[Dict], items: List[SelectItem]) -> List[Dict]:
+        """Apply a parsed select list, resolving embedded resources."""
+        columns = [i for i in items if i.children is None]
+        embeds = [i for i in items if i.children is not None]
+        for item in columns:
+            if item.name != "*":
+                self._check_column(table, item.name)
+
+        lookups = []
+        for item in embeds:
+            base_col, embedded_col, single = self._relation(table, item.name)
+            grouped: Dict[Any, List[Dict]] = defaultdict(list)
+            for child in self._table(item.name):
+                grouped[child.get(embedded_col)].append(child)
+            lookups.append((item, base_col, grouped, single))
+
+        result = []
+        for row in rows:
+            out = {}
+            for item in columns:
+                if item.name == "*":
+                    out.update(row)
+                else:
+                    out[item.alias] = row.get(item.name)
+            skip = False
+            for item, base_col, grouped, single in lookups:
+                children = self.project(item.name, grouped.get(row.get(base_col), []), item.children)
+                if item.inner and not children:
+                    skip = True
+                    break
+                out[item.alias] = (children[0] if children else None) if single else children
+            if not skip:
+                result.append(out)
+        return result
+
+    def select(
+        self,
+        table: str,
+        select: str,
+        filters: List[Tuple[str, str]],
+        order: Optional[str],
+        limit: Optional[int],
+        offset: int
+    ) -> Tuple[List[Dict], int]:
+        """
+        Run a select.
+
+        Returns:
+            Tuple of (page rows, total matching rows before limit/offset)
+        """
+        rows = self.project(table, self.filter_rows(table, filters), parse_select(select))
+        if order:
+            for term in reversed(order.split(",")):
+                parts = term.split(".")
+                column = parts[0].strip('"')
+                desc = "desc" in parts[1:]
+                nulls_first = "nullsfirst" in parts[1:] or ("nullslast" not in parts[1:] and desc)
+                present = [r for r in rows if r.get(column) is not None]
+                missing = [r for r in rows if r.get(column) is None]
+                present.sort(key=lambda r: r[column], reverse=desc)
+                rows = missing + present if nulls_first else present + missing
+        total = len(rows)
+        end = None if limit is None else offset + limit
+        return rows[offset:end], total
+
+    # --- writes --------------------------------------------------------------
+
+    def insert(self, table: str, rows: List[Dict], upsert_on: Optional[Tuple[str, ...]] = None) -> List[Dict]:
+        self._table(table)
+        written = []
+        for row in rows:
+            if upsert_on:
+                key = tuple(row.get(c) for c in upsert_on)
+                if upsert_on == self.schemas[table].primary_key:
+                    # Conflicts on the primary key are an index lookup instead of a scan
+                    existing = self._pk_index[table].get(key)
+                else:
+                    existing = next(
+                        (r for r in self.tables[table] if tuple(r.get(c) for c in upsert_on) == key), None
+                    )
+                if existing is not None:
+                    written.extend(self._apply_update(table, [existing], row))
+                    continue
+            full = self._with_defaults(table, row)
+            pk_value = self._pk_value(table, full)
+            if pk_value is not None and pk_value in self._pk_index[table]:
+                pk = self.schemas[table].primary_key
+                raise PostgrestError(
+                    409, "23505", f'duplicate key value violates unique constraint "{table}_pkey"',
+                    f"Key ({', '.join(pk)})=({', '.join(str(v) for v in pk_value)}) already exists."
+                )
+            for column in self.schemas[table].unique:
+                value = full.get(column)
+                if value is not None and any(r.get(column) == value for r in self.tables[table]):
+                    raise PostgrestError(
+                        409, "23505", f'duplicate key value violates unique constraint "{table}_{column}_key"',
+                        f"Key ({column})=({value}) already exists."
+                    )
+            self.tables[table].append(full)
+            if pk_value is not None:
+                self._pk_index[table][pk_value] = full
+            self._after_insert(table, full)
+            written.append(full)
+        return written
+
+    def _apply_update(self, table: str, rows: List[Dict], values: Dict) -> List[Dict]:
+        for column in values:
+            self._check_column(table, column)
+        touch_updated_at = "updated_at" in self.schemas[table].columns and "updated_at" not in values
+        for row in rows:
+            old_pk = self._pk_value(table, row)
+            row.update(values)
+            if touch_updated_at:
+                row["updated_at"] = utc_now()
+            new_pk = self._pk_value(table, row)
+            if old_pk != new_pk:
+                self._pk_index[table].pop(old_pk, None)
+                self._pk_index[table][new_pk] = row
+        return rows
+
+    def update(self, table: str, values: Dict, filters: List[Tuple[str, str]]) -> List[Dict]:
+        return self._apply_update(table, self.filter_rows(table, filters), values)
+
+    def delete(self, table: str, filters: List[Tuple[str, str]]) -> List[Dict]:
+        doomed = self.filter_rows(table, filters)
+        doomed_ids = {id(r) for r in doomed}
+        self.tables[table] = [r for r in self.tables[table] if id(r) not in doomed_ids]
+        for row in doomed:
+            self._pk_index[table].pop(self._pk_value(table, row), None)
+        return doomed
+
+
+# ============================================================================
+# RPC
+# ============================================================================
+
+RPC_FUNCTIONS: Dict[str, Callable[[FakeDatabase, Dict], Any]] = {}
+
+
+def rpc(name: str):
+    """Register a Python implementation of a database function."""
+    def decorator(fn):
+        RPC_FUNCTIONS[name] = fn
+        return fn
+    return decorator
+
+
+def _answered_stats(db: FakeDatabase, user_id: str) -> List[Dict]:
+    stats: Dict[str, Dict] = {}
+    for row in db.tables.get("user_questions_history", []):
+        if row.get("user_id") != user_id:
+            continue
+        entry = stats.setdefault(row["question_id"], {
+            "question_id": row["question_id"], "total_attempts": 0, "correct_answers": 0
+        })
+        entry["total_attempts"] += 1
+        entry["correct_answers"] += 1 if row.get("correct") else 0
+    return list(stats.values())
+
+
+@rpc("get_answered_questions_stats")
+def rpc_get_answered_questions_stats(db: FakeDatabase, params: Dict) -> List[Dict]:
+    return _answered_stats(db, params["p_user_id"])
+
+
+@rpc("get_answered_questions_stats_page")
+def rpc_get_answered_questions_stats_page(db: FakeDatabase, params: Dict) -> List[Dict]:
+    after = params.get("p_after_question_id")
+    rows = sorted(_answered_stats(db, params["p_user_id"]), key=lambda r: r["question_id"])
+    if after:
+        rows = [r for r in rows if r["question_id"] > after]
+    return rows[:params.get("p_limit", 500)]
+
+
+@rpc("get_last_challenge_attempts")
+def rpc_get_last_challenge_attempts(db: FakeDatabase, params: Dict) -> List[Dict]:
+    latest: Dict[str, str] = {}
+    for row in db.tables.get("user_challenges_history", []):
+        if row.get("user_id") == params["p_user_id"]:
+            template_id = row["challenge_template_id"]
+            latest[template_id] = max(latest.get(template_id, ""), row["started_at"])
+    return [{"challenge_template_id": k, "last_started_at": v} for k, v in latest.items()]
+
+
+@rpc("apply_league_results")
+def rpc_apply_league_results(db: FakeDatabase, params: Dict) -> int:
+    updated = 0
+    for result in params["p_results"]:
+        row = db._pk_index["league_participants"].get((result["id"],))
+        if row is not None:
+            values = {k: result.get(k) for k in ("current_rank", "promoted", "demoted")}
+            db._apply_update("league_participants", [row], values)
+            updated += 1
+    return updated
+
+
+@rpc("swap_league_week")
+def rpc_swap_league_week(db: FakeDatabase, params: Dict) -> int:
+    week_start = params["p_week_start"]
+    rows = [
+        row for row in db.tables["leagues"]
+        if (row["active"] and row["end_date"] <= week_start) or (not row["active"] and row["start_date"] == week_start)
+    ]
+    for row in rows:
+        db._apply_update("leagues", [row], {"active": row["start_date"] == week_start})
+    return len(rows)
+
+
+@rpc("discard_pending_leagues")
+def rpc_discard_pending_leagues(db: FakeDatabase, params: Dict) -> int:
+    league_ids = {
+        row["id"] for row in db.tables["leagues"]
+        if not row["active"] and row["start_date"] == params["p_week_start"]
+    }
+    if league_ids:
+        # ON DELETE CASCADE of league_participants.league_id
+        db.delete("league_participants", [("league_id", f"in.({','.join(league_ids)})")])
+        db.delete("leagues", [("id", f"in.({','.join(league_ids)})")])
+    return len(league_ids)
+
+
+# ============================================================================
+# AUTH
+# ============================================================================
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def sign_jwt(payload: Dict, secret: str = JWT_SECRET) -> str:
+    header = _b64url(json.dumps({"alg": "HS256", "typ": "JWT"}).encode())
+    body = _b64url(json.dumps(payload).encode())
+    signature = hmac.new(secret.encode(), f"{header}.{body}".encode(), hashlib.sha256).digest()
+    return f"{header}.{body}.{_b64url(signature)}"
+
+
+def verify_jwt(token: str, secret: str = JWT_SECRET) -> Optional[Dict]:
+    try:
+        header, body, signature = token.split(".")
+    except ValueError:
+        return None
+    expected = hmac.new(secret.encode(), f"{header}.{body}".encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, _b64url_decode(signature)):
+        return None
+    payload = json.loads(_b64url_decode(body))
+    if payload.get("exp") and payload["exp"] < time.time():
+        return None
+    return payload
+
+
+class FakeAuth:
+    """GoTrue users, password grants and refresh tokens."""
+
+    def __init__(self, db: FakeDatabase, autoconfirm: bool = True):
+        self.db = db
+        self.autoconfirm = autoconfirm
+        self.users_by_email: Dict[str, Dict] = {}
+        self.users_by_id: Dict[str, Dict] = {}
+        self.refresh_tokens: Dict[str, str] = {}
+        self.recovery_tokens: Dict[str, str] = {}
+
+    def create_user(self, email: str, password: str, metadata: Optional[Dict] = None, confirmed: Optional[bool] = None) -> Dict:
+        if email in self.users_by_email:
+            raise PostgrestError(422, "user_already_exists", "User already registered")
+        now = utc_now()
+        user = {
+            "id": str(uuid.uuid4()),
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": email,
+            "email_confirmed_at": now if (self.autoconfirm if confirmed is None else confirmed) else None,
+            "app_metadata": {"provider": "email", "providers": ["email"]},
+            "user_metadata": metadata or {},
+            "identities": [],
+            "created_at": now,
+            "updated_at": now,
+            "_password": password,
+        }
+        self.users_by_email[email] = user
+        self.users_by_id[user["id"]] = user
+        return user
+
+    @staticmethod
+    def public_user(user: Dict) -> Dict:
+        return {k: v for k, v in user.items() if not k.startswith("_")}
+
+    def issue_session(self, user: Dict) -> Dict:
+        now = int(time.time())
+        access_token = sign_jwt({
+            "sub": user["id"], "email": user["email"], "role": "authenticated", "aud": "authenticated",
+            "iat": now, "exp": now + ACCESS_TOKEN_TTL_SECONDS, "session_id": str(uuid.uuid4())
+        })
+        refresh_token = secrets.token_urlsafe(24)
+        self.refresh_tokens[refresh_token] = user["id"]
+        return {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "expires_in": ACCESS_TOKEN_TTL_SECONDS,
+            "expires_at": now + ACCESS_TOKEN_TTL_SECONDS,
+            "refresh_token": refresh_token,
+            "user": self.public_user(user),
+        }
+
+    def user_from_token(self, token: Optional[str]) -> Optional[Dict]:
+        payload = verify_jwt(token) if token else None
+        return self.users_by_id.get(payload["sub"]) if payload and "sub" in payload else None
+
+
+def auth_error(status_code: int, code: str, message: str) -> JSONResponse:
+    return JSONResponse({"code": status_code, "error_code": code, "msg": message}, status_code=status_code)
+
+
+# ============================================================================
+# SEEDING
+# ============================================================================
+
+def seed_catalog(db: FakeDatabase, lessons: int = 10, sessions_per_lesson: int = 5, questions_per_concept: int = 20) -> None:
+    """
+    Seed a synthetic syllabus and learning path.
+
+    One block per lesson, one topic/heading per block and one concept per session,
+    each concept holding questions_per_concept questions of mixed difficulty.
+    """
+    for lesson_number in range(1, lessons + 1):
+        block = db.insert("blocks", [{"name": f"Bloque {lesson_number}", "order": lesson_number}])[0]
+        topic = db.insert("topics", [{"block_id": block["id"], "name": f"Tema {lesson_number}", "order": 1}])[0]
+        heading = db.insert("headings", [{"topic_id": topic["id"], "name": f"Epígrafe {lesson_number}", "order": 1}])[0]
+        lesson = db.insert("lessons", [{"name": f"Lección {lesson_number}", "order": lesson_number, "xp_reward": 50}])[0]
+        for session_number in range(1, sessions_per_lesson + 1):
+            concept = db.insert("concepts", [{
+                "heading_id": heading["id"],
+                "name": f"Concepto {lesson_number}.{session_number}",
+                "order": session_number
+            }])[0]
+            db.insert("questions", [{
+                "concept_id": concept["id"],
+                "text": f"¿Pregunta {i + 1} sobre el concepto {lesson_number}.{session_number}?",
+                "option_a": "Opción A",
+                "option_b": "Opción B",
+                "option_c": "Opción C",
+                "correct_option": "abc"[i % 3],
+                "explanation": "Explicación de la respuesta correcta.",
+                "difficulty": (i % 10) + 1,
+            } for i in range(questions_per_concept)])
+            db.insert("sessions", [{
+                "lesson_id": lesson["id"],
+                "name": f"Sesión {lesson_number}.{session_number}",
+                "order": session_number,
+                "number_of_questions": 10,
+                "question_selection_strategy": "random",
+                "concept_id": concept["id"],
+            }])
+
+
+def seed_users(auth: FakeAuth, count: int, password: str = "password123") -> List[Tuple[str, str]]:
+    """Create confirmed auth users with their profile rows. Returns (email, password) pairs."""
+    credentials = []
+    for i in range(count):
+        email = f"loadtest{i + 1}@example.com"
+        user = auth.create_user(email, password, confirmed=True)
+        auth.db.insert("users", [{"id": user["id"], "email": email, "username": f"loadtest{i + 1}"}])
+        credentials.append((email, password))
+    return credentials
+
+
+def seed_leagues(
+    db: FakeDatabase,
+    league_size: int = 50,
+    max_xp: int = 500,
+    user_ids: Optional[List[str]] = None,
+    tiers: Tuple[str, ...] = ("bronze",),
+    weeks_ago: int = 0
+) -> None:
+    """
+    Group users into active leagues with random weekly XP.
+
+    Args:
+        user_ids: Participants (defaults to every row of users)
+        tiers: League names, assigned to the leagues in turn
+        weeks_ago: 0 for the current week; 1 for last week's leagues, due for rollover
+    """
+    now = datetime.now(timezone.utc)
+    week_start = (now - timedelta(days=now.weekday(), weeks=weeks_ago)).replace(hour=0, minute=0, second=0, microsecond=0)
+    if user_ids is None:
+        user_ids = [row["id"] for row in db.tables["users"]]
+    for number, start in enumerate(range(0, len(user_ids), league_size)):
+        league = db.insert("leagues", [{
+            "league_name": tiers[number % len(tiers)],
+            "start_date": week_start.isoformat(),
+            "end_date": (week_start + timedelta(days=7)).isoformat(),
+            "promotion_threshold": 10,
+            "demotion_threshold": 5,
+            "active": True,
+        }])[0]
+        db.insert("league_participants", [
+            {"user_id": user_id, "league_id": league["id"], "xp_earned_this_week": random.randint(0, max_xp)}
+            for user_id in user_ids[start:start + league_size]
+        ])
+
+
+def seed_challenges(db: FakeDatabase) -> None:
+    """Seed the lightning round and mistake review templates described in Docs/challenges.md."""
+    db.insert("challenge_templates", [
+        {
+            "name": "Ronda Relampago",
+            "challenge_type": "lightning_round",
+            "description": "Responde a tantas preguntas como puedas en un tiempo limitado.",
+            "time_limit": 60,
+            "number_of_questions": 10,
+            "question_selection_algorithm": "random",
+            "xp_multiplier": 1.2,
+            "cooldown_period": 0,
+        },
+        {
+            "name": "Repaso de errores",
+            "challenge_type": "review_mistakes",
+            "description": "Vuelve a las preguntas que fallaste.",
+            "number_of_questions": 10,
+            "question_selection_algorithm": "error_review",
+            "unlock_criteria": {"min_level": 3},
+            "cooldown_period": 24,
+        },
+    ])
+
+
+def serve_in_background(db: FakeDatabase, auth: FakeAuth, latency_ms: float = 0.0) -> Tuple[str, str]:
+    """
+    Serve the fake from a daemon thread on a free local port.
+
+    Returns:
+        Tuple of (url, anon_key)
+    """
+    import socket
+    import threading
+
+    import uvicorn
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(
+        create_app(db, auth, latency_ms), host="127.0.0.1", port=port, log_level="warning"
+    ))
+    threading.Thread(target=server.run, name="fake-supabase", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    anon_key = sign_jwt({"role": "anon", "iss": "fake-supabase", "iat": int(time.time())})
+    return f"http://127.0.0.1:{port}", anon_key
+
+
+# ============================================================================
+# APP
+# ============================================================================
+
+def _prefer(request: Request) -> Dict[str, str]:
+    prefs = {}
+    for part in request.headers.get("prefer", "").split(","):
+        if "=" in part:
+            key, value = part.strip().split("=", 1)
+            prefs[key] = value
+    return prefs
+
+
+def _filters(request: Request) -> List[Tuple[str, str]]:
+    return [(k, v) for k, v in request.query_params.multi_items() if k not in RESERVED_PARAMS]
+
+
+def _rows_response(request: Request, rows: List[Dict], total: Optional[int] = None, offset: int = 0, status_code: int = 200) -> Response:
+    headers = {}
+    if "count" in _prefer(request):
+        count = len(rows) if total is None else total
+        headers["Content-Range"] = f"{offset}-{offset + len(rows) - 1}/{count}" if rows else f"*/{count}"
+    if "application/vnd.pgrst.object+json" in request.headers.get("accept", ""):
+        if len(rows) != 1:
+            raise PostgrestError(
+                406, "PGRST116", "JSON object requested, multiple (or no) rows returned",
+                f"The result contains {len(rows)} rows"
+            )
+        return JSONResponse(rows[0], status_code=status_code, headers=headers)
+    if _prefer(request).get("return") == "minimal":
+        return Response(status_code=status_code if status_code != 200 else 204, headers=headers)
+    return JSONResponse(rows, status_code=status_code, headers=headers)
+
+
+def create_app(
+    db: FakeDatabase,
+    auth: FakeAuth,
+    latency_ms: float = 0.0,
+    jitter_ms: float = 0.0
+) -> FastAPI:
+    """Build the stand-in ASGI app over a database and auth store."""
+    app = FastAPI(title="Fake Supabase", docs_url=None, redoc_url=None, openapi_url=None)
+    request_counts: Dict[str, int] = defaultdict(int)
+
+    @app.middleware("http")
+    async def inject_latency(request: Request, call_next):
+        if not request.url.path.startswith("/__fake"):
+            request_counts[f"{request.method} {request.url.path}"] += 1
+            delay = latency_ms + random.uniform(0, jitter_ms)
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+        return await call_next(request)
+
+    @app.exception_handler(PostgrestError)
+    async def postgrest_error(request: Request, exc: PostgrestError):
+        return JSONResponse(
+            {"code": exc.code, "message": exc.message, "details": exc.details, "hint": None},
+            status_code=exc.status_code
+        )
+
+    # --- control -------------------------------------------------------------
+
+    @app.get("/__fake/stats")
+    async def stats():
+        return {
+            "requests": dict(sorted(request_counts.items())),
+            "rows": {name: len(rows) for name, rows in sorted(db.tables.items()) if rows},
+        }
+
+    @app.post("/__fake/stats/reset")
+    async def reset_stats():
+        request_counts.clear()
+        return Response(status_code=204)
+
+    # --- PostgREST -----------------------------------------------------------
+
+    @app.post("/rest/v1/rpc/{function}")
+    async def call_rpc(function: str, request: Request):
+        fn = RPC_FUNCTIONS.get(function)
+        if fn is None:
+            raise PostgrestError(404, "PGRST202", f"Could not find the function public.{function} in the schema cache")
+        body = await request.body()
+        result = fn(db, json.loads(body) if body else {})
+        return _rows_response(request, result) if isinstance(result, list) else JSONResponse(result)
+
+    @app.get("/rest/v1/{table}")
+    async def read(table: str, request: Request):
+        params = request.query_params
+        offset = int(params.get("offset", 0))
+        limit = int(params["limit"]) if "limit" in params else None
+        rows, total = db.select(table, params.get("select", "*"), _filters(request), params.get("order"), limit, offset)
+        return _rows_response(request, rows, total, offset)
+
+    @app.post("/rest/v1/{table}")
+    async def create(table: str, request: Request):
+        body = await request.json()
+        rows = body if isinstance(body, list) else [body]
+        upsert_on = None
+        if _prefer(request).get("resolution") == "merge-duplicates":
+            on_conflict = request.query_params.get("on_conflict")
+            upsert_on = tuple(c.strip() for c in on_conflict.split(",")) if on_conflict else db.schemas[table].primary_key
+        written = db.insert(table, rows, upsert_on)
+        return _rows_response(request, written, status_code=201)
+
+    @app.patch("/rest/v1/{table}")
+    async def modify(table: str, request: Request):
+        return _rows_response(request, db.update(table, await request.json(), _filters(request)))
+
+    @app.delete("/rest/v1/{table}")
+    async def remove(table: str, request: Request):
+        return _rows_response(request, db.delete(table, _filters(request)))
+
+    # --- GoTrue --------------------------------------------------------------
+
+    def bearer(request: Request) -> Optional[str]:
+        header = request.headers.get("authorization", "")
+        return header[7:] if header.lower().startswith("bearer ") else None
+
+    @app.post("/auth/v1/signup")
+    async def signup(request: Request):
+        body = await request.json()
+        try:
+            user = auth.create_user(body["email"], body["password"], body.get("data"))
+        except PostgrestError as e:
+            return auth_error(e.status_code, e.code, e.message)
+        return JSONResponse(auth.issue_session(user) if user["email_confirmed_at"] else auth.public_user(user))
+
+    @app.post("/auth/v1/token")
+    async def token(request: Request):
+        body = await request.json()
+        grant_type = request.query_params.get("grant_type")
+        if grant_type == "password":
+            user = auth.users_by_email.get(body.get("email", ""))
+            if user is None or user["_password"] != body.get("password"):
+                return auth_error(400, "invalid_credentials", "Invalid login credentials")
+            if not user["email_confirmed_at"]:
+                return auth_error(400, "email_not_confirmed", "Email not confirmed")
+            user["last_sign_in_at"] = utc_now()
+            return JSONResponse(auth.issue_session(user))
+        if grant_type == "refresh_token":
+            user_id = auth.refresh_tokens.pop(body.get("refresh_token", ""), None)
+            if user_id is None:
+                return auth_error(400, "refresh_token_not_found", "Invalid Refresh Token: Refresh Token Not Found")
+            return JSONResponse(auth.issue_session(auth.users_by_id[user_id]))
+        return auth_error(400, "unsupported_grant_type", f"Unsupported grant type: {grant_type}")
+
+    @app.get("/auth/v1/user")
+    async def get_user(request: Request):
+        user = auth.user_from_token(bearer(request))
+        if user is None:
+            return auth_error(401, "bad_jwt", "invalid JWT: unable to parse or verify signature")
+        return JSONResponse(auth.public_user(user))
+
+    @app.put("/auth/v1/user")
+    async def update_user(request: Request):
+        user = auth.user_from_token(bearer(request))
+        if user is None:
+            return auth_error(401, "bad_jwt", "invalid JWT: unable to parse or verify signature")
+        body = await request.json()
+        if body.get("password"):
+            user["_password"] = body["password"]
+        if body.get("data"):
+            user["user_metadata"].update(body["data"])
+        user["updated_at"] = utc_now()
+        return JSONResponse(auth.public_user(user))
+
+    @app.post("/auth/v1/logout")
+    async def logout():
+        return Response(status_code=204)
+
+    @app.post("/auth/v1/recover")
+    async def recover(request: Request):
+        body = await request.json()
+        if body.get("email") in auth.users_by_email:
+            auth.recovery_tokens[secrets.token_hex(16)] = body["email"]
+        return JSONResponse({})
+
+    @app.post("/auth/v1/verify")
+    async def verify(request: Request):
+        body = await request.json()
+        email = auth.recovery_tokens.pop(body.get("token_hash") or body.get("token") or "", None) or body.get("email")
+        user = auth.users_by_email.get(email or "")
+        if user is None:
+            return auth_error(403, "otp_expired", "Token has expired or is invalid")
+        user["email_confirmed_at"] = user["email_confirmed_at"] or utc_now()
+        return JSONResponse(auth.issue_session(user))
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local Supabase stand-in (PostgREST + GoTrue subset)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform random latency added on top")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for jitter and question order")
+    parser.add_argument("--lessons", type=int, default=10, help="Synthetic lessons to seed (0 for none)")
+    parser.add_argument("--sessions-per-lesson", type=int, default=5)
+    parser.add_argument("--questions-per-concept", type=int, default=20)
+    parser.add_argument("--users", type=int, default=10, help="Confirmed test users to create")
+    parser.add_argument("--users-file", help="Write email,password lines for speed_test.py LOAD_TEST_USERS")
+    parser.add_argument("--fixture", help="JSON file of {table: [rows]} loaded after the seed")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    random.seed(args.seed)
+
+    schemas, seeds = load_schema()
+    db = FakeDatabase(schemas, seeds)
+    auth = FakeAuth(db)
+    seed_catalog(db, args.lessons, args.sessions_per_lesson, args.questions_per_concept)
+    if args.fixture:
+        with open(args.fixture, encoding="utf-8") as f:
+            for table, rows in json.load(f).items():
+                db.insert(table, rows)
+    credentials = seed_users(auth, args.users)
+    seed_leagues(db)
+    seed_challenges(db)
+
+    if args.users_file:
+        with open(args.users_file, "w", encoding="utf-8") as f:
+            f.writelines(f"{email},{password}\n" for email, password in credentials)
+
+    anon_key = sign_jwt({"role": "anon", "iss": "fake-supabase", "iat": int(time.time())})
+    logger.info(f"Loaded {len(schemas)} tables, {sum(len(r) for r in db.tables.values())} rows, {len(credentials)} users")
+    print(f"\nSUPABASE_URL=http://{args.host}:{args.port}")
+    print(f"SUPABASE_KEY={anon_key}")
+    if credentials:
+        print(f"TEST_EMAIL={credentials[0][0]}\nTEST_PASSWORD={credentials[0][1]}\n")
+
+    uvicorn.run(create_app(db, auth, args.latency_ms, args.jitter_ms), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Gamification scheduler.
+Lives refill and streaks lapse lazily (both are computed on read), so nothing acts
+at the moment they change. The scheduler keeps one timer per user on two hierarchical
+TimerWheels: the next life refill (last_life_lost_at + life_refill_interval_minutes)
+and the streak reminder on the last day the streak can be kept (the day after
+last_streak_date, at streak_reminder_time UTC). When timers fall due the users are
+re-read in batches, still-relevant events become notifications for the batched
+notification writer, and the next timers are set.
+
+Timers come from a paged scan of user_gamification_stats, repeated every
+SCHEDULER_RELOAD_SECONDS, and are moved right away by this process's answers.
+The scheduler reads with the service role key, and exactly one process should run
+it (GAMIFICATION_SCHEDULER_ENABLED).
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from supabase import Client
+
+from lives_service import compute_lives
+from notification_service import notification_writer
+from timer_wheel import TimerWheel
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_TICK_SECONDS = 1.0
+# Users re-read per query
+SCHEDULER_BATCH_SIZE = 500
+# Rows per page of the stats scan
+SCHEDULER_LOAD_PAGE_SIZE = 1000
+# Timers are rebuilt from the database this often, picking up other processes' changes
+SCHEDULER_RELOAD_SECONDS = 3600
+# A refill found later than this after it happened is not notified any more
+SCHEDULER_REFILL_NOTIFY_WINDOW_SECONDS = 300
+
+STATS_COLUMNS = "user_id, lives, last_life_lost_at, current_streak, last_streak_date"
+
+
+@dataclass
+class SchedulerConfig:
+    max_lives: int = 5
+    refill_minutes: int = 240
+    streak_reminder_time: dt_time = dt_time(20, 0)
+
+
+def load_scheduler_config(supabase: Client) -> SchedulerConfig:
+    """Lives settings from learning_path_config, the reminder time from app_configuration."""
+    config = SchedulerConfig()
+    rows = supabase.table("learning_path_config")\
+        .select("config_key, config_value")\
+        .in_("config_key", ["max_lives", "life_refill_interval_minutes"])\
+        .execute().data or []
+    values = {row["config_key"]: row["config_value"] for row in rows}
+    config.max_lives = int(values.get("max_lives", config.max_lives))
+    config.refill_minutes = int(values.get("life_refill_interval_minutes", config.refill_minutes))
+
+    rows = supabase.table("app_configuration")\
+        .select("config_value")\
+        .eq("config_key", "streak_reminder_time")\
+        .execute().data or []
+    if rows:
+        try:
+            config.streak_reminder_time = dt_time.fromisoformat(rows[0]["config_value"])
+        except ValueError:
+            logger.warning("Invalid streak_reminder_time %r, using %s", rows[0]["config_value"], config.streak_reminder_time)
+    return config
+
+
+def streak_reminder_at(last_streak_date: date, reminder_time: dt_time) -> datetime:
+    """Any activity on the day after last_streak_date keeps the streak: remind on that day."""
+    return datetime.combine(last_streak_date + timedelta(days=1), reminder_time, tzinfo=timezone.utc)
+
+
+def _parse_date(value: Any) -> Optional[date]:
+    return date.fromisoformat(str(value)[:10]) if value else None
+
+
+def _chunks(items: List, size: int) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class GamificationScheduler:
+    """Process-wide life refill and streak reminder timers."""
+
+    def __init__(self):
+        self._refills = TimerWheel(tick_seconds=SCHEDULER_TICK_SECONDS)
+        self._streaks = TimerWheel(tick_seconds=SCHEDULER_TICK_SECONDS)
+        self._supabase: Optional[Client] = None
+        self._config: Optional[SchedulerConfig] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def pending(self) -> Dict[str, int]:
+        return {"refills": len(self._refills), "streak_reminders": len(self._streaks)}
+
+    def start(self, supabase: Client) -> None:
+        """Start scanning and firing timers; supabase must use the service role key."""
+        if self._tasks:
+            return
+        self._supabase = supabase
+        self._tasks = [asyncio.create_task(self._reload_loop()), asyncio.create_task(self._tick_loop())]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    # In-process events; no-ops unless the scheduler runs in this process
+
+    def record_lives(self, user_id: str, lives_status: Dict[str, Any]) -> None:
+        """Lives changed (a life was lost): move the user's refill timer."""
+        if self.running:
+            self._set_refill(user_id, lives_status.get("next_life_at"))
+
+    def record_activity(self, user_id: str) -> None:
+        """The user was active today, so the streak is safe until tomorrow's reminder."""
+        if self.running and self._config is not None:
+            today = datetime.now(timezone.utc).date()
+            self._streaks.schedule(user_id, streak_reminder_at(today, self._config.streak_reminder_time).timestamp())
+
+    def _set_refill(self, user_id: str, next_life_at: Optional[datetime]) -> None:
+        if next_life_at is not None:
+            self._refills.schedule(user_id, next_life_at.timestamp())
+        else:
+            self._refills.cancel(user_id)
+
+    def _schedule_row(self, row: Dict[str, Any], now: datetime) -> None:
+        config = self._config
+        user_id = row["user_id"]
+        if row.get("lives") is not None and row.get("last_life_lost_at"):
+            self._set_refill(user_id, compute_lives(row, config.max_lives, config.refill_minutes, now)["next_life_at"])
+        last_streak_date = _parse_date(row.get("last_streak_date"))
+        if row.get("current_streak") and last_streak_date:
+            remind_at = streak_reminder_at(last_streak_date, config.streak_reminder_time)
+            # Reminders already past (sent, or the streak has lapsed) are not set again
+            if remind_at > now:
+                self._streaks.schedule(user_id, remind_at.timestamp())
+
+    # Loops
+
+    async def _reload_loop(self) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                await self._reload()
+            except Exception as e:
+                logger.error("Gamification scheduler reload failed: %s", e)
+            await asyncio.sleep(max(0.0, SCHEDULER_RELOAD_SECONDS - (time.monotonic() - started)))
+
+    async def _reload(self) -> None:
+        """
+        Schedule every user with lives to refill or a streak to keep, paging through
+        user_gamification_stats by user_id. Database reads run in a worker thread;
+        timers are only touched on the event loop.
+        """
+        self._config = await asyncio.to_thread(load_scheduler_config, self._supabase)
+        started = time.perf_counter()
+        rows_seen = 0
+        last_user_id = None
+        while True:
+            page = await asyncio.to_thread(self._load_page, last_user_id)
+            now = datetime.now(timezone.utc)
+            for row in page:
+                self._schedule_row(row, now)
+            rows_seen += len(page)
+            if len(page) < SCHEDULER_LOAD_PAGE_SIZE:
+                break
+            last_user_id = page[-1]["user_id"]
+        logger.info("Gamification timers loaded", extra={
+            "users": rows_seen,
+            **self.pending(),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000)
+        })
+
+    def _load_page(self, after_user_id: Optional[str]) -> List[Dict[str, Any]]:
+        query = self._supabase.table("user_gamification_stats")\
+            .select(STATS_COLUMNS)\
+            .or_(f"lives.lt.{self._config.max_lives},current_streak.gt.0")
+        if after_user_id is not None:
+            query = query.gt("user_id", after_user_id)
+        return query.order("user_id").limit(SCHEDULER_LOAD_PAGE_SIZE).execute().data or []
+
+    async def _tick_loop(self) -> None:
+        while True:
+            # Wake on tick boundaries, when timers fall due
+            await asyncio.sleep(SCHEDULER_TICK_SECONDS - time.time() % SCHEDULER_TICK_SECONDS)
+            refills = self._refills.advance()
+            streaks = self._streaks.advance()
+            if self._config is None:
+                continue
+            try:
+                for user_ids in _chunks(refills, SCHEDULER_BATCH_SIZE):
+                    await self._fire(user_ids, self._refill_notifications)
+                for user_ids in _chunks(streaks, SCHEDULER_BATCH_SIZE):
+                    await self._fire(user_ids, self._streak_notifications)
+            except Exception as e:
+                logger.error("Gamification scheduler failed to fire timers: %s", e)
+
+    async def _fire(self, user_ids: List[str], handler) -> None:
+        """Re-read the users whose timers fired, let handler decide, queue its notifications."""
+        rows = await asyncio.to_thread(self._read_stats, user_ids)
+        notifications = handler(rows, datetime.now(timezone.utc))
+        if notifications:
+            notification_writer.add(notifications)
+            logger.info("Gamification notifications queued", extra={
+                "type": notifications[0]["type"],
+                "count": len(notifications)
+            })
+
+    def _read_stats(self, user_ids: List[str]) -> List[Dict[str, Any]]:
+        return self._supabase.table("user_gamification_stats")\
+            .select(STATS_COLUMNS)\
+            .in_("user_id", user_ids)\
+            .execute().data or []
+
+    def _refill_notifications(self, rows: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+        """Notify when a life just refilled an empty or a now full set of lives."""
+        config = self._config
+        refill_seconds = config.refill_minutes * 60
+        notifications = []
+        for row in rows:
+            status = compute_lives(row, config.max_lives, config.refill_minutes, now)
+            self._set_refill(row["user_id"], status["next_life_at"])
+            if not status["refilled_lives"]:
+                continue
+            # The timer may be stale (lives lost elsewhere moved the baseline): only a
+            # refill that just happened counts
+            last_lost = datetime.fromisoformat(row["last_life_lost_at"].replace('Z', '+00:00'))
+            since_refill = (now - last_lost).total_seconds() - status["refilled_lives"] * refill_seconds
+            if status["lives"] + status["refilled_lives"] > config.max_lives or since_refill > SCHEDULER_REFILL_NOTIFY_WINDOW_SECONDS:
+                continue
+            if status["current_lives"] == config.max_lives:
+                message = "Tus vidas están completas. ¡Sigue practicando!"
+            elif status["current_lives"] == 1:
+                message = "Ya tienes una vida para volver a practicar."
+            else:
+                continue
+            notifications.append({
+                "user_id": row["user_id"],
+                "type": "lives_refilled",
+                "title": "Vidas recargadas",
+                "message": message
+            })
+        return notifications
+
+    def _streak_notifications(self, rows: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+        """Remind users whose streak ends tonight; users active today get tomorrow's timer."""
+        today = now.date()
+        notifications = []
+        for row in rows:
+            last_streak_date = _parse_date(row.get("last_streak_date"))
+            if last_streak_date == today:
+                # Active in another process since the timer was set
+                self._streaks.schedule(row["user_id"], streak_reminder_at(today, self._config.streak_reminder_time).timestamp())
+            elif last_streak_date == today - timedelta(days=1) and row.get("current_streak"):
+                notifications.append({
+                    "user_id": row["user_id"],
+                    "type": "streak_reminder",
+                    "title": "¡No pierdas tu racha!",
+                    "message": f"Llevas {row['current_streak']} días seguidos. Responde una pregunta hoy para mantener tu racha."
+                })
+        return notifications
+
+
+# Process-wide scheduler, started by the app lifespan when enabled
+gamification_scheduler = GamificationScheduler()
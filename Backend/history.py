@@ -2,10 +2,11 @@
 History management router for fetching user activity history.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Security, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Security, Query, Request
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials
 from supabase import Client
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple, AsyncIterator
 import logging
 from collections import defaultdict
 
@@ -17,14 +18,94 @@ from models import (
     NextLessonResponse, NextSessionResponse, AvailableSessionsResponse
 )
 from middleware import get_current_user, security
+from bulk_models import validate_rows, model_response
+from etags import (
+    get_catalog_version, get_user_progress_version,
+    make_etag, etag_matches, not_modified, set_etag
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/history", tags=["History"])
 
+# Page size used when streaming answered questions without an explicit limit
+ANSWERED_QUESTIONS_PAGE_SIZE = 500
+
+
+def fetch_answered_questions_page(
+    supabase: Client,
+    token: str,
+    user_id: str,
+    after_question_id: Optional[str],
+    limit: int
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Fetch one keyset page of answered questions merged with their stats.
+    
+    Args:
+        supabase: Supabase client instance
+        token: Access token used for RLS
+        user_id: The id of the user
+        after_question_id: Question id the previous page ended at (None for the first page)
+        limit: Maximum number of rows in the page
+        
+    Returns:
+        Tuple of (rows, next_cursor). next_cursor is None on the last page.
+    """
+    stats = supabase.postgrest.auth(token).rpc("get_answered_questions_stats_page", {
+        "p_user_id": user_id,
+        "p_after_question_id": after_question_id,
+        "p_limit": limit
+    }).execute().data or []
+    
+    if not stats:
+        return [], None
+    
+    question_ids = [record["question_id"] for record in stats]
+    questions_response = supabase.postgrest.auth(token).from_("questions").select("*").in_("id", question_ids).execute()
+    questions_map = {q["id"]: q for q in questions_response.data}
+    
+    rows = [
+        {**questions_map[record["question_id"]], **record}
+        for record in stats
+        if record["question_id"] in questions_map
+    ]
+    
+    # A short page means the keyset range is exhausted
+    next_cursor = stats[-1]["question_id"] if len(stats) == limit else None
+    return rows, next_cursor
+
+
+async def stream_answered_questions(
+    supabase: Client,
+    token: str,
+    user_id: str,
+    after_question_id: Optional[str],
+    page_size: int
+) -> AsyncIterator[bytes]:
+    """
+    Yield answered questions as NDJSON lines, one page of stats and questions at a time.
+    Only the current page is held in memory.
+    """
+    cursor = after_question_id
+    try:
+        while True:
+            rows, cursor = fetch_answered_questions_page(supabase, token, user_id, cursor, page_size)
+            for item in validate_rows(AnsweredQuestionStats, rows):
+                yield item.model_dump_json().encode("utf-8") + b"\n"
+            if cursor is None:
+                break
+    except Exception as e:
+        # Headers are already sent, so the stream can only be cut short
+        logger.error(f"Error streaming answered questions history: {str(e)}")
+
+
 @router.get("/questions/answered", response_model=AnsweredQuestionsHistoryResponse)
 async def get_answered_questions(
     user_id: Optional[str] = Query(None, description="The id of the user. If not provided, the logged in user id will be used."),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size. If provided, a single page is returned together with next_cursor."),
+    cursor: Optional[str] = Query(None, description="The next_cursor returned by the previous page."),
+    stream: bool = Query(False, description="Stream every answered question as NDJSON (application/x-ndjson), one page at a time."),
     current_user = Depends(get_current_user),
     supabase: Client = Depends(get_supabase),
     credentials: HTTPAuthorizationCredentials = Security(security)
@@ -32,6 +113,10 @@ async def get_answered_questions(
     """
     Returns a list of questions that the user has answered,
     including total attempts and correct answer counts.
+    
+    - Without **limit**/**cursor**, the full history is returned in one response.
+    - With **limit** and/or **cursor**, one keyset page is returned with a **next_cursor**.
+    - With **stream**, rows are streamed as NDJSON while pages are fetched.
     """
     try:
         target_user_id = user_id or current_user.id
@@ -40,14 +125,31 @@ async def get_answered_questions(
         import uuid
         try:
             uuid.UUID(str(target_user_id))
+            if cursor is not None:
+                uuid.UUID(cursor)
         except ValueError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid user_id format: {target_user_id}. Must be a valid UUID."
+                detail="Invalid user_id or cursor format. Must be a valid UUID."
             )
 
         token = credentials.credentials
         
+        if stream:
+            return StreamingResponse(
+                stream_answered_questions(supabase, token, str(target_user_id), cursor, limit or ANSWERED_QUESTIONS_PAGE_SIZE),
+                media_type="application/x-ndjson"
+            )
+        
+        if limit is not None or cursor is not None:
+            rows, next_cursor = fetch_answered_questions_page(
+                supabase, token, str(target_user_id), cursor, limit or ANSWERED_QUESTIONS_PAGE_SIZE
+            )
+            return model_response(AnsweredQuestionsHistoryResponse(
+                answered_questions=validate_rows(AnsweredQuestionStats, rows),
+                next_cursor=next_cursor
+            ))
+        
         # Call the optimized RPC for server-side aggregation with authentication
         response = supabase.postgrest.auth(token).rpc("get_answered_questions_stats", {"p_user_id": str(target_user_id)}).execute()
         
@@ -64,15 +166,16 @@ async def get_answered_questions(
         questions_map = {q["id"]: q for q in questions_response.data}
         
         # Format response by combining RPC stats with question details
-        answered_questions = []
-        for record in data:
-            qid = record["question_id"]
-            if qid in questions_map:
-                # Combine full question data with stats
-                combined_data = {**questions_map[qid], **record}
-                answered_questions.append(AnsweredQuestionStats(**combined_data))
+        combined_rows = [
+            {**questions_map[record["question_id"]], **record}
+            for record in data
+            if record["question_id"] in questions_map
+        ]
         
-        return AnsweredQuestionsHistoryResponse(answered_questions=answered_questions)
+        # Validate all rows in one pass and skip response_model re-validation
+        return model_response(AnsweredQuestionsHistoryResponse(
+            answered_questions=validate_rows(AnsweredQuestionStats, combined_rows)
+        ))
 
     except HTTPException:
         # Re-raise HTTPExceptions (e.g., from validation) to let FastAPI handle them
@@ -131,12 +234,9 @@ async def get_passed_sessions(
             .in_("id", list(unique_sessions)) \
             .execute()
         
-        sessions = [
-            PassedSession(**item)
-            for item in sessions_response.data
-        ]
-        
-        return PassedSessionsResponse(sessions=sessions)
+        return model_response(PassedSessionsResponse(
+            sessions=validate_rows(PassedSession, sessions_response.data)
+        ))
 
     except HTTPException:
         raise
@@ -194,12 +294,9 @@ async def get_passed_lessons(
             .in_("id", list(unique_lessons)) \
             .execute()
         
-        lessons = [
-            PassedLesson(**item)
-            for item in lessons_response.data
-        ]
-        
-        return PassedLessonsResponse(lessons=lessons)
+        return model_response(PassedLessonsResponse(
+            lessons=validate_rows(PassedLesson, lessons_response.data)
+        ))
 
     except HTTPException:
         raise
@@ -351,6 +448,7 @@ async def get_next_lesson(
 
 @router.get("/sessions/available", response_model=AvailableSessionsResponse)
 async def get_available_sessions(
+    http_request: Request,
     user_id: Optional[str] = Query(None, description="The id of the user. If not provided, the logged in user id will be used."),
     current_user = Depends(get_current_user),
     supabase: Client = Depends(get_supabase),
@@ -364,6 +462,19 @@ async def get_available_sessions(
         target_user_id = user_id or current_user.id
         token = credentials.credentials
         
+        # 0. Answer 304 when neither the catalog nor the user's progress changed
+        etag = make_etag(
+            "sessions/available",
+            target_user_id,
+            await get_catalog_version(supabase, token, "sessions"),
+            await get_catalog_version(supabase, token, "lessons"),
+            await get_user_progress_version(
+                supabase, token, str(target_user_id), fresh="if-none-match" in http_request.headers
+            )
+        )
+        if etag_matches(http_request, etag):
+            return not_modified(etag)
+        
         # 1. Get IDs of sessions the user has passed (Call 1)
         history_response = supabase.postgrest.auth(token).from_("user_session_history") \
             .select("session_id") \
@@ -371,7 +482,7 @@ async def get_available_sessions(
             .eq("passed", True) \
             .execute()
         
-        passed_ids = list(set(item['session_id'] for item in history_response.data)) if history_response.data else []
+        passed_ids = sorted(set(item['session_id'] for item in history_response.data)) if history_response.data else []
         
         # 2. Fetch ALL sessions with their lesson info (Call 2)
         # This gives us everything we need for sequencing and display
@@ -414,11 +525,13 @@ async def get_available_sessions(
         # Sort lessons by order
         sorted_lessons = sorted(lessons_map.values(), key=lambda x: x['order'])
         
-        return AvailableSessionsResponse(
-            sessions=[Session(**s) for s in available_sessions_data],
-            lessons=[Lesson(**l) for l in sorted_lessons],
+        response = model_response(AvailableSessionsResponse(
+            sessions=validate_rows(Session, available_sessions_data),
+            lessons=validate_rows(Lesson, sorted_lessons),
             passed_session_ids=passed_ids
-        )
+        ))
+        set_etag(response, etag)
+        return response
 
     except HTTPException:
         raise
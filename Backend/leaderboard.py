@@ -0,0 +1,208 @@
+"""
+Weekly league leaderboards.
+Each active league is held in memory as a sorted array of (-xp, user_id) keys, so a
+rank is one bisect, top-k and "around me" are slices, and an XP event moves a single
+entry instead of re-sorting the league. Boards are loaded from league_participants
+on first use and re-read periodically to pick up XP recorded by other workers.
+"""
+
+import asyncio
+import logging
+import time
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from supabase import Client
+
+from query_filters import fetch_all
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Boards and memberships older than this are re-read from the database
+LEADERBOARD_RESYNC_SECONDS = 60.0
+
+LEAGUE_COLUMNS = "id, league_name, start_date, end_date, promotion_threshold, demotion_threshold"
+
+
+@dataclass
+class RankedEntry:
+    rank: int
+    user_id: str
+    username: Optional[str]
+    xp: int
+
+
+class RankedLeague:
+    """
+    Order-statistic view of one league: participants sorted by weekly XP.
+
+    Ties share a rank (1, 2, 2, 4) and are listed by user id.
+
+    Args:
+        league: The leagues row
+        participants: (user_id, username, xp_earned_this_week) tuples
+    """
+
+    def __init__(self, league: Dict, participants: Iterable[Tuple[str, Optional[str], int]]):
+        self.league = league
+        self.loaded_at = time.monotonic()
+        self._xp: Dict[str, int] = {}
+        self._usernames: Dict[str, Optional[str]] = {}
+        for user_id, username, xp in participants:
+            self._xp[user_id] = xp
+            self._usernames[user_id] = username
+        # Ascending (-xp, user_id) is best first
+        self._order: List[Tuple[int, str]] = sorted((-xp, user_id) for user_id, xp in self._xp.items())
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._xp
+
+    def user_ids(self) -> List[str]:
+        return list(self._xp)
+
+    def xp(self, user_id: str) -> Optional[int]:
+        return self._xp.get(user_id)
+
+    def add_xp(self, user_id: str, delta: int) -> None:
+        """Move a participant to its new position after earning delta XP."""
+        old = self._xp.get(user_id)
+        if old is None or not delta:
+            return
+        del self._order[bisect_left(self._order, (-old, user_id))]
+        insort(self._order, (-(old + delta), user_id))
+        self._xp[user_id] = old + delta
+
+    def rank(self, user_id: str) -> Optional[int]:
+        """1-based rank of a participant, None if not in this league."""
+        xp = self._xp.get(user_id)
+        if xp is None:
+            return None
+        # (-xp,) sorts before every (-xp, user_id): the first entry with this score
+        return bisect_left(self._order, (-xp,)) + 1
+
+    def _entries(self, start: int, stop: int) -> List[RankedEntry]:
+        entries = []
+        for neg_xp, user_id in self._order[max(0, start):stop]:
+            entries.append(RankedEntry(bisect_left(self._order, (neg_xp,)) + 1, user_id, self._usernames.get(user_id), -neg_xp))
+        return entries
+
+    def top(self, k: int) -> List[RankedEntry]:
+        """The k best placed participants."""
+        return self._entries(0, k)
+
+    def around(self, user_id: str, radius: int) -> List[RankedEntry]:
+        """The participant with up to radius neighbours above and below."""
+        xp = self._xp.get(user_id)
+        if xp is None:
+            return []
+        position = bisect_left(self._order, (-xp, user_id))
+        return self._entries(position - radius, position + radius + 1)
+
+
+class Leaderboards:
+    """Process-wide registry of the active leagues' ranked boards."""
+
+    def __init__(self):
+        self._boards: Dict[str, RankedLeague] = {}
+        # user_id -> (league_id or None, loaded_at)
+        self._membership: Dict[str, Tuple[Optional[str], float]] = {}
+        self._active: Dict[str, Dict] = {}
+        self._active_loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _stale(loaded_at: Optional[float]) -> bool:
+        return loaded_at is None or time.monotonic() - loaded_at > LEADERBOARD_RESYNC_SECONDS
+
+    def _active_leagues(self, supabase: Client, token: str) -> Dict[str, Dict]:
+        if self._stale(self._active_loaded_at):
+            rows = supabase.postgrest.auth(token).from_("leagues")\
+                .select(LEAGUE_COLUMNS)\
+                .eq("active", True)\
+                .execute().data or []
+            self._active = {row["id"]: row for row in rows}
+            self._active_loaded_at = time.monotonic()
+        return self._active
+
+    @traced("leaderboard.current_league")
+    async def current_league_id(self, supabase: Client, token: str, user_id: str) -> Optional[str]:
+        """Id of the active league the user takes part in, if any."""
+        cached = self._membership.get(user_id)
+        if cached and not self._stale(cached[1]):
+            return cached[0]
+
+        active = self._active_leagues(supabase, token)
+        league_id = None
+        if active:
+            rows = supabase.postgrest.auth(token).from_("league_participants")\
+                .select("league_id")\
+                .eq("user_id", user_id)\
+                .in_("league_id", list(active))\
+                .limit(1)\
+                .execute().data or []
+            league_id = rows[0]["league_id"] if rows else None
+        self._membership[user_id] = (league_id, time.monotonic())
+        return league_id
+
+    @traced("leaderboard.board")
+    async def board(self, supabase: Client, token: str, league_id: str) -> Optional[RankedLeague]:
+        """The ranked board of an active league, loading or re-reading it when stale."""
+        board = self._boards.get(league_id)
+        if board and not self._stale(board.loaded_at):
+            return board
+
+        async with self._lock:
+            # Another request may have loaded it while we waited
+            board = self._boards.get(league_id)
+            if board and not self._stale(board.loaded_at):
+                return board
+            league = self._active_leagues(supabase, token).get(league_id)
+            if league is None:
+                self._boards.pop(league_id, None)
+                return None
+            board = self._load(supabase, token, league)
+            self._boards[league_id] = board
+            return board
+
+    def _load(self, supabase: Client, token: str, league: Dict) -> RankedLeague:
+        started = time.perf_counter()
+        rows = fetch_all(
+            lambda: supabase.postgrest.auth(token).from_("league_participants")
+            .select("id, user_id, xp_earned_this_week, users(username)")
+            .eq("league_id", league["id"])
+        )
+        board = RankedLeague(league, (
+            (row["user_id"], (row.get("users") or {}).get("username"), row["xp_earned_this_week"] or 0)
+            for row in rows
+        ))
+        for user_id in board.user_ids():
+            self._membership[user_id] = (league["id"], board.loaded_at)
+        logger.info(
+            "Leaderboard loaded: league %s, %d participants in %.1f ms",
+            league["id"], len(board), (time.perf_counter() - started) * 1000
+        )
+        return board
+
+    def record_xp(self, user_id: str, xp: int) -> None:
+        """Apply an XP event to the user's board, if it is loaded in this process."""
+        cached = self._membership.get(user_id)
+        if not cached or cached[0] is None:
+            return
+        board = self._boards.get(cached[0])
+        if board is not None:
+            board.add_xp(user_id, xp)
+
+    def invalidate(self) -> None:
+        """Drop every board and membership, e.g. after a league rollover."""
+        self._boards.clear()
+        self._membership.clear()
+        self._active_loaded_at = None
+
+
+# Process-wide leaderboards
+leaderboards = Leaderboards()
@@ -0,0 +1,303 @@
+"""
+Weekly league rollover.
+Closes every active league whose week has ended: all participants are loaded and
+ranked in one in-memory pass, promotions and demotions are decided from the league
+thresholds, and the results, the next week's leagues and their participant rows are
+written with chunked bulk statements (never one statement per user).
+
+Run it from a scheduler shortly after the week ends (league_week_start_day, UTC),
+with SUPABASE_SERVICE_KEY set, since league writes are restricted by RLS:
+    5 0 * * 1  cd /srv/polilingo/Backend && python league_rollover.py
+
+Usage:
+    python league_rollover.py [--dry-run] [--seed 0]
+    python league_rollover.py --synthetic 100000    # timed run against a seeded fake Supabase
+"""
+
+import argparse
+import logging
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from postgrest.types import ReturnMethod
+from supabase import Client, create_client
+
+from query_filters import fetch_all
+
+logger = logging.getLogger(__name__)
+
+# League tiers, lowest first
+LEAGUE_TIERS = ("bronze", "silver", "gold", "diamond", "obsidian")
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+# Rows per bulk statement, and ids per `in` filter (kept well under URL length limits)
+ROLLOVER_CHUNK_SIZE = 1000
+ROLLOVER_ID_CHUNK = 200
+
+ROLLOVER_CONFIG_DEFAULTS = {
+    "league_week_start_day": "monday",
+    "league_promotion_threshold": "10",
+    "league_demotion_threshold": "5",
+    "league_size": "50",
+}
+
+
+@dataclass
+class RolloverPlan:
+    """Everything the rollover writes, computed before the first write."""
+    week_start: datetime
+    closed_league_ids: List[str] = field(default_factory=list)
+    results: List[Dict] = field(default_factory=list)
+    new_leagues: List[Dict] = field(default_factory=list)
+    new_participants: List[Dict] = field(default_factory=list)
+    promoted: int = 0
+    demoted: int = 0
+
+
+@dataclass
+class RolloverReport:
+    leagues: int = 0
+    participants: int = 0
+    promoted: int = 0
+    demoted: int = 0
+    new_leagues: int = 0
+    statements: int = 0
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def _chunks(items: List, size: int) -> Iterator[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def current_week_start(week_start_day: str, now: Optional[datetime] = None) -> datetime:
+    """Midnight UTC of the most recent league_week_start_day."""
+    now = now or datetime.now(timezone.utc)
+    weekday = WEEKDAYS.index(week_start_day.lower()) if week_start_day.lower() in WEEKDAYS else 0
+    days_back = (now.weekday() - weekday) % 7
+    return (now - timedelta(days=days_back)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def load_rollover_config(supabase: Client) -> Dict[str, str]:
+    rows = supabase.table("learning_path_config")\
+        .select("config_key, config_value")\
+        .in_("config_key", list(ROLLOVER_CONFIG_DEFAULTS))\
+        .execute().data or []
+    return {**ROLLOVER_CONFIG_DEFAULTS, **{row["config_key"]: row["config_value"] for row in rows}}
+
+
+def load_due_leagues(supabase: Client, week_start: datetime) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Load the active leagues that ended by week_start, with all their participants.
+
+    Returns:
+        Tuple of (leagues, participants)
+    """
+    leagues = list(fetch_all(
+        lambda: supabase.table("leagues")
+        .select("id, league_name, promotion_threshold, demotion_threshold")
+        .eq("active", True)
+        .lte("end_date", week_start.isoformat())
+    ))
+    participants: List[Dict] = []
+    for league_ids in _chunks([league["id"] for league in leagues], ROLLOVER_ID_CHUNK):
+        participants.extend(fetch_all(
+            lambda: supabase.table("league_participants")
+            .select("id, user_id, league_id, xp_earned_this_week")
+            .in_("league_id", league_ids)
+        ))
+    return leagues, participants
+
+
+def plan_rollover(
+    leagues: List[Dict],
+    participants: List[Dict],
+    config: Dict[str, str],
+    week_start: datetime,
+    rng: random.Random
+) -> RolloverPlan:
+    """
+    Rank every league and build the rows to write.
+
+    One sort orders all participants by (league, -xp, user_id); each league is then a
+    contiguous run. Tied participants share a rank. The top promotion_threshold (with
+    XP this week) move up a tier and the bottom demotion_threshold move down; the
+    highest and lowest tiers cannot be left upwards and downwards respectively.
+    """
+    plan = RolloverPlan(week_start=week_start, closed_league_ids=[league["id"] for league in leagues])
+    by_id = {league["id"]: league for league in leagues}
+    next_tier_members: Dict[str, List[Tuple[str, int]]] = {tier: [] for tier in LEAGUE_TIERS}
+
+    ordered = sorted(participants, key=lambda p: (p["league_id"], -(p["xp_earned_this_week"] or 0), p["user_id"]))
+    start = 0
+    while start < len(ordered):
+        league_id = ordered[start]["league_id"]
+        end = start
+        while end < len(ordered) and ordered[end]["league_id"] == league_id:
+            end += 1
+
+        league = by_id[league_id]
+        tier = LEAGUE_TIERS.index(league["league_name"])
+        size = end - start
+        promote_until = league["promotion_threshold"] if tier < len(LEAGUE_TIERS) - 1 else 0
+        demote_from = max(size - league["demotion_threshold"], promote_until) if tier > 0 else size
+
+        rank = 0
+        previous_xp = None
+        for position in range(size):
+            participant = ordered[start + position]
+            xp = participant["xp_earned_this_week"] or 0
+            if xp != previous_xp:
+                rank, previous_xp = position + 1, xp
+            promoted = position < promote_until and xp > 0
+            demoted = position >= demote_from
+            plan.promoted += promoted
+            plan.demoted += demoted
+            plan.results.append({"id": participant["id"], "current_rank": rank, "promoted": promoted, "demoted": demoted})
+            next_tier = tier + 1 if promoted else tier - 1 if demoted else tier
+            next_tier_members[LEAGUE_TIERS[next_tier]].append((participant["user_id"], rank))
+        start = end
+
+    league_size = max(1, int(config["league_size"]))
+    for tier, members in next_tier_members.items():
+        if not members:
+            continue
+        # Shuffle, then deal round-robin so the tier's leagues differ in size by at most one
+        rng.shuffle(members)
+        count = math.ceil(len(members) / league_size)
+        league_ids = [str(uuid.uuid4()) for _ in range(count)]
+        for league_id in league_ids:
+            plan.new_leagues.append({
+                "id": league_id,
+                "league_name": tier,
+                "start_date": week_start.isoformat(),
+                "end_date": (week_start + timedelta(days=7)).isoformat(),
+                "promotion_threshold": int(config["league_promotion_threshold"]),
+                "demotion_threshold": int(config["league_demotion_threshold"]),
+                # Activated once every row is written
+                "active": False,
+            })
+        for index, (user_id, previous_rank) in enumerate(members):
+            plan.new_participants.append({
+                "user_id": user_id,
+                "league_id": league_ids[index % count],
+                "xp_earned_this_week": 0,
+                "previous_rank": previous_rank,
+            })
+    return plan
+
+
+def apply_rollover(supabase: Client, plan: RolloverPlan) -> int:
+    """
+    Write a plan in chunked bulk statements.
+
+    The new leagues are created inactive and swapped in by one swap_league_week
+    call (a single UPDATE) after all rows are written, so an interrupted run leaves
+    last week's leagues in place. Inactive leagues left for the same week by an
+    interrupted run are discarded first, so a re-run does not duplicate them.
+
+    Returns:
+        Number of statements sent
+    """
+    week_start = plan.week_start.isoformat()
+    supabase.rpc("discard_pending_leagues", {"p_week_start": week_start}).execute()
+    statements = 1
+    for rows in _chunks(plan.new_leagues, ROLLOVER_CHUNK_SIZE):
+        supabase.table("leagues").insert(rows, returning=ReturnMethod.minimal).execute()
+        statements += 1
+    for rows in _chunks(plan.new_participants, ROLLOVER_CHUNK_SIZE):
+        supabase.table("league_participants").insert(rows, returning=ReturnMethod.minimal).execute()
+        statements += 1
+    for rows in _chunks(plan.results, ROLLOVER_CHUNK_SIZE):
+        supabase.rpc("apply_league_results", {"p_results": rows}).execute()
+        statements += 1
+    supabase.rpc("swap_league_week", {"p_week_start": week_start}).execute()
+    statements += 1
+    return statements
+
+
+def run_rollover(supabase: Client, dry_run: bool = False, seed: Optional[int] = None) -> RolloverReport:
+    """Roll every due league over to the current week."""
+    report = RolloverReport()
+
+    started = time.perf_counter()
+    config = load_rollover_config(supabase)
+    week_start = current_week_start(config["league_week_start_day"])
+    leagues, participants = load_due_leagues(supabase, week_start)
+    report.timings["load"] = time.perf_counter() - started
+    report.leagues, report.participants = len(leagues), len(participants)
+    if not leagues:
+        logger.info("No league ended before %s, nothing to roll over", week_start.date())
+        return report
+
+    started = time.perf_counter()
+    plan = plan_rollover(leagues, participants, config, week_start, random.Random(seed))
+    report.timings["rank"] = time.perf_counter() - started
+    report.promoted, report.demoted, report.new_leagues = plan.promoted, plan.demoted, len(plan.new_leagues)
+
+    if not dry_run:
+        started = time.perf_counter()
+        report.statements = apply_rollover(supabase, plan)
+        report.timings["write"] = time.perf_counter() - started
+
+    logger.info(
+        "League rollover: %d leagues, %d participants, %d promoted, %d demoted, %d new leagues, %d statements",
+        report.leagues, report.participants, report.promoted, report.demoted, report.new_leagues, report.statements
+    )
+    return report
+
+
+def print_report(report: RolloverReport) -> None:
+    print(f"Leagues closed:   {report.leagues}")
+    print(f"Participants:     {report.participants}")
+    print(f"Promoted:         {report.promoted}")
+    print(f"Demoted:          {report.demoted}")
+    print(f"New leagues:      {report.new_leagues}")
+    print(f"Write statements: {report.statements}")
+    for phase, seconds in report.timings.items():
+        print(f"{phase + ':':<18}{seconds:.2f} s")
+    print(f"{'total:':<18}{sum(report.timings.values()):.2f} s")
+
+
+def synthetic_client(participants: int) -> Client:
+    """A client for a fake Supabase seeded with last week's leagues across all tiers."""
+    import fake_supabase
+
+    schemas, seeds = fake_supabase.load_schema()
+    db = fake_supabase.FakeDatabase(schemas, seeds)
+    auth = fake_supabase.FakeAuth(db)
+    user_ids = [str(uuid.uuid4()) for _ in range(participants)]
+    fake_supabase.seed_leagues(db, user_ids=user_ids, tiers=LEAGUE_TIERS, weeks_ago=1)
+    url, anon_key = fake_supabase.serve_in_background(db, auth)
+    return create_client(url, anon_key)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Weekly league rollover")
+    parser.add_argument("--dry-run", action="store_true", help="Rank and report without writing")
+    parser.add_argument("--seed", type=int, help="Random seed for the new league groupings")
+    parser.add_argument("--synthetic", type=int, metavar="PARTICIPANTS",
+                        help="Time a run against a local fake Supabase seeded with this many participants")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.synthetic:
+        supabase = synthetic_client(args.synthetic)
+    else:
+        from config import settings
+        if not settings.supabase_service_key:
+            raise SystemExit("SUPABASE_SERVICE_KEY must be set: league writes are restricted by RLS")
+        supabase = create_client(settings.supabase_url, settings.supabase_service_key)
+
+    print_report(run_rollover(supabase, dry_run=args.dry_run, seed=args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+League router for the weekly league leaderboards.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Security
+from fastapi.security import HTTPAuthorizationCredentials
+from supabase import Client
+from typing import List
+import logging
+
+from config import get_supabase
+from models import LeaderboardEntry, LeagueLeaderboardResponse
+from middleware import get_current_user, security
+from leaderboard import RankedEntry, leaderboards
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/leagues", tags=["Leagues"])
+
+
+def _entries(entries: List[RankedEntry]) -> List[LeaderboardEntry]:
+    return [
+        LeaderboardEntry(rank=e.rank, user_id=e.user_id, username=e.username, xp_earned_this_week=e.xp)
+        for e in entries
+    ]
+
+
+@router.get("/leaderboard", response_model=LeagueLeaderboardResponse)
+async def get_leaderboard(
+    top: int = Query(10, ge=0, le=100, description="Number of best placed participants to return"),
+    radius: int = Query(3, ge=0, le=50, description="Participants to return above and below the user"),
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    Get the leaderboard of the authenticated user's active league.
+
+    Returns the league, the user's rank and weekly XP, the top participants and the
+    participants placed around the user. Ranks are served from an in-memory board
+    kept current with the XP earned through /learning/question/answer.
+    """
+    try:
+        token = credentials.credentials
+        user_id = current_user.id
+
+        league_id = await leaderboards.current_league_id(supabase, token, user_id)
+        board = await leaderboards.board(supabase, token, league_id) if league_id else None
+        if board is None or user_id not in board:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="You are not taking part in an active league"
+            )
+
+        league = board.league
+        return LeagueLeaderboardResponse(
+            league_id=league["id"],
+            league_name=league["league_name"],
+            start_date=league["start_date"],
+            end_date=league["end_date"],
+            promotion_threshold=league["promotion_threshold"],
+            demotion_threshold=league["demotion_threshold"],
+            participants=len(board),
+            my_rank=board.rank(user_id),
+            my_xp=board.xp(user_id),
+            top=_entries(board.top(top)),
+            around_me=_entries(board.around(user_id, radius))
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error fetching leaderboard: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch leaderboard"
+        )
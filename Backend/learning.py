@@ -5,7 +5,7 @@ Learning session management router for fetching questions for learning sessions.
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Security
 from fastapi.security import HTTPAuthorizationCredentials
 from supabase import Client
-from typing import List
+from typing import Dict, List
 import logging
 import uuid
 
@@ -14,12 +14,86 @@ from models import LearningQuestion, SessionQuestionsResponse, StartSessionReque
 from middleware import get_current_user, security
 from pool_algorithms import select_random, select_random_not_repeated, select_error_review
 from lives_service import LivesService
+from leaderboard import leaderboards
+from challenge_engine import answered_index
+from user_events import user_events
+from gamification_scheduler import gamification_scheduler
+from etags import invalidate_user_progress_version
+from tracing import span
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/learning", tags=["Learning"])
 
 
+def fetch_session_pool(supabase: Client, token: str, session: Dict) -> List[str]:
+    """
+    Return the ids of the questions matching a session's concept/heading/topic/block
+    and difficulty filters.
+    """
+    question_query = supabase.postgrest.auth(token).from_("questions").select("id")
+    
+    # Apply filters based on session parameters
+    if session.get("concept_id"):
+        question_query = question_query.eq("concept_id", session["concept_id"])
+    
+    if session.get("heading_id"):
+        # Need to join with concepts table to filter by heading_id
+        # First get concepts with this heading_id
+        concepts_response = supabase.postgrest.auth(token).from_("concepts").select("id").eq("heading_id", session["heading_id"]).execute()
+        concept_ids = [c["id"] for c in concepts_response.data]
+        if concept_ids:
+            question_query = question_query.in_("concept_id", concept_ids)
+        else:
+            # No concepts found for this heading, return empty
+            return []
+    
+    if session.get("topic_id"):
+        # Get headings -> concepts
+        headings_response = supabase.postgrest.auth(token).from_("headings").select("id").eq("topic_id", session["topic_id"]).execute()
+        heading_ids = [h["id"] for h in headings_response.data]
+        if heading_ids:
+            concepts_response = supabase.postgrest.auth(token).from_("concepts").select("id").in_("heading_id", heading_ids).execute()
+            concept_ids = [c["id"] for c in concepts_response.data]
+            if concept_ids:
+                question_query = question_query.in_("concept_id", concept_ids)
+            else:
+                return []
+        else:
+            return []
+    
+    if session.get("block_id"):
+        # Get topics -> headings -> concepts
+        topics_response = supabase.postgrest.auth(token).from_("topics").select("id").eq("block_id", session["block_id"]).execute()
+        topic_ids = [t["id"] for t in topics_response.data]
+        if topic_ids:
+            headings_response = supabase.postgrest.auth(token).from_("headings").select("id").in_("topic_id", topic_ids).execute()
+            heading_ids = [h["id"] for h in headings_response.data]
+            if heading_ids:
+                concepts_response = supabase.postgrest.auth(token).from_("concepts").select("id").in_("heading_id", heading_ids).execute()
+                concept_ids = [c["id"] for c in concepts_response.data]
+                if concept_ids:
+                    question_query = question_query.in_("concept_id", concept_ids)
+                else:
+                    return []
+            else:
+                return []
+        else:
+            return []
+    
+    # Apply difficulty filters
+    if session.get("min_difficulty") is not None:
+        question_query = question_query.gte("difficulty", session["min_difficulty"])
+    
+    if session.get("max_difficulty") is not None:
+        question_query = question_query.lte("difficulty", session["max_difficulty"])
+    
+    # Execute the query
+    logger.debug("Fetching questions matching session criteria")
+    questions_pool_response = question_query.execute()
+    return [q["id"] for q in questions_pool_response.data]
+
+
 @router.get("/session/questions", response_model=SessionQuestionsResponse)
 async def get_session_questions(
     session_id: str = Query(..., description="The id of the session"),
@@ -52,7 +126,7 @@ async def get_session_questions(
         user_id = current_user.id
         
         # Step 1: Fetch the session
-        logger.info(f"Fetching session {session_id}")
+        logger.debug("Fetching session %s", session_id)
         session_response = supabase.postgrest.auth(token).from_("sessions").select("*").eq("id", session_id).execute()
         
         if not session_response.data:
@@ -62,72 +136,12 @@ async def get_session_questions(
             )
         
         session = session_response.data[0]
-        logger.info(f"Session fetched: {session}")
+        logger.debug("Session fetched: %s", session)
         
         # Step 2: Fetch question ids that match the session parameters
-        question_query = supabase.postgrest.auth(token).from_("questions").select("id")
-        
-        # Apply filters based on session parameters
-        if session.get("concept_id"):
-            question_query = question_query.eq("concept_id", session["concept_id"])
-        
-        if session.get("heading_id"):
-            # Need to join with concepts table to filter by heading_id
-            # First get concepts with this heading_id
-            concepts_response = supabase.postgrest.auth(token).from_("concepts").select("id").eq("heading_id", session["heading_id"]).execute()
-            concept_ids = [c["id"] for c in concepts_response.data]
-            if concept_ids:
-                question_query = question_query.in_("concept_id", concept_ids)
-            else:
-                # No concepts found for this heading, return empty
-                return {"questions": []}
-        
-        if session.get("topic_id"):
-            # Get headings -> concepts
-            headings_response = supabase.postgrest.auth(token).from_("headings").select("id").eq("topic_id", session["topic_id"]).execute()
-            heading_ids = [h["id"] for h in headings_response.data]
-            if heading_ids:
-                concepts_response = supabase.postgrest.auth(token).from_("concepts").select("id").in_("heading_id", heading_ids).execute()
-                concept_ids = [c["id"] for c in concepts_response.data]
-                if concept_ids:
-                    question_query = question_query.in_("concept_id", concept_ids)
-                else:
-                    return {"questions": []}
-            else:
-                return {"questions": []}
-        
-        if session.get("block_id"):
-            # Get topics -> headings -> concepts
-            topics_response = supabase.postgrest.auth(token).from_("topics").select("id").eq("block_id", session["block_id"]).execute()
-            topic_ids = [t["id"] for t in topics_response.data]
-            if topic_ids:
-                headings_response = supabase.postgrest.auth(token).from_("headings").select("id").in_("topic_id", topic_ids).execute()
-                heading_ids = [h["id"] for h in headings_response.data]
-                if heading_ids:
-                    concepts_response = supabase.postgrest.auth(token).from_("concepts").select("id").in_("heading_id", heading_ids).execute()
-                    concept_ids = [c["id"] for c in concepts_response.data]
-                    if concept_ids:
-                        question_query = question_query.in_("concept_id", concept_ids)
-                    else:
-                        return {"questions": []}
-                else:
-                    return {"questions": []}
-            else:
-                return {"questions": []}
+        question_pool_ids = fetch_session_pool(supabase, token, session)
         
-        # Apply difficulty filters
-        if session.get("min_difficulty") is not None:
-            question_query = question_query.gte("difficulty", session["min_difficulty"])
-        
-        if session.get("max_difficulty") is not None:
-            question_query = question_query.lte("difficulty", session["max_difficulty"])
-        
-        # Execute the query
-        logger.info("Fetching questions matching session criteria")
-        questions_pool_response = question_query.execute()
-        question_pool_ids = [q["id"] for q in questions_pool_response.data]
-        
-        logger.info(f"Found {len(question_pool_ids)} questions in pool")
+        logger.debug("Found %d questions in pool", len(question_pool_ids))
         
         if not question_pool_ids:
             return {"questions": []}
@@ -136,40 +150,24 @@ async def get_session_questions(
         strategy = session.get("question_selection_strategy", "random")
         num_questions = session.get("number_of_questions", 10)
         
-        logger.info(f"Applying strategy: {strategy} to select {num_questions} questions")
+        logger.debug("Applying strategy %s to select %s questions", strategy, num_questions)
         
         if strategy == "random":
             selected_question_ids = select_random(num_questions, question_pool_ids)
         
         elif strategy == "random_not_repeated":
-            # Fetch answered question ids for this user
-            answered_response = supabase.postgrest.auth(token).from_("user_questions_history").select("question_id").eq("user_id", user_id).execute()
-            answered_ids = [q["question_id"] for q in answered_response.data]
-            selected_question_ids = select_random_not_repeated(num_questions, question_pool_ids, answered_ids)
+            # Answered question ids come from the cached answered-question index
+            answered_stats = await answered_index.get(supabase, token, user_id)
+            selected_question_ids = select_random_not_repeated(num_questions, question_pool_ids, list(answered_stats))
         
         elif strategy == "error_review":
-            # Fetch question statistics for error review
-            # Get all answered questions with correct/incorrect counts
-            user_history = supabase.postgrest.auth(token).from_("user_questions_history").select("question_id, correct").eq("user_id", user_id).execute()
-            
-            # Calculate stats for each question
-            question_stats_dict = {}
-            for record in user_history.data:
-                qid = record["question_id"]
-                if qid not in question_stats_dict:
-                    question_stats_dict[qid] = {"correct": 0, "wrong": 0}
-                
-                if record["correct"]:
-                    question_stats_dict[qid]["correct"] += 1
-                else:
-                    question_stats_dict[qid]["wrong"] += 1
-            
-            # Filter to only include questions in the pool
+            # Per-question correct/wrong counts come from the cached answered-question index
+            answered_stats = await answered_index.get(supabase, token, user_id)
             question_stats = []
             for qid in question_pool_ids:
-                if qid in question_stats_dict:
-                    stats = question_stats_dict[qid]
-                    question_stats.append((qid, stats["correct"], stats["wrong"]))
+                if qid in answered_stats:
+                    stats = answered_stats[qid]
+                    question_stats.append((qid, stats.correct, stats.wrong))
                 else:
                     # Never answered, treat as high priority
                     question_stats.append((qid, 0, 1))
@@ -178,10 +176,10 @@ async def get_session_questions(
         
         else:
             # Unknown strategy, default to random
-            logger.warning(f"Unknown strategy '{strategy}', defaulting to random")
+            logger.warning("Unknown strategy %r, defaulting to random", strategy)
             selected_question_ids = select_random(num_questions, question_pool_ids)
         
-        logger.info(f"Selected {len(selected_question_ids)} questions")
+        logger.debug("Selected %d questions", len(selected_question_ids))
         
         # Step 5: Fetch full question data
         if not selected_question_ids:
@@ -207,7 +205,7 @@ async def get_session_questions(
                 )
                 ordered_questions.append(learning_q)
         
-        logger.info(f"Returning {len(ordered_questions)} questions")
+        logger.info("Session questions served", extra={"session_id": session_id, "user_id": user_id, "questions": len(ordered_questions)})
         
         return SessionQuestionsResponse(questions=ordered_questions)
     
@@ -245,7 +243,7 @@ async def start_session(
         token = credentials.credentials
         user_id = current_user.id
         
-        logger.info(f"Starting session {request.session_id} for user {user_id}")
+        logger.debug("Starting session %s for user %s", request.session_id, user_id)
         
         # Verify session exists
         session_response = supabase.postgrest.auth(token).from_("sessions").select("id").eq("id", request.session_id).execute()
@@ -256,7 +254,7 @@ async def start_session(
             )
             
         # STEP: Mark any previous 'started' sessions for this user as 'abandoned'
-        logger.info(f"Checking for existing 'started' sessions to abandon for user {user_id}")
+        logger.debug("Abandoning started sessions for user %s", user_id)
         supabase.postgrest.auth(token).from_("user_session_history")\
             .update({"status": "abandoned"})\
             .eq("user_id", user_id)\
@@ -287,7 +285,7 @@ async def start_session(
         lives_service = LivesService(supabase, token)
         lives_status = await lives_service.get_current_lives(user_id)
         
-        logger.info(f"Session {request.session_id} started successfully with history id {new_id}")
+        logger.info("Session started", extra={"session_id": request.session_id, "user_id": user_id, "history_id": new_id})
         
         return StartSessionResponse(
             id=new_id, 
@@ -330,21 +328,7 @@ async def finish_session(
         token = credentials.credentials
         user_id = current_user.id
         
-        logger.info(f"Finishing session history {request.history_id} for user {user_id}")
-        
-        # Verify the session history exists and belongs to the user
-        response = supabase.postgrest.auth(token).from_("user_session_history")\
-            .select("id")\
-            .eq("user_id", user_id)\
-            .eq("id", request.history_id)\
-            .execute()
-            
-        if not response.data:
-            logger.warning(f"Session history {request.history_id} not found for user {user_id}")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Session history not found"
-            )
+        logger.debug("Finishing session history %s for user %s", request.history_id, user_id)
         
         from datetime import datetime
         
@@ -354,29 +338,34 @@ async def finish_session(
             "status": "completed"
         }
         
-        # Add user_id to ensure RLS compliance and extra safety
-        logger.info(f"Updating history_id={request.history_id} for user_id={user_id} with data={update_data}")
+        # Filter on user_id too so only the caller's own history can be finished.
+        # The update returns the changed rows, so an empty result means the row does not
+        # exist, belongs to someone else, or RLS blocked the UPDATE; no extra read needed.
+        logger.debug("Updating session history %s for user %s with %s", request.history_id, user_id, update_data)
         
         update_response = supabase.postgrest.auth(token).from_("user_session_history").update(update_data).eq("id", request.history_id).eq("user_id", user_id).execute()
         
-        logger.info(f"Update executed. Verifying update...")
-        
-        # Verify if the update actually happened by reading it back
-        verification = supabase.postgrest.auth(token).from_("user_session_history").select("completed_at, passed, status").eq("id", request.history_id).execute()
-        
-        if not verification.data:
-            logger.error(f"Verification failed: Row {request.history_id} not found after update")
-            raise HTTPException(status_code=500, detail="Row disappeared after update")
+        if not update_response.data:
+            logger.warning("Session history %s not found or not updatable for user %s", request.history_id, user_id)
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Session history not found"
+            )
             
-        row = verification.data[0]
+        row = update_response.data[0]
         if row.get("completed_at") is None or row.get("passed") != request.passed or row.get("status") != 'completed':
-             logger.error(f"Verification failed: Data mismatch. DB: {row}, Expected passed={request.passed}, status=completed")
+             logger.error(f"Update mismatch. DB: {row}, Expected passed={request.passed}, status=completed")
              raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Update operation returned success but data was not updated. Check RLS policies for UPDATE."
             )
 
-        logger.info(f"Session history {request.history_id} finished successfully (passed={request.passed})")
+        # The set of passed sessions may have changed, so drop the cached progress version
+        invalidate_user_progress_version(user_id)
+        user_events.record_activity(user_id)
+        gamification_scheduler.record_activity(user_id)
+
+        logger.info("Session finished", extra={"history_id": request.history_id, "user_id": user_id, "passed": request.passed})
         
         return
 
@@ -436,10 +425,11 @@ async def answer_question(
                 detail="No lives remaining. Wait for refill or purchase more."
             )
             
-        logger.info(f"User {user_id} answering question {request.question_id} in history {request.user_session_history_id}. Lives: {lives_status['current_lives']}")
+        logger.debug("User %s answering question %s in history %s, lives %s", user_id, request.question_id, request.user_session_history_id, lives_status["current_lives"])
         
         # Step 1: Fetch the question
-        question_response = supabase.postgrest.auth(token).from_("questions").select("correct_option, explanation").eq("id", request.question_id).execute()
+        with span("answer.fetch_question", question_id=request.question_id):
+            question_response = supabase.postgrest.auth(token).from_("questions").select("correct_option, explanation").eq("id", request.question_id).execute()
         
         if not question_response.data:
             raise HTTPException(
@@ -468,9 +458,10 @@ async def answer_question(
             "correct": is_correct
         }
         
-        logger.info(f"Recording question history: {history_data}")
+        logger.debug("Recording question history: %s", history_data)
         
-        insert_response = supabase.postgrest.auth(token).from_("user_questions_history").insert(history_data).execute()
+        with span("answer.record_history", correct=is_correct):
+            insert_response = supabase.postgrest.auth(token).from_("user_questions_history").insert(history_data).execute()
         
         if not insert_response.data:
             raise HTTPException(
@@ -481,19 +472,26 @@ async def answer_question(
         # Step 4: Determine XP gained
         xp_gained = 0
         if is_correct:
-            # Fetch XP reward from configuration (LivesService now caches this)
-            # But we need xp_per_correct_answer which is not in LivesService cache currently
-            # Let's add it to LivesService or just fetch it here.
-            # Actually, let's keep it simple for now as Step 4 is usually fast.
-            config_response = supabase.postgrest.auth(token).from_("learning_path_config").select("config_value").eq("config_key", "xp_per_correct_answer").execute()
-            if config_response.data:
-                xp_gained = int(config_response.data[0]["config_value"])
-            else:
-                xp_gained = 10 # Default fallback
+            # XP reward comes from the cached learning_path_config
+            xp_gained = await lives_service.get_config_int("xp_per_correct_answer", 10)
+            # The XP trigger credits the league row; move the user on the cached board too
+            leaderboards.record_xp(user_id, xp_gained)
+        answered_index.record(user_id, request.question_id, is_correct)
             
         # Step 5: Update lives if incorrect
         if not is_correct:
             lives_status = await lives_service.consume_life(user_id)
+            gamification_scheduler.record_lives(user_id, lives_status)
+        gamification_scheduler.record_activity(user_id)
+        # Push the XP, streak and lives change to the user's open event streams
+        user_events.record_answer(user_id, xp_gained, None if is_correct else lives_status)
+            
+        logger.info("Question answered", extra={
+            "user_id": user_id,
+            "question_id": request.question_id,
+            "correct": is_correct,
+            "lives": lives_status["current_lives"]
+        })
             
         return AnswerQuestionResponse(
             correct=is_correct, 
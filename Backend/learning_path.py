@@ -2,7 +2,7 @@
 Learning path management router for fetching and managing lessons and sessions.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Security
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Security, Request, Response
 from fastapi.security import HTTPAuthorizationCredentials
 from supabase import Client
 from typing import List
@@ -14,6 +14,8 @@ from models import (
     Session, SessionListResponse, SessionQueryResponse
 )
 from middleware import get_current_user, security
+from etags import catalog_etag, etag_matches, not_modified, set_etag
+from query_filters import compile_filters, EmptyResult
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +23,8 @@ router = APIRouter(prefix="/learning-path", tags=["Learning Path"])
 
 @router.get("/lessons/fetch", response_model=LessonListResponse)
 async def fetch_lessons(
+    http_request: Request,
+    http_response: Response,
     ids: str = Query(..., description="Comma-separated list of lesson IDs"),
     current_user = Depends(get_current_user),
     supabase: Client = Depends(get_supabase),
@@ -40,8 +44,15 @@ async def fetch_lessons(
             return LessonListResponse(lessons=[])
 
         token = credentials.credentials
+
+        # Answer 304 before querying when the client already holds this version
+        etag = await catalog_etag(supabase, token, "lessons", lesson_ids)
+        if etag_matches(http_request, etag):
+            return not_modified(etag)
+
         response = supabase.postgrest.auth(token).from_("lessons").select("*").in_("id", lesson_ids).execute()
         
+        set_etag(http_response, etag)
         return LessonListResponse(lessons=response.data)
 
     except Exception as e:
@@ -54,6 +65,8 @@ async def fetch_lessons(
 
 @router.get("/sessions/fetch", response_model=SessionListResponse)
 async def fetch_sessions(
+    http_request: Request,
+    http_response: Response,
     ids: str = Query(..., description="Comma-separated list of session IDs"),
     current_user = Depends(get_current_user),
     supabase: Client = Depends(get_supabase),
@@ -73,8 +86,15 @@ async def fetch_sessions(
             return SessionListResponse(sessions=[])
 
         token = credentials.credentials
+
+        # Answer 304 before querying when the client already holds this version
+        etag = await catalog_etag(supabase, token, "sessions", session_ids)
+        if etag_matches(http_request, etag):
+            return not_modified(etag)
+
         response = supabase.postgrest.auth(token).from_("sessions").select("*").in_("id", session_ids).execute()
         
+        set_etag(http_response, etag)
         return SessionListResponse(sessions=response.data)
 
     except Exception as e:
@@ -106,71 +126,24 @@ async def query_lessons(
     """
     try:
         token = credentials.credentials
-        # Select id, order, name, xp_reward to facilitate python-side filtering
-        query = supabase.postgrest.auth(token).from_("lessons").select("id, order, name, xp_reward")
-        
-        # Always filter for active lessons
-        query = query.eq("status", "active")
-        
-        response = query.execute()
-        data = response.data
-
-        # Python-side filtering due to PostgREST keywords and partial matches
-        filtered_data = []
-        for item in data:
-            match = True
-            
-            # Name filter
-            if name_text:
-                val = item.get('name') or ""
-                if name_exact:
-                    if val != name_text:
-                        match = False
-                else:
-                    if name_text.lower() not in val.lower():
-                        match = False
-            
-            if not match:
-                continue
-
-            # Order filter
-            if order_number is not None:
-                order_val = item.get('order')
-                if order_val is None:
-                    match = False
-                elif order_greater:
-                    if not (order_val > order_number):
-                        match = False
-                elif order_less:
-                    if not (order_val < order_number):
-                        match = False
-                else:
-                    if not (order_val == order_number):
-                        match = False
-            
-            if not match:
-                continue
+        # Only ids are selected; every filter is evaluated by the database
+        query = supabase.postgrest.auth(token).from_("lessons").select("id")
+        query = compile_filters(
+            query,
+            equals={
+                "status": "active"
+            },
+            text={
+                "name": (name_text, name_exact)
+            },
+            numbers={
+                "order": (order_number, order_greater, order_less),
+                "xp_reward": (xp_reward_number, xp_reward_greater, xp_reward_less)
+            }
+        )
 
-            # XP Reward filter
-            if xp_reward_number is not None:
-                xp_val = item.get('xp_reward')
-                if xp_val is None:
-                    match = False
-                elif xp_reward_greater:
-                    if not (xp_val > xp_reward_number):
-                        match = False
-                elif xp_reward_less:
-                    if not (xp_val < xp_reward_number):
-                        match = False
-                else:
-                    if not (xp_val == xp_reward_number):
-                        match = False
-            
-            if match:
-                filtered_data.append(item)
-        
-        ids = [item['id'] for item in filtered_data]
-        return LessonQueryResponse(ids=ids)
+        response = query.execute()
+        return LessonQueryResponse(ids=[item['id'] for item in response.data])
 
     except Exception as e:
         logger.error(f"Error querying lessons: {str(e)}")
@@ -208,47 +181,28 @@ async def query_sessions(
     """
     try:
         token = credentials.credentials
-        # Select id, order, name, number_of_questions to facilitate python-side filtering
-        # Also need to select columns if we want to filter them in Python, but for IDs we can filter in SQL if columns exist
-        # We will try filtering IDs in SQL
-        query = supabase.postgrest.auth(token).from_("sessions").select("id, order, name, number_of_questions")
-        
-        # ID list filters
-        import uuid
-        
-        # Helper to filter by list of IDs
-        def filter_by_ids(q, col_name, ids_str):
-            if ids_str:
-                valid_ids = []
-                for id_str in ids_str.split(','):
-                    id_clean = id_str.strip()
-                    if id_clean:
-                        try:
-                            uuid.UUID(id_clean)
-                            valid_ids.append(id_clean)
-                        except ValueError:
-                            pass
-                if valid_ids:
-                    return q.in_(col_name, valid_ids)
-                elif ids_str.strip():
-                     # Provided but invalid -> return empty result implicitly (by adding impossible condition or handling later)
-                     # Supabase-py doesn't have an easy "empty" query modifier other than invalid filter.
-                     # We'll return None to signal empty result
-                     return None
-            return q
-
-        # Apply ID filters
-        for col, val in [
-            ("lesson_id", lesson_ids),
-            ("concept_id", concept_ids),
-            ("heading_id", heading_ids),
-            ("topic_id", topic_ids),
-            ("block_id", block_ids)
-        ]:
-            if val:
-                query = filter_by_ids(query, col, val)
-                if query is None:
-                    return SessionQueryResponse(ids=[])
+        # Only ids are selected; every filter is evaluated by the database
+        query = supabase.postgrest.auth(token).from_("sessions").select("id")
+        query = compile_filters(
+            query,
+            equals={
+                "question_selection_strategy": question_selection_strategy
+            },
+            ids={
+                "lesson_id": lesson_ids,
+                "concept_id": concept_ids,
+                "heading_id": heading_ids,
+                "topic_id": topic_ids,
+                "block_id": block_ids
+            },
+            text={
+                "name": (name_text, name_exact)
+            },
+            numbers={
+                "order": (order_number, order_greater, order_less),
+                "number_of_questions": (number_of_questions_number, number_of_questions_greater, number_of_questions_less)
+            }
+        )
 
         # Difficulty range filters
         if minimum_difficulty_number is not None:
@@ -256,71 +210,13 @@ async def query_sessions(
         
         if maximum_difficulty_number is not None:
             query = query.lte("difficulty_range", maximum_difficulty_number)
-            
-        # Strategy filter
-        if question_selection_strategy:
-            query = query.eq("question_selection_strategy", question_selection_strategy)
 
         response = query.execute()
-        data = response.data
-
-        # Python-side filtering based on name, order, number_of_questions
-        filtered_data = []
-        for item in data:
-            match = True
-            
-            # Name filter
-            if name_text:
-                val = item.get('name') or ""
-                if name_exact:
-                    if val != name_text:
-                        match = False
-                else:
-                    if name_text.lower() not in val.lower():
-                        match = False
-            
-            if not match:
-                continue
-
-            # Order filter
-            if order_number is not None:
-                order_val = item.get('order')
-                if order_val is None:
-                    match = False
-                elif order_greater:
-                    if not (order_val > order_number):
-                        match = False
-                elif order_less:
-                    if not (order_val < order_number):
-                        match = False
-                else:
-                    if not (order_val == order_number):
-                        match = False
-            
-            if not match:
-                continue
-
-            # Number of questions filter
-            if number_of_questions_number is not None:
-                nq_val = item.get('number_of_questions')
-                if nq_val is None:
-                    match = False
-                elif number_of_questions_greater:
-                    if not (nq_val > number_of_questions_number):
-                        match = False
-                elif number_of_questions_less:
-                    if not (nq_val < number_of_questions_number):
-                        match = False
-                else:
-                    if not (nq_val == number_of_questions_number):
-                        match = False
-            
-            if match:
-                filtered_data.append(item)
-        
-        ids = [item['id'] for item in filtered_data]
-        return SessionQueryResponse(ids=ids)
+        return SessionQueryResponse(ids=[item['id'] for item in response.data])
 
+    except EmptyResult:
+        # An id filter was provided but none of its ids were valid
+        return SessionQueryResponse(ids=[])
     except Exception as e:
         logger.error(f"Error querying sessions: {str(e)}")
         raise HTTPException(
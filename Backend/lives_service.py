@@ -7,6 +7,7 @@ import logging
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, Tuple, Optional
 from supabase import Client
+from tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -15,34 +16,95 @@ _config_cache: Dict[str, Any] = {}
 _config_cache_last_updated: Optional[datetime] = None
 CONFIG_CACHE_TTL_MINUTES = 60
 
+
+async def get_learning_path_config(supabase: Client, token: str) -> Dict[str, Any]:
+    """
+    Return every learning_path_config value keyed by config_key, cached for
+    CONFIG_CACHE_TTL_MINUTES. The table is a handful of rows, so it is loaded whole.
+
+    On failure the last loaded values (or an empty dict) are returned and callers
+    fall back to their defaults.
+    """
+    global _config_cache, _config_cache_last_updated
+    
+    now = datetime.now(timezone.utc)
+    if (_config_cache_last_updated and 
+        (now - _config_cache_last_updated).total_seconds() < CONFIG_CACHE_TTL_MINUTES * 60):
+        return _config_cache
+
+    try:
+        response = supabase.postgrest.auth(token).from_("learning_path_config").select("config_key, config_value").execute()
+        
+        _config_cache = {item["config_key"]: item["config_value"] for item in response.data}
+        _config_cache_last_updated = now
+    except Exception as e:
+        logger.warning("Failed to fetch learning path config, using defaults: %s", e)
+    return _config_cache
+
+
+def compute_lives(stats_data: Dict[str, Any], max_lives: int, refill_minutes: int, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Lives status from the stored lives and last_life_lost_at: a life refills every
+    refill_minutes after last_life_lost_at, up to max_lives.
+    """
+    stored_lives = stats_data["lives"]
+    last_life_lost_at_str = stats_data["last_life_lost_at"]
+    last_life_lost_at = datetime.fromisoformat(last_life_lost_at_str.replace('Z', '+00:00'))
+
+    if stored_lives >= max_lives:
+        return {
+            "current_lives": max_lives,
+            "next_life_at": None,
+            "seconds_to_next_life": None,
+            "lives": stored_lives,
+            "refilled_lives": 0,
+            "last_life_lost_at": last_life_lost_at_str
+        }
+
+    # Calculate how many lives have refilled
+    now = now or datetime.now(timezone.utc)
+    elapsed_seconds = (now - last_life_lost_at).total_seconds()
+    refilled_lives = max(0, int(elapsed_seconds // (refill_minutes * 60)))
+
+    current_lives = min(max_lives, stored_lives + refilled_lives)
+
+    next_life_at = None
+    seconds_to_next_life = None
+
+    if current_lives < max_lives:
+        # Calculate when the NEXT life will be ready
+        # It's (refilled_lives + 1) intervals from the original last_life_lost_at
+        next_life_at = last_life_lost_at + timedelta(minutes=(refilled_lives + 1) * refill_minutes)
+        seconds_to_next_life = max(0, int((next_life_at - now).total_seconds()))
+
+    return {
+        "current_lives": current_lives,
+        "next_life_at": next_life_at,
+        "seconds_to_next_life": seconds_to_next_life,
+        "lives": stored_lives,
+        "refilled_lives": refilled_lives,
+        "last_life_lost_at": last_life_lost_at_str
+    }
+
+
 class LivesService:
     def __init__(self, supabase: Client, token: str):
         self.supabase = supabase
         self.token = token
 
+    async def get_config_int(self, key: str, default: int) -> int:
+        """Return an integer learning_path_config value, or default when it is missing."""
+        config = await get_learning_path_config(self.supabase, self.token)
+        return int(config.get(key, default))
+
+    @traced("LivesService.get_lives_config")
     async def get_lives_config(self) -> Tuple[int, int]:
         """Fetch max_lives and life_refill_interval_minutes from config with caching."""
-        global _config_cache, _config_cache_last_updated
-        
-        now = datetime.now(timezone.utc)
-        if (_config_cache_last_updated and 
-            (now - _config_cache_last_updated).total_seconds() < CONFIG_CACHE_TTL_MINUTES * 60):
-            return int(_config_cache.get("max_lives", 5)), int(_config_cache.get("life_refill_interval_minutes", 240))
-
-        try:
-            response = self.supabase.postgrest.auth(self.token).from_("learning_path_config").select("config_key, config_value").in_("config_key", ["max_lives", "life_refill_interval_minutes"]).execute()
-            
-            _config_cache = {item["config_key"]: item["config_value"] for item in response.data}
-            _config_cache_last_updated = now
-            
-            max_lives = int(_config_cache.get("max_lives", 5))
-            refill_minutes = int(_config_cache.get("life_refill_interval_minutes", 240))
-            
-            return max_lives, refill_minutes
-        except Exception as e:
-            logger.warning(f"Failed to fetch lives config, using defaults: {str(e)}")
-            return 5, 240
+        max_lives = await self.get_config_int("max_lives", 5)
+        refill_minutes = await self.get_config_int("life_refill_interval_minutes", 240)
+        return max_lives, refill_minutes
 
+    @traced("LivesService.get_current_lives")
     async def get_current_lives(self, user_id: str, stats_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Calculate current lives for a user in real-time.
@@ -60,48 +122,11 @@ class LivesService:
                 return {"current_lives": 5, "next_life_at": None, "lives": 5}
             stats_data = response.data[0]
             
-        stored_lives = stats_data["lives"]
-        last_life_lost_at_str = stats_data["last_life_lost_at"]
-        logger.info(f"get_current_lives for {user_id}: stored_lives={stored_lives}, last_lost={last_life_lost_at_str}")
-        last_life_lost_at = datetime.fromisoformat(last_life_lost_at_str.replace('Z', '+00:00'))
-        
+        logger.debug("get_current_lives for %s: stored_lives=%s, last_lost=%s", user_id, stats_data["lives"], stats_data["last_life_lost_at"])
         max_lives, refill_minutes = await self.get_lives_config()
-        
-        if stored_lives >= max_lives:
-            return {
-                "current_lives": max_lives,
-                "next_life_at": None,
-                "seconds_to_next_life": None,
-                "lives": stored_lives,
-                "refilled_lives": 0,
-                "last_life_lost_at": last_life_lost_at_str
-            }
-            
-        # Calculate how many lives have refilled
-        now = datetime.now(timezone.utc)
-        elapsed_seconds = (now - last_life_lost_at).total_seconds()
-        refilled_lives = max(0, int(elapsed_seconds // (refill_minutes * 60)))
-        
-        current_lives = min(max_lives, stored_lives + refilled_lives)
-        
-        next_life_at = None
-        seconds_to_next_life = None
-        
-        if current_lives < max_lives:
-            # Calculate when the NEXT life will be ready
-            # It's (refilled_lives + 1) intervals from the original last_life_lost_at
-            next_life_at = last_life_lost_at + timedelta(minutes=(refilled_lives + 1) * refill_minutes)
-            seconds_to_next_life = max(0, int((next_life_at - now).total_seconds()))
-            
-        return {
-            "current_lives": current_lives,
-            "next_life_at": next_life_at,
-            "seconds_to_next_life": seconds_to_next_life,
-            "lives": stored_lives,
-            "refilled_lives": refilled_lives,
-            "last_life_lost_at": last_life_lost_at_str
-        }
+        return compute_lives(stats_data, max_lives, refill_minutes)
 
+    @traced("LivesService.consume_life")
     async def consume_life(self, user_id: str) -> Dict[str, Any]:
         """
         Deduct one life from the user.
@@ -140,10 +165,10 @@ class LivesService:
             "last_life_lost_at": new_last_life_lost_at.isoformat().replace('+00:00', 'Z')
         }
         
-        logger.info(f"consume_life for {user_id}: current_lives was {current_lives}. New stored_lives: {new_stored_lives}. Update data: {update_data}")
+        logger.debug("consume_life for %s: current_lives was %s, update data: %s", user_id, current_lives, update_data)
         
         upd_res = self.supabase.postgrest.auth(self.token).from_("user_gamification_stats").update(update_data).eq("user_id", user_id).execute()
-        logger.info(f"consume_life for {user_id}: Update result: {upd_res.data}")
+        logger.debug("consume_life for %s: update result: %s", user_id, upd_res.data)
         
         # Return updated status
         return await self.get_current_lives(user_id, stats_data=update_data)
@@ -0,0 +1,167 @@
+"""
+Logging setup for the Polilingo backend.
+Records are handed to a queue on the calling thread and formatted and written by a
+background listener, so request handlers never block on stderr. Levels can be set
+per module, and fields passed through `extra=` are emitted as structured key/value
+pairs (or JSON with LOG_FORMAT=json).
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from typing import Dict, List
+
+# LogRecord attributes that are not user supplied `extra` fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listeners: List[logging.handlers.QueueListener] = []
+# logger name ("" for the root) -> the handlers its queue listener writes to
+_moved_handlers: Dict[str, List[logging.Handler]] = {}
+
+
+def record_fields(record: logging.LogRecord) -> Dict[str, object]:
+    """Return the structured fields attached to a record through `extra=`."""
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRIBUTES and not k.startswith("_")}
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Text formatter that appends `extra=` fields as key=value pairs.
+
+    logger.info("Question answered", extra={"user_id": uid, "correct": True})
+    -> ... - learning - INFO - Question answered user_id=... correct=True
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = record_fields(record)
+        if not fields:
+            return line
+        pairs = " ".join(f"{k}={v}" for k, v in fields.items())
+        head, sep, tail = line.partition("\n")
+        return f"{head} {pairs}{sep}{tail}"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with `extra=` fields as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **record_fields(record),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that only renders the message on the calling thread.
+
+    The stock prepare() runs the full formatter before enqueueing; here the
+    %-arguments are merged (so later mutations of logged objects cannot leak
+    into the output) and timestamps, field rendering and I/O are left to the
+    listener thread. With render=False the arguments are passed through as is,
+    for formatters that read record.args (uvicorn's access log).
+    """
+
+    def __init__(self, log_queue: queue.SimpleQueue, render: bool = True):
+        super().__init__(log_queue)
+        self.render = render
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        if self.render:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_module_levels(spec: str) -> Dict[str, str]:
+    """Parse "learning=DEBUG,httpx=WARNING" into {"learning": "DEBUG", "httpx": "WARNING"}."""
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _start_listener(handlers: List[logging.Handler], render: bool = True) -> logging.Handler:
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    return _QueueHandler(log_queue, render)
+
+
+def stop_logging() -> None:
+    """
+    Hand the moved handlers back to their loggers, then flush and stop the background
+    listeners. The queue handlers are detached first, so records logged during and
+    after shutdown are written directly instead of queued for a stopped listener.
+    """
+    for name, handlers in _moved_handlers.items():
+        named = logging.getLogger(name)
+        for handler in named.handlers[:]:
+            if isinstance(handler, _QueueHandler):
+                named.removeHandler(handler)
+        for handler in handlers:
+            named.addHandler(handler)
+    _moved_handlers.clear()
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def configure_logging(level: str = "INFO", module_levels: str = "", log_format: str = "text", stream=None) -> None:
+    """
+    Route all logging through a background queue listener.
+
+    Args:
+        level: Root log level
+        module_levels: Per-logger overrides, e.g. "learning=DEBUG,lives_service=WARNING"
+        log_format: "text" or "json"
+        stream: Output stream (defaults to stderr)
+    """
+    stop_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if log_format == "json" else StructuredFormatter(TEXT_FORMAT))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_start_listener([output]))
+    _moved_handlers[""] = [output]
+    root.setLevel(level.upper())
+
+    # Loggers that write through their own handlers (uvicorn's access log) are moved off the loop too
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        named = logging.getLogger(name)
+        direct = named.handlers[:]
+        if direct:
+            for handler in direct:
+                named.removeHandler(handler)
+            named.addHandler(_start_listener(direct, render=False))
+            _moved_handlers[name] = direct
+
+    for name, module_level in parse_module_levels(module_levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+
+atexit.register(stop_logging)
@@ -3,26 +3,89 @@ Polilingo Backend API
 Main FastAPI application entry point.
 """
 
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from fastapi.security import HTTPBearer
 import uvicorn
 import logging
 
-from config import settings
+from supabase import create_client
+
+from config import close_supabase, get_supabase, settings
 from auth import router as auth_router
 from users import router as users_router
 from history import router as history_router
 from learning import router as learning_router
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from syllabus import router as syllabus_router
+from learning_path import router as learning_path_router
+from leagues import router as leagues_router
+from challenges import router as challenges_router
+from matches import router as matches_router
+from notifications import router as notifications_router
+from events import router as events_router
+from compression import CompressionMiddleware
+from logging_setup import configure_logging, stop_logging
+from metrics import MetricsMiddleware, instrument_supabase, render_metrics
+from tracing import TraceExporter, TracingMiddleware
+from user_events import user_events
+from gamification_scheduler import gamification_scheduler
+from notification_service import notification_writer
+from warmup import warm_up, warmup_state
+
+# Configure logging (written from a background thread, levels per module)
+configure_logging(settings.log_level, settings.log_levels, settings.log_format)
 
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Create the Supabase client, then warm the caches in the background so /health
+    answers right away while /ready waits for the warm-up.
+    """
+    logger.info("Polilingo API starting up...")
+    logger.info("Supabase URL: %s", settings.supabase_url)
+    logger.info("CORS origins: %s", settings.cors_origins)
+
+    supabase = get_supabase()
+    # Count and time every Supabase call, tagged with the route that made it
+    instrument_supabase(supabase)
+
+    warmup_task = None
+    if settings.warmup_enabled:
+        warmup_task = asyncio.create_task(warm_up(supabase))
+    else:
+        warmup_state.mark_ready()
+
+    # Fire life refill events for open event streams
+    user_events.start()
+
+    # Notifications are written with the service role key (they have no INSERT policy)
+    if settings.supabase_service_key:
+        service_supabase = create_client(settings.supabase_url, settings.supabase_service_key)
+        notification_writer.start(service_supabase)
+        if settings.gamification_scheduler_enabled:
+            gamification_scheduler.start(service_supabase)
+    else:
+        logger.warning("SUPABASE_SERVICE_KEY is not set: notifications are not written")
+
+    yield
+
+    logger.info("Polilingo API shutting down...")
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    await user_events.stop()
+    await gamification_scheduler.stop()
+    await notification_writer.stop()
+    close_supabase()
+    stop_logging()
+
+
 # Initialize FastAPI app with security scheme
 app = FastAPI(
     title="Polilingo API",
@@ -30,6 +93,8 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
     swagger_ui_parameters={
         "persistAuthorization": True
     }
@@ -45,11 +110,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (brotli when available, gzip otherwise)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    gzip_level=settings.gzip_level,
+    brotli_quality=settings.brotli_quality,
+)
+
+# Record route -> service -> Supabase spans, keeping sampled, slow and failed traces
+if settings.tracing_enabled:
+    app.add_middleware(
+        TracingMiddleware,
+        exporter=TraceExporter(settings.trace_file, settings.trace_collector_url),
+        sample_rate=settings.trace_sample_rate,
+        slow_ms=settings.trace_slow_ms,
+    )
+
+# Count and time requests per route (outermost, so compression time is included)
+app.add_middleware(MetricsMiddleware, router=app.router)
+
 # Include routers
 app.include_router(auth_router, prefix=settings.api_prefix)
 app.include_router(users_router, prefix=settings.api_prefix)
 app.include_router(history_router, prefix=settings.api_prefix)
 app.include_router(learning_router, prefix=settings.api_prefix)
+app.include_router(syllabus_router, prefix=settings.api_prefix)
+app.include_router(learning_path_router, prefix=settings.api_prefix)
+app.include_router(leagues_router, prefix=settings.api_prefix)
+app.include_router(challenges_router, prefix=settings.api_prefix)
+app.include_router(matches_router, prefix=settings.api_prefix)
+app.include_router(notifications_router, prefix=settings.api_prefix)
+app.include_router(events_router, prefix=settings.api_prefix)
 
 
 @app.get("/")
@@ -68,18 +160,16 @@ async def health_check():
     return {"status": "healthy"}
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Run on application startup."""
-    logger.info("Polilingo API starting up...")
-    logger.info(f"Supabase URL: {settings.supabase_url}")
-    logger.info(f"CORS origins: {settings.cors_origins}")
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: 503 until the startup warm-up has finished."""
+    return ORJSONResponse(warmup_state.as_dict(), status_code=200 if warmup_state.ready else 503)
 
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Run on application shutdown."""
-    logger.info("Polilingo API shutting down...")
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics: request latency per route and Supabase calls per route."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,414 @@
+"""
+Friendly match engine.
+A running match lives in memory: its question list (seeded from the match id, so
+every process derives the same list), both players' answers and scores, and the
+WebSocket connections progress is broadcast to. When both players have connected
+the match is set to in_progress, and only pending matches are loaded, so a match is
+played at most once; nothing else is written while it is played. When it ends each
+player's answers are bulk-inserted into user_questions_history with one statement
+and the result is stored on friendly_matches.
+
+Both players of a match must reach the same process, so behind several workers the
+/matches/{id}/ws route needs sticky routing on the match id.
+"""
+
+import asyncio
+import logging
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set
+
+from fastapi import WebSocket
+from postgrest.types import ReturnMethod
+from supabase import Client
+
+from challenge_engine import answered_index
+from leaderboard import leaderboards
+from learning import fetch_session_pool
+from lives_service import LivesService
+from tracing import span
+from user_events import user_events
+from notification_service import notification_writer
+from gamification_scheduler import gamification_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Questions per match when the session does not set number_of_questions
+MATCH_DEFAULT_QUESTIONS = 10
+# A player away longer than this ends the match with the answers given so far
+MATCH_RECONNECT_SECONDS = 60
+# Matches are dropped from memory this long after being opened, finished or not
+MATCH_MAX_AGE_SECONDS = 3600
+
+
+class MatchError(Exception):
+    """A match cannot be joined or played; code is the WebSocket close code."""
+
+    def __init__(self, code: int, detail: str):
+        super().__init__(detail)
+        self.code = code
+        self.detail = detail
+
+
+@dataclass
+class PlayerState:
+    user_id: str
+    token: Optional[str] = None
+    sockets: Set[WebSocket] = field(default_factory=set)
+    # question_id -> user_questions_history row, written when the match ends
+    answers: Dict[str, Dict] = field(default_factory=dict)
+    correct: int = 0
+    forfeit_task: Optional[asyncio.Task] = None
+
+
+class MatchRoom:
+    """One friendly match being played."""
+
+    def __init__(self, match: Dict, questions: List[Dict], answer_keys: Dict[str, tuple]):
+        self.match = match
+        self.id = match["id"]
+        self.questions = questions
+        self.answer_keys = answer_keys
+        self.players = {
+            match["challenger_id"]: PlayerState(match["challenger_id"]),
+            match["opponent_id"]: PlayerState(match["opponent_id"]),
+        }
+        self.started_at: Optional[datetime] = None
+        self.finished = False
+        self.created = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def progress(self) -> Dict[str, Any]:
+        return {
+            "type": "progress",
+            "players": {
+                user_id: {"answered": len(p.answers), "correct": p.correct, "connected": bool(p.sockets)}
+                for user_id, p in self.players.items()
+            }
+        }
+
+    def scores(self) -> Dict[str, int]:
+        """Share of questions answered correctly, 0-100 as stored in friendly_matches."""
+        total = max(1, len(self.questions))
+        return {user_id: round(100 * p.correct / total) for user_id, p in self.players.items()}
+
+    async def send(self, user_id: str, message: Dict) -> None:
+        for websocket in list(self.players[user_id].sockets):
+            try:
+                await websocket.send_json(message)
+            except Exception:
+                self.players[user_id].sockets.discard(websocket)
+
+    async def broadcast(self, message: Dict) -> None:
+        for user_id in self.players:
+            await self.send(user_id, message)
+
+
+class MatchEngine:
+    """Process-wide registry of running friendly matches."""
+
+    def __init__(self):
+        self._rooms: Dict[str, MatchRoom] = {}
+        self._lock = asyncio.Lock()
+
+    async def open(self, supabase: Client, token: str, user_id: str, match_id: str) -> MatchRoom:
+        """Return the match's room, loading the match and its questions on first use."""
+        async with self._lock:
+            await self._expire(supabase)
+            room = self._rooms.get(match_id)
+            if room is None:
+                room = self._load(supabase, token, match_id)
+                self._rooms[match_id] = room
+        if user_id not in room.players:
+            raise MatchError(4403, "You are not a player of this match")
+        return room
+
+    def _load(self, supabase: Client, token: str, match_id: str) -> MatchRoom:
+        with span("match.load", match_id=match_id):
+            match_response = supabase.postgrest.auth(token).from_("friendly_matches")\
+                .select("id, challenger_id, opponent_id, session_id, status")\
+                .eq("id", match_id)\
+                .execute()
+            if not match_response.data:
+                raise MatchError(4404, "Match not found")
+            match = match_response.data[0]
+            if match["status"] != "pending":
+                raise MatchError(4409, f"Match is already {match['status']}")
+
+            session_response = supabase.postgrest.auth(token).from_("sessions").select("*").eq("id", match["session_id"]).execute()
+            if not session_response.data:
+                raise MatchError(4404, "Session not found")
+            session = session_response.data[0]
+
+            # Seeded from the match id: the list does not depend on which player loads it
+            pool = sorted(fetch_session_pool(supabase, token, session))
+            count = min(session.get("number_of_questions") or MATCH_DEFAULT_QUESTIONS, len(pool))
+            question_ids = random.Random(uuid.UUID(match_id).int).sample(pool, count)
+            if not question_ids:
+                raise MatchError(4409, "The match session has no questions")
+
+            questions_response = supabase.postgrest.auth(token).from_("questions")\
+                .select("id, text, option_a, option_b, option_c, correct_option, explanation")\
+                .in_("id", question_ids)\
+                .execute()
+        questions_map = {q["id"]: q for q in questions_response.data}
+        questions = [
+            {"id": qid, "question": q["text"], "a": q["option_a"], "b": q["option_b"], "c": q["option_c"]}
+            for qid in question_ids if (q := questions_map.get(qid))
+        ]
+        answer_keys = {qid: (q["correct_option"], q.get("explanation")) for qid, q in questions_map.items()}
+        logger.info("Match loaded", extra={"match_id": match_id, "questions": len(questions)})
+        return MatchRoom(match, questions, answer_keys)
+
+    async def _expire(self, supabase: Client) -> None:
+        """Drop rooms older than MATCH_MAX_AGE_SECONDS; a match still being played ends as abandoned."""
+        cutoff = time.monotonic() - MATCH_MAX_AGE_SECONDS
+        for room in [room for room in self._rooms.values() if room.created < cutoff]:
+            self._rooms.pop(room.id, None)
+            async with room.lock:
+                if room.finished:
+                    continue
+                if room.started_at is not None:
+                    await self._finish(supabase, room, "abandoned")
+                else:
+                    room.finished = True
+                    await self._close(room)
+
+    async def _start(self, supabase: Client, room: MatchRoom, token: str, websocket: WebSocket) -> None:
+        """
+        Set the match to in_progress, unless it is no longer pending (declined, or
+        started by another process). Called with room.lock held.
+        """
+        started_at = datetime.now(timezone.utc)
+        try:
+            response = supabase.postgrest.auth(token).from_("friendly_matches")\
+                .update({"status": "in_progress", "started_at": started_at.isoformat()})\
+                .eq("id", room.id)\
+                .eq("status", "pending")\
+                .execute()
+        except Exception as e:
+            logger.error("Error starting match %s: %s", room.id, e)
+            raise MatchError(4500, "Failed to start the match")
+        if not response.data:
+            # The caller closes this connection with the error; close the other player's
+            room.finished = True
+            self._rooms.pop(room.id, None)
+            for player in room.players.values():
+                player.sockets.discard(websocket)
+            await room.broadcast({"type": "error", "detail": "Match is no longer pending"})
+            await self._close(room)
+            raise MatchError(4409, "Match is no longer pending")
+        room.started_at = started_at
+
+    async def join(self, supabase: Client, room: MatchRoom, user_id: str, token: str, websocket: WebSocket) -> None:
+        """Attach a player's connection; the match starts once both players are connected."""
+        async with room.lock:
+            if room.finished:
+                raise MatchError(4409, "Match is already completed")
+            player = room.players[user_id]
+            player.token = token
+            player.sockets.add(websocket)
+            if player.forfeit_task is not None:
+                player.forfeit_task.cancel()
+                player.forfeit_task = None
+
+            if room.started_at is None:
+                if all(p.sockets for p in room.players.values()):
+                    try:
+                        await self._start(supabase, room, token, websocket)
+                    except MatchError:
+                        player.sockets.discard(websocket)
+                        raise
+                    await room.broadcast({
+                        "type": "start",
+                        "started_at": room.started_at.isoformat(),
+                        "questions": room.questions
+                    })
+                else:
+                    await room.send(user_id, {"type": "waiting"})
+            else:
+                # Reconnection: resend the questions and what the player already answered
+                await websocket.send_json({
+                    "type": "state",
+                    "started_at": room.started_at.isoformat(),
+                    "questions": room.questions,
+                    "answered": list(player.answers)
+                })
+                await room.broadcast(room.progress())
+
+    async def answer(self, supabase: Client, room: MatchRoom, user_id: str, message: Dict) -> None:
+        """Record an answer in memory, reply with the result and broadcast progress."""
+        question_id = message.get("question_id")
+        answer = message.get("answer")
+        async with room.lock:
+            if room.started_at is None or room.finished:
+                raise MatchError(4409, "Match is not running")
+            player = room.players[user_id]
+            answer_key = room.answer_keys.get(question_id)
+            if answer_key is None:
+                raise MatchError(4400, "Question is not part of this match")
+            if question_id in player.answers:
+                raise MatchError(4409, "Question already answered")
+            if answer not in ("a", "b", "c"):
+                raise MatchError(4400, "Answer must be 'a', 'b', or 'c'")
+            started_at = message.get("started_at")
+            if started_at is not None:
+                # Validated here: one bad timestamp would fail the end-of-match bulk insert
+                try:
+                    started_at = datetime.fromisoformat(started_at)
+                except (TypeError, ValueError):
+                    raise MatchError(4400, "started_at must be an ISO 8601 timestamp")
+                if started_at.tzinfo is None:
+                    started_at = started_at.replace(tzinfo=timezone.utc)
+                started_at = started_at.isoformat()
+
+            correct_option, explanation = answer_key
+            is_correct = answer == correct_option
+            now = datetime.now(timezone.utc).isoformat()
+            player.answers[question_id] = {
+                "user_id": user_id,
+                "friendly_match_id": room.id,
+                "question_id": question_id,
+                "started_at": started_at or now,
+                "answered_at": now,
+                "asked_for_explanation": bool(message.get("asked_for_explanation", False)),
+                "answer": answer,
+                "correct": is_correct
+            }
+            player.correct += is_correct
+
+            await room.send(user_id, {
+                "type": "answer_result",
+                "question_id": question_id,
+                "correct": is_correct,
+                "correct_answer": correct_option,
+                "explanation": explanation
+            })
+            await room.broadcast(room.progress())
+
+            if all(len(p.answers) == len(room.questions) for p in room.players.values()):
+                await self._finish(supabase, room, "completed")
+
+    async def leave(self, supabase: Client, room: MatchRoom, user_id: str, websocket: WebSocket) -> None:
+        """Detach a connection; a player gone for MATCH_RECONNECT_SECONDS ends the match."""
+        async with room.lock:
+            player = room.players[user_id]
+            player.sockets.discard(websocket)
+            if player.sockets or room.finished:
+                return
+            if room.started_at is None:
+                # Nothing was played: forget the room once both players are gone
+                if not any(p.sockets for p in room.players.values()):
+                    self._rooms.pop(room.id, None)
+                return
+            await room.broadcast(room.progress())
+            player.forfeit_task = asyncio.create_task(self._forfeit_after(supabase, room, user_id))
+
+    async def _forfeit_after(self, supabase: Client, room: MatchRoom, user_id: str) -> None:
+        await asyncio.sleep(MATCH_RECONNECT_SECONDS)
+        async with room.lock:
+            if not room.finished and not room.players[user_id].sockets:
+                await self._finish(supabase, room, "abandoned")
+
+    async def _finish(self, supabase: Client, room: MatchRoom, reason: str) -> None:
+        """
+        Write the match result: one bulk insert of answers per player (under the
+        player's own token, as RLS requires) and one update of friendly_matches to
+        the reason, completed or abandoned. A failure part way leaves the match
+        in_progress, which is never loaded again, so answers are not written twice.
+        Called with room.lock held.
+        """
+        room.finished = True
+        scores = self.scores_and_winner(room)
+        completed_at = datetime.now(timezone.utc)
+        challenger, opponent = room.match["challenger_id"], room.match["opponent_id"]
+
+        try:
+            with span("match.write_result", match_id=room.id):
+                for player in room.players.values():
+                    if player.answers and player.token:
+                        supabase.postgrest.auth(player.token).from_("user_questions_history")\
+                            .insert(list(player.answers.values()), returning=ReturnMethod.minimal)\
+                            .execute()
+                token = room.players[challenger].token or room.players[opponent].token
+                supabase.postgrest.auth(token).from_("friendly_matches").update({
+                    "status": reason,
+                    "completed_at": completed_at.isoformat(),
+                    "challenger_score": scores["scores"][challenger],
+                    "opponent_score": scores["scores"][opponent],
+                    "winner_id": scores["winner_id"]
+                }, returning=ReturnMethod.minimal).eq("id", room.id).eq("status", "in_progress").execute()
+        except Exception as e:
+            logger.error("Error writing match %s result: %s", room.id, e)
+            await room.broadcast({"type": "error", "detail": "Failed to save the match result"})
+            await self._close(room)
+            return
+        finally:
+            self._rooms.pop(room.id, None)
+
+        # The XP trigger credited the correct answers; keep the in-process caches in step
+        for player in room.players.values():
+            for row in player.answers.values():
+                answered_index.record(player.user_id, row["question_id"], row["correct"])
+            xp_gained = 0
+            if player.correct and player.token:
+                xp_gained = await LivesService(supabase, player.token).get_config_int("xp_per_correct_answer", 10) * player.correct
+                leaderboards.record_xp(player.user_id, xp_gained)
+            if player.answers:
+                user_events.record_answer(player.user_id, xp_gained)
+                gamification_scheduler.record_activity(player.user_id)
+
+        notification_writer.add([
+            {
+                "user_id": user_id,
+                "type": "match_result",
+                "title": "Partida terminada",
+                "message": (
+                    "Empate." if scores["winner_id"] is None
+                    else "¡Has ganado!" if scores["winner_id"] == user_id
+                    else "Has perdido."
+                ) + f" Tu puntuación: {scores['scores'][user_id]}.",
+                "related_entity_id": room.id,
+                "related_entity_type": "match",
+                "action_url": f"app://matches/{room.id}"
+            }
+            for user_id in room.players
+        ])
+
+        logger.info("Match finished", extra={
+            "match_id": room.id,
+            "reason": reason,
+            "challenger_score": scores["scores"][challenger],
+            "opponent_score": scores["scores"][opponent],
+            "winner_id": scores["winner_id"]
+        })
+        await room.broadcast({"type": "finished", "reason": reason, **scores})
+        await self._close(room)
+
+    @staticmethod
+    async def _close(room: MatchRoom) -> None:
+        """Close every connection and cancel pending forfeits (except the one running this)."""
+        for player in room.players.values():
+            if player.forfeit_task is not None and player.forfeit_task is not asyncio.current_task():
+                player.forfeit_task.cancel()
+            player.forfeit_task = None
+            for websocket in list(player.sockets):
+                try:
+                    await websocket.close()
+                except Exception:
+                    pass
+            player.sockets.clear()
+
+    @staticmethod
+    def scores_and_winner(room: MatchRoom) -> Dict[str, Any]:
+        scores = room.scores()
+        best = max(scores.values())
+        leaders = [user_id for user_id, score in scores.items() if score == best]
+        return {"scores": scores, "winner_id": leaders[0] if len(leaders) == 1 else None}
+
+
+# Process-wide match registry
+match_engine = MatchEngine()
@@ -0,0 +1,240 @@
+"""
+Friendly match router: challenge a friend over REST, play the match over a WebSocket.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Security, WebSocket, WebSocketDisconnect
+from fastapi.security import HTTPAuthorizationCredentials
+from supabase import Client
+from typing import Optional
+import logging
+import uuid
+
+from config import get_supabase
+from models import FriendlyMatch, CreateMatchRequest, MatchActionRequest, MatchListResponse
+from middleware import bearer_token, get_current_user, get_user_from_token, security
+from match_engine import MatchError, match_engine
+from notification_service import notification_writer
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/matches", tags=["Matches"])
+
+MATCH_COLUMNS = (
+    "id, challenger_id, opponent_id, session_id, status, created_at, started_at, completed_at, "
+    "challenger_score, opponent_score, winner_id"
+)
+
+
+def _validate_uuid(value: str, field: str) -> None:
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {field} format"
+        )
+
+
+@router.post("/create", response_model=FriendlyMatch, status_code=status.HTTP_201_CREATED)
+async def create_match(
+    request: CreateMatchRequest,
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    Challenge a friend to a match on a session's questions.
+
+    The opponent must be an accepted friend. The match is created pending and is
+    played once both players connect to /matches/{id}/ws.
+    """
+    try:
+        _validate_uuid(request.opponent_id, "opponent_id")
+        _validate_uuid(request.session_id, "session_id")
+
+        token = credentials.credentials
+        user_id = current_user.id
+        if request.opponent_id == user_id:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="You cannot challenge yourself"
+            )
+
+        # friends stores each pair once, lowest id first
+        user_id_1, user_id_2 = sorted([user_id, request.opponent_id])
+        friendship = supabase.postgrest.auth(token).from_("friends")\
+            .select("id")\
+            .eq("user_id_1", user_id_1)\
+            .eq("user_id_2", user_id_2)\
+            .eq("status", "accepted")\
+            .execute()
+        if not friendship.data:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You can only challenge accepted friends"
+            )
+
+        insert_response = supabase.postgrest.auth(token).from_("friendly_matches").insert({
+            "challenger_id": user_id,
+            "opponent_id": request.opponent_id,
+            "session_id": request.session_id,
+            "status": "pending"
+        }).execute()
+        if not insert_response.data:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to create match"
+            )
+
+        match_id = insert_response.data[0]["id"]
+        notification_writer.add([{
+            "user_id": request.opponent_id,
+            "type": "match_challenge",
+            "title": "Nuevo reto",
+            "message": "Un amigo te ha retado a una partida.",
+            "related_entity_id": match_id,
+            "related_entity_type": "match",
+            "action_url": f"app://matches/{match_id}"
+        }])
+
+        logger.info("Match created", extra={"match_id": match_id, "user_id": user_id, "opponent_id": request.opponent_id})
+        return FriendlyMatch(**insert_response.data[0])
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error creating match: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create match"
+        )
+
+
+@router.get("/list", response_model=MatchListResponse)
+async def list_matches(
+    status_filter: str = Query("pending", alias="status", description="Match status to list (pending, in_progress, completed, abandoned, declined)"),
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    List the user's matches with the given status, as challenger or opponent, newest first.
+    """
+    try:
+        token = credentials.credentials
+        user_id = current_user.id
+
+        response = supabase.postgrest.auth(token).from_("friendly_matches")\
+            .select(MATCH_COLUMNS)\
+            .or_(f"challenger_id.eq.{user_id},opponent_id.eq.{user_id}")\
+            .eq("status", status_filter)\
+            .order("created_at", desc=True)\
+            .limit(100)\
+            .execute()
+        return MatchListResponse(matches=[FriendlyMatch(**row) for row in response.data or []])
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error listing matches: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to list matches"
+        )
+
+
+@router.post("/decline", status_code=status.HTTP_204_NO_CONTENT)
+async def decline_match(
+    request: MatchActionRequest,
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    Decline a pending match. Only the opponent can decline.
+    """
+    try:
+        _validate_uuid(request.match_id, "match_id")
+
+        token = credentials.credentials
+        user_id = current_user.id
+
+        update_response = supabase.postgrest.auth(token).from_("friendly_matches")\
+            .update({"status": "declined"})\
+            .eq("id", request.match_id)\
+            .eq("opponent_id", user_id)\
+            .eq("status", "pending")\
+            .execute()
+        if not update_response.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Pending match not found"
+            )
+
+        logger.info("Match declined", extra={"match_id": request.match_id, "user_id": user_id})
+        return
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error declining match: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to decline match"
+        )
+
+
+@router.websocket("/{match_id}/ws")
+async def play_match(
+    websocket: WebSocket,
+    match_id: str,
+    token: Optional[str] = Query(None, description="Access token, when it cannot be sent as a Bearer header"),
+    supabase: Client = Depends(get_supabase)
+):
+    """
+    Play a friendly match.
+
+    Server messages: waiting, start (questions), state (on reconnection),
+    answer_result, progress (both players' answered/correct), finished (scores and
+    winner_id), error. Client messages: {"type": "answer", "question_id", "answer",
+    "started_at", "asked_for_explanation"}.
+    """
+    await websocket.accept()
+    try:
+        uuid.UUID(match_id)
+    except ValueError:
+        await websocket.close(code=4400, reason="Invalid match_id format")
+        return
+    # Browsers cannot set headers on a WebSocket, so the token may come as ?token=
+    access_token = bearer_token(websocket.headers, token)
+    user = get_user_from_token(supabase, access_token)
+    if user is None:
+        await websocket.close(code=4401, reason="Authentication failed")
+        return
+    user_id = user.id
+
+    try:
+        room = await match_engine.open(supabase, access_token, user_id, match_id)
+        await match_engine.join(supabase, room, user_id, access_token, websocket)
+    except MatchError as e:
+        await websocket.close(code=e.code, reason=e.detail)
+        return
+
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if message.get("type") != "answer":
+                await websocket.send_json({"type": "error", "detail": "Unknown message type"})
+                continue
+            try:
+                await match_engine.answer(supabase, room, user_id, message)
+            except MatchError as e:
+                await websocket.send_json({"type": "error", "detail": e.detail})
+            if room.finished:
+                return
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error("Error in match %s: %s", match_id, e)
+    finally:
+        await match_engine.leave(supabase, room, user_id, websocket)
@@ -0,0 +1,337 @@
+"""
+Request and upstream call metrics in the Prometheus text exposition format.
+Every PostgREST and GoTrue call made through the Supabase client is counted and
+timed, tagged with the table/RPC/auth endpoint and the route that made it, so N+1
+patterns show up as a high upstream calls per request count for a route.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from starlette.routing import Match, Router
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from supabase import Client
+
+# Prometheus client default buckets (seconds)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+CALL_COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# Upper bound on distinct paths remembered by the route resolver
+ROUTE_CACHE_SIZE = 1024
+
+UNMATCHED_ROUTE = "unmatched"
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric(ABC):
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _format_labels(self, values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.label_names, values)) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines of every labelled series."""
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.type_name}\n"
+        return header + "".join(line + "\n" for line in self.samples())
+
+
+class Counter(_Metric):
+    """Monotonic counter."""
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(k)} {v:g}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+    type_name = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(k)} {v:g}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed upper bounds."""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts incl. +Inf, sum)
+        self._values: Dict[LabelValues, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), s)) for k, (c, s) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {total:g}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+HTTP_REQUESTS = Counter(
+    "polilingo_http_requests_total", "HTTP requests handled.", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "polilingo_http_request_duration_seconds", "HTTP request latency.", ("method", "route")
+)
+HTTP_IN_FLIGHT = Gauge(
+    "polilingo_http_requests_in_flight", "HTTP requests currently being handled.", ("method", "route")
+)
+UPSTREAM_CALLS = Counter(
+    "polilingo_upstream_calls_total", "Supabase calls made.", ("route", "service", "target", "method", "status")
+)
+UPSTREAM_CALL_DURATION = Histogram(
+    "polilingo_upstream_call_duration_seconds", "Supabase call latency.", ("route", "service", "target")
+)
+UPSTREAM_CALLS_PER_REQUEST = Histogram(
+    "polilingo_upstream_calls_per_request", "Supabase calls made by one HTTP request.", ("route",),
+    buckets=CALL_COUNT_BUCKETS
+)
+UPSTREAM_TIME_PER_REQUEST = Histogram(
+    "polilingo_upstream_seconds_per_request", "Time one HTTP request spent waiting on Supabase.", ("route",)
+)
+
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text format."""
+    return "".join(metric.render() for metric in REGISTRY)
+
+
+# ============================================================================
+# PER-REQUEST ACCOUNTING
+# ============================================================================
+
+@dataclass
+class RequestStats:
+    """Upstream usage of the HTTP request being handled."""
+    route: str
+    upstream_calls: int = 0
+    upstream_seconds: float = 0.0
+
+
+_current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "polilingo_current_request", default=None
+)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """Return the upstream usage of the request being handled, if any."""
+    return _current_request.get()
+
+
+def upstream_target(url: httpx.URL) -> Tuple[str, str]:
+    """
+    Map a Supabase URL to (service, target).
+
+    /rest/v1/questions -> ("postgrest", "questions")
+    /rest/v1/rpc/get_answered_questions_stats -> ("postgrest", "rpc/get_answered_questions_stats")
+    /auth/v1/user -> ("auth", "user")
+    """
+    path = url.path
+    if "/rest/v1/" in path:
+        return "postgrest", path.split("/rest/v1/", 1)[1].strip("/") or "root"
+    if "/auth/v1/" in path:
+        return "auth", path.split("/auth/v1/", 1)[1].strip("/") or "root"
+    return "other", path.strip("/") or "root"
+
+
+def _on_request(request: httpx.Request) -> None:
+    request.extensions["polilingo_started"] = time.perf_counter()
+
+
+def _on_response(response: httpx.Response) -> None:
+    request = response.request
+    started = request.extensions.get("polilingo_started")
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats = _current_request.get()
+    route = stats.route if stats else "background"
+    service, target = upstream_target(request.url)
+
+    UPSTREAM_CALLS.inc(route=route, service=service, target=target, method=request.method, status=str(response.status_code))
+    UPSTREAM_CALL_DURATION.observe(elapsed, route=route, service=service, target=target)
+    if stats:
+        stats.upstream_calls += 1
+        stats.upstream_seconds += elapsed
+
+
+_extra_request_hooks: List[Callable[[httpx.Request], None]] = []
+_extra_response_hooks: List[Callable[[httpx.Response], None]] = []
+
+
+def register_upstream_hooks(
+    on_request: Callable[[httpx.Request], None],
+    on_response: Callable[[httpx.Response], None]
+) -> None:
+    """Install extra httpx hooks on every Supabase HTTP client instrumented from now on."""
+    _extra_request_hooks.append(on_request)
+    _extra_response_hooks.append(on_response)
+
+
+def _instrument_http_client(client: httpx.Client) -> None:
+    hooks = client.event_hooks
+    request_hooks = [_on_request, *_extra_request_hooks]
+    response_hooks = [_on_response, *_extra_response_hooks]
+    missing_request = [h for h in request_hooks if h not in hooks["request"]]
+    missing_response = [h for h in response_hooks if h not in hooks["response"]]
+    if missing_request or missing_response:
+        client.event_hooks = {
+            "request": hooks["request"] + missing_request,
+            "response": hooks["response"] + missing_response,
+        }
+
+
+def instrument_supabase(client: Client) -> None:
+    """
+    Time every PostgREST and GoTrue call made through a Supabase client.
+
+    The client recreates its PostgREST instance on every auth state change, so the
+    factory is wrapped and each new instance's HTTP session is instrumented too.
+    Latency is measured up to the response headers.
+    """
+    _instrument_http_client(client.auth._http_client)
+    _instrument_http_client(client.postgrest.session)
+
+    if getattr(client, "_polilingo_instrumented", False):
+        return
+    create_postgrest = client._init_postgrest_client
+
+    def init_postgrest_client(*args, **kwargs):
+        postgrest = create_postgrest(*args, **kwargs)
+        _instrument_http_client(postgrest.session)
+        return postgrest
+
+    client._init_postgrest_client = init_postgrest_client
+    client._polilingo_instrumented = True
+
+
+# ============================================================================
+# ASGI MIDDLEWARE
+# ============================================================================
+
+class MetricsMiddleware:
+    """
+    Record latency, status and in-flight count per route template, and the
+    upstream calls each request made.
+
+    Args:
+        app: Wrapped ASGI app
+        router: Router used to resolve request paths to route templates
+    """
+
+    def __init__(self, app: ASGIApp, router: Router):
+        self.app = app
+        self.router = router
+        self._route_cache: Dict[Tuple[str, str], str] = {}
+
+    def _resolve_route(self, scope: Scope) -> str:
+        key = (scope["method"], scope["path"])
+        route = self._route_cache.get(key)
+        if route is None:
+            route = UNMATCHED_ROUTE
+            for candidate in self.router.routes:
+                match, _ = candidate.matches(scope)
+                if match == Match.FULL:
+                    route = getattr(candidate, "path", UNMATCHED_ROUTE)
+                    break
+            if len(self._route_cache) < ROUTE_CACHE_SIZE:
+                self._route_cache[key] = route
+        return route
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._resolve_route(scope)
+        stats = RequestStats(route=route)
+        token = _current_request.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method=method, route=route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec(method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=str(status_code))
+            HTTP_REQUEST_DURATION.observe(elapsed, method=method, route=route)
+            UPSTREAM_CALLS_PER_REQUEST.observe(stats.upstream_calls, route=route)
+            UPSTREAM_TIME_PER_REQUEST.observe(stats.upstream_seconds, route=route)
+            _current_request.reset(token)
@@ -7,6 +7,7 @@ from fastapi import Depends, HTTPException, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from supabase import Client
 from config import get_supabase
+from tracing import span
 import logging
 
 logger = logging.getLogger(__name__)
@@ -36,7 +37,8 @@ async def get_current_user(
     
     try:
         # Get user from token
-        user_response = supabase.auth.get_user(token)
+        with span("auth.get_current_user"):
+            user_response = supabase.auth.get_user(token)
         
         if not user_response or not user_response.user:
             raise HTTPException(
@@ -69,3 +71,28 @@ async def get_current_user_token(
         The access token string
     """
     return credentials.credentials
+
+
+def bearer_token(headers, token: Optional[str] = None) -> Optional[str]:
+    """
+    Return token if given, else the Bearer token of the Authorization header.
+    For connections where browsers cannot set headers (WebSocket, EventSource),
+    which pass the token as ?token= instead.
+    """
+    if token:
+        return token
+    scheme, _, credentials = headers.get("authorization", "").partition(" ")
+    return credentials if scheme.lower() == "bearer" and credentials else None
+
+
+def get_user_from_token(supabase: Client, token: Optional[str]):
+    """Return the user the access token belongs to, or None when it is missing or invalid."""
+    if not token:
+        return None
+    try:
+        with span("auth.get_current_user"):
+            user_response = supabase.auth.get_user(token)
+    except Exception as e:
+        logger.warning("Authentication failed: %s", e)
+        return None
+    return user_response.user if user_response else None
@@ -179,6 +179,13 @@ class CreateUserResponse(BaseModel):
     user: UserProfileData
 
 
+class UsernameAvailabilityResponse(BaseModel):
+    """Response model for the username availability check."""
+    username: str
+    available: bool
+    reason: Optional[str] = None
+
+
 class UpdateUserRequest(BaseModel):
     """Request model for updating a user profile."""
     full_name: Optional[str] = Field(None, min_length=1, description="User's full name")
@@ -210,6 +217,109 @@ class Question(BaseModel):
     source: Optional[str] = None
 
 
+class SearchHit(BaseModel):
+    """Model for a single full-text search hit."""
+    kind: str = Field(..., description="block, topic, heading, concept or question")
+    id: str
+    field: str = Field(..., description="The field that matched (name, description, text or explanation)")
+
+
+class SearchResponse(BaseModel):
+    """Response model for a full-text search over the syllabus and questions."""
+    hits: List[SearchHit]
+
+
+class QuestionListResponse(BaseModel):
+    """Response model for a list of questions."""
+    questions: List[Question]
+
+
+class QuestionQueryResponse(BaseModel):
+    """Response model for a question query (ids only)."""
+    ids: List[str]
+
+
+# Syllabus Models
+
+class Block(BaseModel):
+    """Model for a syllabus Block."""
+    id: str
+    name: str
+    description: Optional[str] = None
+    order: int
+    status: str
+
+
+class BlockListResponse(BaseModel):
+    """Response model for a list of blocks."""
+    blocks: List[Block]
+
+
+class BlockQueryResponse(BaseModel):
+    """Response model for a block query (ids only)."""
+    ids: List[str]
+
+
+class Topic(BaseModel):
+    """Model for a syllabus Topic."""
+    id: str
+    block_id: str
+    name: str
+    description: Optional[str] = None
+    order: int
+    status: str
+
+
+class TopicListResponse(BaseModel):
+    """Response model for a list of topics."""
+    topics: List[Topic]
+
+
+class TopicQueryResponse(BaseModel):
+    """Response model for a topic query (ids only)."""
+    ids: List[str]
+
+
+class Heading(BaseModel):
+    """Model for a syllabus Heading."""
+    id: str
+    topic_id: str
+    name: str
+    description: Optional[str] = None
+    order: int
+    status: str
+
+
+class HeadingListResponse(BaseModel):
+    """Response model for a list of headings."""
+    headings: List[Heading]
+
+
+class HeadingQueryResponse(BaseModel):
+    """Response model for a heading query (ids only)."""
+    ids: List[str]
+
+
+class Concept(BaseModel):
+    """Model for a syllabus Concept."""
+    id: str
+    heading_id: str
+    name: str
+    description: Optional[str] = None
+    order: int
+    status: str
+
+
+class ConceptListResponse(BaseModel):
+    """Response model for a list of concepts."""
+    concepts: List[Concept]
+
+
+class ConceptQueryResponse(BaseModel):
+    """Response model for a concept query (ids only)."""
+    ids: List[str]
+
+
 # Learning Path Models
 
 class Lesson(BaseModel):
@@ -237,6 +347,59 @@ class Session(BaseModel):
     max_difficulty: Optional[int] = None
 
 
+class LessonListResponse(BaseModel):
+    """Response model for a list of lessons."""
+    lessons: List[Lesson]
+
+
+class LessonQueryResponse(BaseModel):
+    """Response model for a lesson query (ids only)."""
+    ids: List[str]
+
+
+class SessionListResponse(BaseModel):
+    """Response model for a list of sessions."""
+    sessions: List[Session]
+
+
+class SessionQueryResponse(BaseModel):
+    """Response model for a session query (ids only)."""
+    ids: List[str]
+
+
+# Syllabus Tree Models
+
+class ConceptNode(Concept):
+    """Concept node of the syllabus tree."""
+    pass
+
+
+class HeadingNode(Heading):
+    """Heading node of the syllabus tree with its concepts."""
+    concepts: List[ConceptNode] = Field(default_factory=list)
+
+
+class TopicNode(Topic):
+    """Topic node of the syllabus tree with its headings."""
+    headings: List[HeadingNode] = Field(default_factory=list)
+
+
+class BlockNode(Block):
+    """Block node of the syllabus tree with its topics."""
+    topics: List[TopicNode] = Field(default_factory=list)
+
+
+class LessonNode(Lesson):
+    """Lesson node of the learning path with its sessions."""
+    sessions: List[Session] = Field(default_factory=list)
+
+
+class SyllabusTreeResponse(BaseModel):
+    """Response model for the whole syllabus tree and learning path."""
+    blocks: List[BlockNode]
+    lessons: List[LessonNode]
+
+
 # History Models
 
 class AnsweredQuestionStats(Question):
@@ -248,6 +411,7 @@ class AnsweredQuestionStats(Question):
 class AnsweredQuestionsHistoryResponse(BaseModel):
     """Response model for a list of answered questions statistics."""
     answered_questions: List[AnsweredQuestionStats]
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, null on the last page or when not paginating")
 
 
 class PassedSession(Session):
@@ -343,3 +507,179 @@ class AnswerQuestionResponse(BaseModel):
     next_life_at: Optional[datetime] = Field(None, description="The time when the next life will be refilled")
     seconds_to_next_life: Optional[int] = Field(None, description="Seconds remaining until the next life refill")
 
+
+
+# League Models
+
+class LeaderboardEntry(BaseModel):
+    """One participant's placement in a league."""
+    rank: int = Field(..., description="1-based rank; tied participants share a rank")
+    user_id: str
+    username: Optional[str] = None
+    xp_earned_this_week: int
+
+
+class LeagueLeaderboardResponse(BaseModel):
+    """Response model for the current league's leaderboard."""
+    league_id: str
+    league_name: str
+    start_date: datetime
+    end_date: datetime
+    promotion_threshold: int = Field(..., description="Top N participants promoted at the end of the week")
+    demotion_threshold: int = Field(..., description="Bottom N participants demoted at the end of the week")
+    participants: int = Field(..., description="Number of participants in the league")
+    my_rank: int
+    my_xp: int
+    top: List[LeaderboardEntry] = Field(default_factory=list, description="Best placed participants")
+    around_me: List[LeaderboardEntry] = Field(default_factory=list, description="Participants placed next to the user")
+
+
+# Challenge Models
+
+class ChallengeTemplate(BaseModel):
+    """Model for a challenge template as shown to the user."""
+    id: str
+    name: str
+    challenge_type: str
+    description: str
+    icon_url: Optional[str] = None
+    time_limit: Optional[int] = Field(None, description="Seconds to answer every question; None for untimed challenges")
+    number_of_questions: int
+    scoring_formula: str
+    xp_multiplier: float
+    cooldown_period: Optional[int] = Field(None, description="Hours before the challenge can be played again")
+    unlocked: bool = Field(True, description="Whether the user meets the unlock_criteria")
+    unmet_criteria: List[str] = Field(default_factory=list, description="unlock_criteria keys the user does not meet yet")
+    available_at: Optional[datetime] = Field(None, description="End of the cooldown after the last attempt; None when not cooling down")
+
+
+class ChallengeListResponse(BaseModel):
+    """Response model for the available challenges."""
+    challenges: List[ChallengeTemplate]
+
+
+class StartChallengeRequest(BaseModel):
+    """Request model for starting a challenge."""
+    challenge_template_id: str = Field(..., description="The id of the challenge template")
+
+
+class StartChallengeResponse(BaseModel):
+    """Response model for starting a challenge."""
+    id: str = Field(..., description="The id of the created user challenge history row")
+    challenge_template_id: str
+    status: str = Field("started", description="The status of the challenge")
+    started_at: datetime
+    expires_at: Optional[datetime] = Field(None, description="Answers are not accepted after this time; None for untimed challenges")
+    number_of_questions: int = Field(..., description="Questions selected for this run, at most the template's number_of_questions")
+
+
+class ChallengeQuestionsResponse(BaseModel):
+    """Response model for the questions of a running challenge."""
+    questions: List[LearningQuestion]
+    seconds_remaining: Optional[int] = Field(None, description="Seconds left before the time limit; None for untimed challenges")
+
+
+class ChallengeAnswerRequest(BaseModel):
+    """Request model for answering a challenge question."""
+    history_id: str = Field(..., description="The id of the user challenge history row")
+    question_id: str = Field(..., description="The id of the question")
+    answer: str = Field(..., description="The answer (a, b, or c)")
+    started_at: datetime = Field(..., description="The time when the question started")
+    asked_for_explanation: bool = Field(False, description="Whether the user asked for an explanation")
+
+
+class ChallengeAnswerResponse(BaseModel):
+    """Response model for answering a challenge question."""
+    correct: bool = Field(..., description="Whether the answer is correct or not")
+    explanation: Optional[str] = Field(None, description="The explanation for the question")
+    correct_answer: str = Field(..., description="The correct answer (a, b, or c)")
+    xp_gained: int = Field(0, description="The amount of XP gained for this answer")
+    answered: int = Field(..., description="Questions answered so far in this challenge")
+    correct_answers: int = Field(..., description="Questions answered correctly so far in this challenge")
+    seconds_remaining: Optional[int] = Field(None, description="Seconds left before the time limit; None for untimed challenges")
+
+
+class FinishChallengeRequest(BaseModel):
+    """Request model for finishing a challenge."""
+    history_id: str = Field(..., description="The id of the user challenge history row")
+
+
+class FinishChallengeResponse(BaseModel):
+    """Response model for a finished challenge."""
+    id: str
+    status: str = "completed"
+    answered: int
+    correct_answers: int
+    number_of_questions: int
+    passed: bool = Field(..., description="Whether at least half of the questions were answered correctly")
+    timed_out: bool = Field(..., description="Whether the time limit ran out before the challenge was finished")
+
+
+# Friendly Match Models
+
+class FriendlyMatch(BaseModel):
+    """Model for a friendly match between two friends."""
+    id: str
+    challenger_id: str
+    opponent_id: str
+    session_id: str
+    status: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    challenger_score: Optional[int] = Field(None, description="Share of questions answered correctly, 0-100")
+    opponent_score: Optional[int] = Field(None, description="Share of questions answered correctly, 0-100")
+    winner_id: Optional[str] = Field(None, description="None for a draw or an unfinished match")
+
+
+class CreateMatchRequest(BaseModel):
+    """Request model for challenging a friend to a match."""
+    opponent_id: str = Field(..., description="The id of the friend to play against")
+    session_id: str = Field(..., description="The session whose questions the match uses")
+
+
+class MatchActionRequest(BaseModel):
+    """Request model for an action on an existing match."""
+    match_id: str = Field(..., description="The id of the friendly match")
+
+
+class MatchListResponse(BaseModel):
+    """Response model for the user's open matches."""
+    matches: List[FriendlyMatch]
+
+
+# Notification Models
+
+class Notification(BaseModel):
+    """Model for a user notification."""
+    id: str
+    type: str
+    title: str
+    message: str
+    related_entity_id: Optional[str] = None
+    related_entity_type: Optional[str] = None
+    action_url: Optional[str] = None
+    read_at: Optional[datetime] = None
+    created_at: datetime
+
+
+class NotificationListResponse(BaseModel):
+    """Response model for a page of the user's notifications."""
+    notifications: List[Notification]
+    unread_count: int
+
+
+class UnreadCountResponse(BaseModel):
+    """Response model for the notification badge."""
+    unread_count: int
+
+
+class MarkNotificationsReadRequest(BaseModel):
+    """Request model for marking notifications as read."""
+    notification_ids: Optional[List[str]] = Field(None, description="Notifications to mark read; all unread ones when omitted")
+
+
+class MarkNotificationsReadResponse(BaseModel):
+    """Response model for marking notifications as read."""
+    marked_read: int
+    unread_count: int
@@ -0,0 +1,205 @@
+"""
+Notification service.
+Generated notifications (life refills, streak reminders, match invitations and
+results) are buffered and written with multi-row inserts, when the buffer reaches
+NOTIFICATION_BATCH_SIZE or notification_batch_delay seconds after the first buffered
+one, instead of one insert per event. Per-user unread counts are cached and kept
+up to date on write and on mark-read, so the badge count needs no query while cached.
+
+Notifications have no INSERT policy, so the writer uses the service role key; without
+one, notifications are dropped. Counts cached by other processes catch up with this
+process's writes within UNREAD_COUNT_TTL_SECONDS.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from postgrest.types import ReturnMethod
+from supabase import Client
+
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Rows per insert; a full batch is flushed right away
+NOTIFICATION_BATCH_SIZE = 1000
+# Notifications kept for retry after failed flushes; the oldest are dropped beyond it
+NOTIFICATION_MAX_BUFFER = 100_000
+# Used when app_configuration has no notification_batch_delay
+NOTIFICATION_DEFAULT_DELAY_SECONDS = 300
+# Backoff between retries after a failed flush
+NOTIFICATION_RETRY_MIN_SECONDS = 5
+NOTIFICATION_RETRY_MAX_SECONDS = 300
+UNREAD_COUNT_MAX_USERS = 100_000
+UNREAD_COUNT_TTL_SECONDS = 60
+
+
+class UnreadCounts:
+    """Per-user unread notification counts, LRU-bounded."""
+
+    def __init__(self):
+        self._users: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+
+    @traced("UnreadCounts.get")
+    async def get(self, supabase: Client, token: str, user_id: str) -> int:
+        cached = self._users.get(user_id)
+        if cached and time.monotonic() - cached[1] < UNREAD_COUNT_TTL_SECONDS:
+            self._users.move_to_end(user_id)
+            return cached[0]
+
+        # Counted on idx_notifications_user_unread (partial index on read_at IS NULL)
+        response = supabase.postgrest.auth(token).from_("notifications")\
+            .select("id", count="exact")\
+            .eq("user_id", user_id)\
+            .is_("read_at", "null")\
+            .limit(1)\
+            .execute()
+        # Buffered notifications are not in the table yet
+        count = (response.count or 0) + notification_writer.unflushed(user_id)
+        self._set(user_id, count)
+        return count
+
+    def _set(self, user_id: str, count: int) -> None:
+        self._users[user_id] = (max(0, count), time.monotonic())
+        self._users.move_to_end(user_id)
+        while len(self._users) > UNREAD_COUNT_MAX_USERS:
+            self._users.popitem(last=False)
+
+    def add(self, user_id: str, delta: int) -> None:
+        """Adjust a cached count (new notifications, notifications read)."""
+        cached = self._users.get(user_id)
+        if cached is not None:
+            self._users[user_id] = (max(0, cached[0] + delta), cached[1])
+
+    def set_read(self, user_id: str) -> None:
+        """Every stored notification of the user was marked read."""
+        self._set(user_id, notification_writer.unflushed(user_id))
+
+
+class NotificationWriter:
+    """Buffer of notifications waiting for a multi-row insert."""
+
+    def __init__(self):
+        self._supabase: Optional[Client] = None
+        self._buffer: List[Dict[str, Any]] = []
+        # user_id -> notifications of the user in the buffer
+        self._unflushed: Dict[str, int] = defaultdict(int)
+        self._delay = NOTIFICATION_DEFAULT_DELAY_SECONDS
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self, supabase: Client) -> None:
+        """Start flushing; supabase must use the service role key."""
+        if self._task is None:
+            self._supabase = supabase
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write what is still buffered."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self.flush()
+
+    def unflushed(self, user_id: str) -> int:
+        return self._unflushed.get(user_id, 0)
+
+    def add(self, notifications: Iterable[Dict[str, Any]]) -> None:
+        """
+        Queue notifications (user_id, type, title, message and optionally
+        related_entity_id, related_entity_type, action_url) for the next flush.
+        """
+        if not self.running:
+            logger.debug("Notification writer not running, notifications dropped")
+            return
+        was_empty = not self._buffer
+        for notification in notifications:
+            self._buffer.append(notification)
+            self._unflushed[notification["user_id"]] += 1
+            unread_counts.add(notification["user_id"], 1)
+        if len(self._buffer) >= NOTIFICATION_BATCH_SIZE or (was_empty and self._buffer):
+            self._wake.set()
+
+    async def _run(self) -> None:
+        self._delay = await asyncio.to_thread(self._load_delay)
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            if len(self._buffer) < NOTIFICATION_BATCH_SIZE:
+                # Gather more notifications unless the batch fills up first
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self._delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+            await self.flush()
+            # A failed flush keeps the rows buffered: retry them with backoff instead
+            # of waiting for add() to wake the loop, which may never happen
+            retry_delay = NOTIFICATION_RETRY_MIN_SECONDS
+            while self._buffer:
+                await asyncio.sleep(retry_delay)
+                await self.flush()
+                retry_delay = min(retry_delay * 2, NOTIFICATION_RETRY_MAX_SECONDS)
+            self._wake.clear()
+
+    def _load_delay(self) -> float:
+        try:
+            rows = self._supabase.table("app_configuration")\
+                .select("config_value")\
+                .eq("config_key", "notification_batch_delay")\
+                .execute().data or []
+            if rows:
+                return float(rows[0]["config_value"])
+        except Exception as e:
+            logger.warning("Failed to load notification_batch_delay, using %ss: %s", NOTIFICATION_DEFAULT_DELAY_SECONDS, e)
+        return NOTIFICATION_DEFAULT_DELAY_SECONDS
+
+    async def flush(self) -> None:
+        """Write the buffer, one insert per NOTIFICATION_BATCH_SIZE rows."""
+        while self._buffer:
+            batch = self._buffer[:NOTIFICATION_BATCH_SIZE]
+            del self._buffer[:NOTIFICATION_BATCH_SIZE]
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._insert, batch)
+            except Exception as e:
+                logger.error("Failed to write %d notifications: %s", len(batch), e)
+                # Keep them for the next flush, dropping the oldest beyond the cap
+                self._buffer[:0] = batch
+                for notification in self._buffer[:max(0, len(self._buffer) - NOTIFICATION_MAX_BUFFER)]:
+                    self._forget(notification)
+                del self._buffer[:max(0, len(self._buffer) - NOTIFICATION_MAX_BUFFER)]
+                return
+            for notification in batch:
+                self._forget(notification)
+            logger.info("Notifications written", extra={
+                "count": len(batch),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000)
+            })
+
+    def _forget(self, notification: Dict[str, Any]) -> None:
+        user_id = notification["user_id"]
+        self._unflushed[user_id] -= 1
+        if self._unflushed[user_id] <= 0:
+            del self._unflushed[user_id]
+
+    def _insert(self, batch: List[Dict[str, Any]]) -> None:
+        self._supabase.table("notifications").insert(batch, returning=ReturnMethod.minimal).execute()
+
+
+# Process-wide writer and count cache
+notification_writer = NotificationWriter()
+unread_counts = UnreadCounts()
@@ -0,0 +1,146 @@
+"""
+Notifications router: list notifications, the unread badge count and mark-read.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Security
+from fastapi.security import HTTPAuthorizationCredentials
+from supabase import Client
+from datetime import datetime, timezone
+from typing import Optional
+import logging
+import uuid
+
+from config import get_supabase
+from models import (
+    Notification, NotificationListResponse, UnreadCountResponse,
+    MarkNotificationsReadRequest, MarkNotificationsReadResponse
+)
+from middleware import get_current_user, security
+from notification_service import unread_counts
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/notifications", tags=["Notifications"])
+
+NOTIFICATION_COLUMNS = "id, type, title, message, related_entity_id, related_entity_type, action_url, read_at, created_at"
+
+
+@router.get("/list", response_model=NotificationListResponse)
+async def list_notifications(
+    unread_only: bool = Query(False, description="Only unread notifications"),
+    limit: int = Query(20, ge=1, le=100, description="Notifications per page"),
+    before: Optional[datetime] = Query(None, description="Only notifications created before this time (the created_at of the last one of the previous page)"),
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    List the user's notifications, newest first, with the unread count.
+    """
+    try:
+        token = credentials.credentials
+        user_id = current_user.id
+
+        query = supabase.postgrest.auth(token).from_("notifications")\
+            .select(NOTIFICATION_COLUMNS)\
+            .eq("user_id", user_id)
+        if unread_only:
+            query = query.is_("read_at", "null")
+        if before is not None:
+            query = query.lt("created_at", before.isoformat())
+        response = query.order("created_at", desc=True).limit(limit).execute()
+
+        return NotificationListResponse(
+            notifications=[Notification(**row) for row in response.data or []],
+            unread_count=await unread_counts.get(supabase, token, user_id)
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error listing notifications: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to list notifications"
+        )
+
+
+@router.get("/unread-count", response_model=UnreadCountResponse)
+async def get_unread_count(
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    The notification badge: number of unread notifications, served from the
+    per-user count cache.
+    """
+    try:
+        return UnreadCountResponse(
+            unread_count=await unread_counts.get(supabase, credentials.credentials, current_user.id)
+        )
+
+    except Exception as e:
+        logger.error("Error fetching unread notification count: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to fetch unread notification count"
+        )
+
+
+@router.post("/read", response_model=MarkNotificationsReadResponse)
+async def mark_notifications_read(
+    request: MarkNotificationsReadRequest,
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    Mark the given notifications, or all unread ones, as read.
+    """
+    try:
+        if request.notification_ids is not None:
+            try:
+                for notification_id in request.notification_ids:
+                    uuid.UUID(notification_id)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid notification_id format"
+                )
+            if not request.notification_ids:
+                return MarkNotificationsReadResponse(
+                    marked_read=0,
+                    unread_count=await unread_counts.get(supabase, credentials.credentials, current_user.id)
+                )
+
+        token = credentials.credentials
+        user_id = current_user.id
+
+        query = supabase.postgrest.auth(token).from_("notifications")\
+            .update({"read_at": datetime.now(timezone.utc).isoformat()})\
+            .eq("user_id", user_id)\
+            .is_("read_at", "null")
+        if request.notification_ids is not None:
+            query = query.in_("id", request.notification_ids)
+        marked_read = len(query.execute().data or [])
+
+        if request.notification_ids is None:
+            unread_counts.set_read(user_id)
+        else:
+            unread_counts.add(user_id, -marked_read)
+
+        logger.info("Notifications marked read", extra={"user_id": user_id, "count": marked_read})
+        return MarkNotificationsReadResponse(
+            marked_read=marked_read,
+            unread_count=await unread_counts.get(supabase, token, user_id)
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error marking notifications read: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to mark notifications read"
+        )
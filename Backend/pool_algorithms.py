@@ -1,6 +1,9 @@
 import random
 from typing import List, Tuple, Dict
 
+from tracing import traced
+
+@traced("pool_algorithms.select_random")
 def select_random(n: int, pool: List[str]) -> List[str]:
     """
     Randomly select n questions from the pool.
@@ -14,6 +17,7 @@ def select_random(n: int, pool: List[str]) -> List[str]:
     n = min(n, len(pool))
     return random.sample(pool, n)
 
+@traced("pool_algorithms.select_random_not_repeated")
 def select_random_not_repeated(n: int, pool: List[str], answered: List[str]) -> List[str]:
     """
     Select n questions from the pool randomly, prioritizing questions not already answered.
@@ -44,6 +48,7 @@ def select_random_not_repeated(n: int, pool: List[str], answered: List[str]) ->
             
     return selected
 
+@traced("pool_algorithms.select_error_review")
 def select_error_review(n: int, question_stats: List[Tuple[str, int, int]]) -> List[str]:
     """
     Select n questions from the pool weighted by the ratio of wrong to correct answers,
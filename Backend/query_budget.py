@@ -0,0 +1,334 @@
+"""
+Upstream query budget check.
+
+Runs the read and learning-flow endpoints against an in-process fake Supabase
+(fake_supabase.py), counts the PostgREST and GoTrue calls each request makes and
+exits with status 1 when an endpoint goes over the budget declared in BUDGETS.
+Run it before deploying so an extra round trip or an N+1 loop fails the check
+instead of showing up as latency in production.
+
+Every endpoint is called twice: the first (cold) call may fill process caches
+(lives config, catalog versions, syllabus tree, search index) and is only reported;
+the second (warm) call is the steady state and is checked against the budget.
+
+Usage:
+    python query_budget.py [--verbose] [--only answer]
+"""
+
+import argparse
+import os
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import fake_supabase
+
+# Maximum upstream calls per warm request, including the bearer token check
+# (GET auth/user) that every authenticated endpoint makes. Lower a budget when an
+# endpoint gets cheaper; raising one should be a deliberate, reviewed change.
+BUDGETS: Dict[str, int] = {
+    "POST /auth/login": 1,
+    "GET /auth/user": 1,
+    "GET /users/profile": 2,
+    "GET /users/availability (free)": 1,
+    "GET /users/availability (taken)": 2,
+    "POST /users/create (existing profile)": 2,
+    "GET /syllabus/tree": 1,
+    "GET /syllabus/blocks/fetch": 2,
+    "GET /syllabus/blocks/query": 2,
+    "GET /syllabus/topics/fetch": 2,
+    "GET /syllabus/topics/query": 2,
+    "GET /syllabus/headings/fetch": 2,
+    "GET /syllabus/headings/query": 2,
+    "GET /syllabus/concepts/fetch": 2,
+    "GET /syllabus/concepts/query": 2,
+    "GET /syllabus/questions/fetch": 2,
+    "GET /syllabus/questions/query": 2,
+    "GET /syllabus/search": 1,
+    "GET /learning-path/lessons/fetch": 2,
+    "GET /learning-path/lessons/query": 2,
+    "GET /learning-path/sessions/fetch": 2,
+    "GET /learning-path/sessions/query": 2,
+    "GET /learning/session/questions": 4,
+    "POST /learning/session/start": 5,
+    "POST /learning/question/answer (correct)": 4,
+    "POST /learning/question/answer (wrong)": 6,
+    "POST /learning/session/finish": 2,
+    "GET /history/questions/answered": 3,
+    "GET /history/sessions/passed": 3,
+    "GET /history/lessons/passed": 2,
+    "GET /history/sessions/next": 3,
+    "GET /history/lessons/next": 3,
+    "GET /history/sessions/available": 3,
+    "GET /leagues/leaderboard": 1,
+    "GET /challenges/list": 2,
+    "POST /challenges/start": 4,
+    "GET /challenges/questions": 2,
+    "POST /challenges/answer": 3,
+    "POST /challenges/finish": 2,
+    "GET /matches/list": 2,
+    "GET /notifications/unread-count": 1,
+    "GET /notifications/list": 2,
+    "POST /notifications/read": 2,
+}
+
+
+@dataclass
+class BudgetCase:
+    """
+    One endpoint call. path and body may be callables of the shared context, evaluated
+    before each of the two calls.
+    """
+    name: str
+    method: str
+    path: Any
+    body: Any = None
+    ok_status: Tuple[int, ...] = (200,)
+    after: Optional[Callable[[Dict[str, Any], Any], None]] = None
+    # Runs before the warm call (not counted), so that a call that changes state can
+    # take the same path twice, e.g. by starting a fresh challenge to finish
+    before_warm: Optional[Callable[[Any, Dict[str, Any]], None]] = None
+
+
+@dataclass
+class BudgetResult:
+    name: str
+    budget: Optional[int]
+    cold_calls: List[str]
+    warm_calls: List[str]
+    status_code: int
+    ok_status: Tuple[int, ...]
+
+    @property
+    def passed(self) -> bool:
+        return (
+            self.budget is not None
+            and len(self.warm_calls) <= self.budget
+            and self.status_code in self.ok_status
+        )
+
+
+def _ids(rows: List[Dict], count: int = 3) -> str:
+    return ",".join(row["id"] for row in rows[:count])
+
+
+def build_cases(db: fake_supabase.FakeDatabase, email: str, password: str) -> List[BudgetCase]:
+    """Endpoint calls in flow order: login, catalog reads, one learning session, history."""
+    tables = db.tables
+    questions_by_id = {row["id"]: row for row in tables["questions"]}
+
+    def remember(key: str, extract: Callable[[Any], Any]) -> Callable[[Dict[str, Any], Any], None]:
+        def after(ctx: Dict[str, Any], data: Any) -> None:
+            ctx[key] = extract(data)
+        return after
+
+    def answer(correct: bool) -> Callable[[Dict[str, Any]], Dict]:
+        def body(ctx: Dict[str, Any]) -> Dict:
+            question_id = ctx["question_ids"][0]
+            correct_option = questions_by_id[question_id]["correct_option"]
+            return {
+                "question_id": question_id,
+                "user_session_history_id": ctx["history_id"],
+                "answer": correct_option if correct else next(o for o in "abc" if o != correct_option),
+                "started_at": "2024-01-01T00:00:00Z",
+                "asked_for_explanation": False,
+            }
+        return body
+
+    def challenge_answer(ctx: Dict[str, Any]) -> Dict:
+        question_id = ctx["challenge_question_ids"][0]
+        return {
+            "history_id": ctx["challenge_history_id"],
+            "question_id": question_id,
+            "answer": questions_by_id[question_id]["correct_option"],
+            "started_at": "2024-01-01T00:00:00Z",
+        }
+
+    def restart_challenge(client: Any, ctx: Dict[str, Any]) -> None:
+        # Questions are answered and challenges finished once: the warm call gets a
+        # fresh challenge, with its questions served, instead of a 409
+        headers = {"Authorization": f"Bearer {ctx['token']}"}
+        response = client.post("/challenges/start", json={"challenge_template_id": ctx["challenge_template_id"]},
+                               headers=headers)
+        ctx["challenge_history_id"] = response.json()["id"]
+        response = client.get(f"/challenges/questions?history_id={ctx['challenge_history_id']}", headers=headers)
+        ctx["challenge_question_ids"] = [q["id"] for q in response.json()["questions"]]
+
+    return [
+        BudgetCase("POST /auth/login", "POST", "/auth/login", {"email": email, "password": password},
+                   after=remember("token", lambda data: data["session"]["access_token"])),
+        BudgetCase("GET /auth/user", "GET", "/auth/user"),
+        BudgetCase("GET /users/profile", "GET", "/users/profile"),
+        BudgetCase("GET /users/availability (free)", "GET", "/users/availability?username=freshname42"),
+        BudgetCase("GET /users/availability (taken)", "GET", f"/users/availability?username={tables['users'][0]['username']}"),
+        BudgetCase("POST /users/create (existing profile)", "POST", "/users/create",
+                   {"username": "freshname42", "full_name": "Budget Check"}, ok_status=(409,)),
+        BudgetCase("GET /syllabus/tree", "GET", "/syllabus/tree"),
+        BudgetCase("GET /syllabus/blocks/fetch", "GET", f"/syllabus/blocks/fetch?ids={_ids(tables['blocks'])}"),
+        BudgetCase("GET /syllabus/blocks/query", "GET", "/syllabus/blocks/query?name_text=Bloque"),
+        BudgetCase("GET /syllabus/topics/fetch", "GET", f"/syllabus/topics/fetch?ids={_ids(tables['topics'])}"),
+        BudgetCase("GET /syllabus/topics/query", "GET", f"/syllabus/topics/query?block_ids={_ids(tables['blocks'])}"),
+        BudgetCase("GET /syllabus/headings/fetch", "GET", f"/syllabus/headings/fetch?ids={_ids(tables['headings'])}"),
+        BudgetCase("GET /syllabus/headings/query", "GET", f"/syllabus/headings/query?topic_ids={_ids(tables['topics'])}"),
+        BudgetCase("GET /syllabus/concepts/fetch", "GET", f"/syllabus/concepts/fetch?ids={_ids(tables['concepts'])}"),
+        BudgetCase("GET /syllabus/concepts/query", "GET", f"/syllabus/concepts/query?heading_ids={_ids(tables['headings'])}"),
+        BudgetCase("GET /syllabus/questions/fetch", "GET", f"/syllabus/questions/fetch?ids={_ids(tables['questions'])}"),
+        BudgetCase("GET /syllabus/questions/query", "GET", f"/syllabus/questions/query?concept_ids={_ids(tables['concepts'])}"),
+        BudgetCase("GET /syllabus/search", "GET", "/syllabus/search?q=concepto"),
+        BudgetCase("GET /learning-path/lessons/fetch", "GET", f"/learning-path/lessons/fetch?ids={_ids(tables['lessons'])}"),
+        BudgetCase("GET /learning-path/lessons/query", "GET", "/learning-path/lessons/query?order_number=1&order_greater=true"),
+        BudgetCase("GET /learning-path/sessions/fetch", "GET", f"/learning-path/sessions/fetch?ids={_ids(tables['sessions'])}"),
+        BudgetCase("GET /learning-path/sessions/query", "GET", f"/learning-path/sessions/query?lesson_ids={_ids(tables['lessons'])}"),
+        BudgetCase("GET /history/sessions/next", "GET", "/history/sessions/next",
+                   after=remember("session_id", lambda data: data["session"]["id"])),
+        BudgetCase("GET /learning/session/questions", "GET", lambda ctx: f"/learning/session/questions?session_id={ctx['session_id']}",
+                   after=remember("question_ids", lambda data: [q["id"] for q in data["questions"]])),
+        BudgetCase("POST /learning/session/start", "POST", "/learning/session/start",
+                   lambda ctx: {"session_id": ctx["session_id"]}, ok_status=(201,),
+                   after=remember("history_id", lambda data: data["id"])),
+        BudgetCase("POST /learning/question/answer (correct)", "POST", "/learning/question/answer", answer(True)),
+        BudgetCase("POST /learning/question/answer (wrong)", "POST", "/learning/question/answer", answer(False)),
+        BudgetCase("POST /learning/session/finish", "POST", "/learning/session/finish",
+                   lambda ctx: {"history_id": ctx["history_id"], "passed": True}, ok_status=(204,)),
+        BudgetCase("GET /history/questions/answered", "GET", "/history/questions/answered"),
+        BudgetCase("GET /history/sessions/passed", "GET", "/history/sessions/passed"),
+        BudgetCase("GET /history/lessons/passed", "GET", "/history/lessons/passed"),
+        BudgetCase("GET /history/lessons/next", "GET", "/history/lessons/next"),
+        BudgetCase("GET /history/sessions/available", "GET", "/history/sessions/available"),
+        BudgetCase("GET /leagues/leaderboard", "GET", "/leagues/leaderboard"),
+        BudgetCase("GET /challenges/list", "GET", "/challenges/list",
+                   after=remember("challenge_template_id", lambda data: next(
+                       c["id"] for c in data["challenges"] if c["challenge_type"] == "lightning_round"))),
+        BudgetCase("POST /challenges/start", "POST", "/challenges/start",
+                   lambda ctx: {"challenge_template_id": ctx["challenge_template_id"]}, ok_status=(201,),
+                   after=remember("challenge_history_id", lambda data: data["id"])),
+        BudgetCase("GET /challenges/questions", "GET", lambda ctx: f"/challenges/questions?history_id={ctx['challenge_history_id']}",
+                   after=remember("challenge_question_ids", lambda data: [q["id"] for q in data["questions"]])),
+        BudgetCase("POST /challenges/answer", "POST", "/challenges/answer", challenge_answer,
+                   before_warm=restart_challenge),
+        BudgetCase("POST /challenges/finish", "POST", "/challenges/finish",
+                   lambda ctx: {"history_id": ctx["challenge_history_id"]}, before_warm=restart_challenge),
+        BudgetCase("GET /matches/list", "GET", "/matches/list"),
+        BudgetCase("GET /notifications/unread-count", "GET", "/notifications/unread-count"),
+        BudgetCase("GET /notifications/list", "GET", "/notifications/list"),
+        BudgetCase("POST /notifications/read", "POST", "/notifications/read", {}),
+    ]
+
+
+def start_fake_supabase(lessons: int = 3) -> Tuple[str, str, fake_supabase.FakeDatabase, Tuple[str, str]]:
+    """
+    Serve a seeded fake Supabase from a background thread.
+
+    Returns:
+        Tuple of (url, anon_key, database, (email, password))
+    """
+    schemas, seeds = fake_supabase.load_schema()
+    db = fake_supabase.FakeDatabase(schemas, seeds)
+    auth = fake_supabase.FakeAuth(db)
+    fake_supabase.seed_catalog(db, lessons)
+    credentials = fake_supabase.seed_users(auth, 1)[0]
+    fake_supabase.seed_leagues(db)
+    fake_supabase.seed_challenges(db)
+
+    url, anon_key = fake_supabase.serve_in_background(db, auth)
+    return url, anon_key, db, credentials
+
+
+def run_budget_check(only: Optional[str] = None) -> List[BudgetResult]:
+    url, anon_key, db, (email, password) = start_fake_supabase()
+
+    # The backend reads its settings at import time
+    os.environ["SUPABASE_URL"] = url
+    os.environ["SUPABASE_KEY"] = anon_key
+    os.environ["TRACING_ENABLED"] = "false"
+    # Cold numbers should show what a request pays on its own, without the warm-up
+    os.environ["WARMUP_ENABLED"] = "false"
+
+    from fastapi.testclient import TestClient
+
+    from config import get_supabase
+    from main import app
+    from metrics import instrument_supabase, register_upstream_hooks, upstream_target
+
+    calls: List[str] = []
+
+    def record_call(request) -> None:
+        service, target = upstream_target(request.url)
+        calls.append(f"{request.method} {service}/{target}")
+
+    register_upstream_hooks(record_call, lambda response: None)
+    instrument_supabase(get_supabase())
+
+    ctx: Dict[str, Any] = {}
+    results = []
+    with TestClient(app) as client:
+        for case in build_cases(db, email, password):
+            observed = []
+            response = None
+            for call in range(2):
+                if call == 1 and case.before_warm:
+                    case.before_warm(client, ctx)
+                path = case.path(ctx) if callable(case.path) else case.path
+                body = case.body(ctx) if callable(case.body) else case.body
+                headers = {"Authorization": f"Bearer {ctx['token']}"} if "token" in ctx else {}
+                calls.clear()
+                response = client.request(case.method, path, json=body, headers=headers)
+                observed.append(list(calls))
+
+            if case.after and response.status_code in case.ok_status:
+                case.after(ctx, response.json() if response.content else None)
+            if only and only not in case.name:
+                continue
+            results.append(BudgetResult(
+                name=case.name,
+                budget=BUDGETS.get(case.name),
+                cold_calls=observed[0],
+                warm_calls=observed[1],
+                status_code=response.status_code,
+                ok_status=case.ok_status,
+            ))
+    return results
+
+
+def print_budget_report(results: List[BudgetResult], verbose: bool = False) -> None:
+    print(f"\n{'Endpoint':<44} | {'Status':>6} | {'Cold':>4} | {'Warm':>4} | {'Budget':>6} | Result")
+    print("-" * 84)
+    for result in results:
+        budget = "-" if result.budget is None else str(result.budget)
+        verdict = "ok" if result.passed else "FAIL"
+        print(
+            f"{result.name:<44} | {result.status_code:>6} | {len(result.cold_calls):>4} | "
+            f"{len(result.warm_calls):>4} | {budget:>6} | {verdict}"
+        )
+        if verbose or not result.passed:
+            for call in result.warm_calls:
+                print(f"{'':<46} {call}")
+
+    failed = [r for r in results if not r.passed]
+    print("-" * 84)
+    if failed:
+        print(f"{len(failed)} of {len(results)} endpoints over budget or failing:")
+        for result in failed:
+            if result.status_code not in result.ok_status:
+                print(f"  {result.name}: unexpected status {result.status_code}")
+            elif result.budget is None:
+                print(f"  {result.name}: no budget declared in BUDGETS")
+            else:
+                print(f"  {result.name}: {len(result.warm_calls)} upstream calls, budget {result.budget}")
+    else:
+        print(f"All {len(results)} endpoints within their upstream call budget.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fail when an endpoint makes more upstream calls than its budget")
+    parser.add_argument("--verbose", action="store_true", help="List the upstream calls of every endpoint")
+    parser.add_argument("--only", help="Only report endpoints whose name contains this text")
+    args = parser.parse_args()
+
+    results = run_budget_check(args.only)
+    print_budget_report(results, args.verbose)
+    sys.exit(0 if all(r.passed for r in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
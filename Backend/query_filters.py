@@ -0,0 +1,155 @@
+"""
+Shared filter compiler for the `*/query` endpoints.
+Turns the name/description/number/id query parameters into PostgREST predicates
+(ilike, eq, gt, lt, in) so the database does the filtering and only ids are returned.
+"""
+
+import uuid
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Rows are loaded in pages to stay under the PostgREST max-rows limit
+FETCH_ALL_PAGE_SIZE = 1000
+
+
+class EmptyResult(Exception):
+    """Raised when a filter can never match, so the query can be skipped entirely."""
+
+
+def quote_column(column: str) -> str:
+    """
+    Quote a column name for use in a PostgREST filter.
+
+    `order` is a reserved PostgREST query parameter, so filtering on the
+    "order" column requires the quoted form.
+    """
+    return f'"{column}"' if column == "order" else column
+
+
+def escape_like(text: str) -> str:
+    """
+    Escape LIKE wildcards so user text is matched literally.
+
+    PostgREST turns every `*` in a like/ilike pattern into `%` before the query
+    runs, so it cannot be escaped; it becomes the single-character wildcard `_`,
+    which matches the `*` itself (and nothing wider than one character).
+    """
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped.replace("*", "_")
+
+
+def parse_uuid_list(ids_str: Optional[str]) -> Optional[List[str]]:
+    """
+    Parse a comma-separated list of UUIDs, ignoring invalid entries.
+
+    Returns:
+        None when no ids were provided, otherwise the list of valid ids
+
+    Raises:
+        EmptyResult: If ids were provided but none of them is a valid UUID
+    """
+    if not ids_str or not ids_str.strip():
+        return None
+
+    valid_ids = []
+    for id_str in ids_str.split(','):
+        id_clean = id_str.strip()
+        if id_clean:
+            try:
+                uuid.UUID(id_clean)
+                valid_ids.append(id_clean)
+            except ValueError:
+                pass  # Ignore invalid UUIDs
+
+    if not valid_ids:
+        raise EmptyResult()
+    return valid_ids
+
+
+def apply_text_filter(query, column: str, text: Optional[str], exact: bool):
+    """Apply an exact (eq) or case-insensitive substring (ilike) filter."""
+    if not text:
+        return query
+    if exact:
+        return query.eq(quote_column(column), text)
+    return query.ilike(quote_column(column), f"%{escape_like(text)}%")
+
+
+def apply_number_filter(query, column: str, number: Optional[int], greater: bool, less: bool):
+    """Apply a gt, lt or eq filter. greater takes precedence over less."""
+    if number is None:
+        return query
+    column = quote_column(column)
+    if greater:
+        return query.gt(column, number)
+    if less:
+        return query.lt(column, number)
+    return query.eq(column, number)
+
+
+def apply_id_filter(query, column: str, ids_str: Optional[str]):
+    """
+    Apply an `in` filter from a comma-separated id list.
+
+    Raises:
+        EmptyResult: If ids were provided but none of them is a valid UUID
+    """
+    valid_ids = parse_uuid_list(ids_str)
+    if valid_ids is None:
+        return query
+    return query.in_(column, valid_ids)
+
+
+def compile_filters(
+    query,
+    text: Optional[Dict[str, Tuple[Optional[str], bool]]] = None,
+    numbers: Optional[Dict[str, Tuple[Optional[int], bool, bool]]] = None,
+    ids: Optional[Dict[str, Optional[str]]] = None,
+    equals: Optional[Dict[str, Any]] = None
+):
+    """
+    Compile query parameters into PostgREST predicates on a select builder.
+
+    Args:
+        query: PostgREST select builder
+        text: column -> (text, exact)
+        numbers: column -> (number, greater, less)
+        ids: column -> comma-separated id list
+        equals: column -> value for plain equality filters (None and empty strings
+            are skipped, as an empty query parameter means no filter)
+
+    Returns:
+        The filtered select builder
+
+    Raises:
+        EmptyResult: If a filter can never match
+    """
+    for column, value in (equals or {}).items():
+        if value is not None and value != "":
+            query = query.eq(quote_column(column), value)
+    for column, ids_str in (ids or {}).items():
+        query = apply_id_filter(query, column, ids_str)
+    for column, (value, exact) in (text or {}).items():
+        query = apply_text_filter(query, column, value, exact)
+    for column, (number, greater, less) in (numbers or {}).items():
+        query = apply_number_filter(query, column, number, greater, less)
+    return query
+
+
+def fetch_all(query_factory: Callable[[], Any], page_size: int = FETCH_ALL_PAGE_SIZE) -> Iterator[Dict]:
+    """
+    Yield every row of a query, loading it in id-ordered pages.
+
+    Args:
+        query_factory: Callable returning a fresh filtered select builder
+        page_size: Rows per request
+
+    Yields:
+        Row dictionaries
+    """
+    start = 0
+    while True:
+        page = query_factory().order("id").range(start, start + page_size - 1).execute().data or []
+        yield from page
+        if len(page) < page_size:
+            break
+        start += page_size
@@ -0,0 +1,404 @@
+"""
+Bulk question import.
+Reads questions in the Datasheets format (Database/Datasheets/Placeholder Questions.csv:
+semicolon-separated UTF-8 with a BOM, or the same columns in the first sheet of an
+.xlsx workbook) one row at a time, validates each row against the concepts of the
+cached syllabus tree, and upserts the valid rows with one multi-row statement per
+IMPORT_BATCH_SIZE rows. Only the current batch is held in memory, so file size does
+not matter; progress is reported after every batch.
+
+Columns: concept_id, text, option_a, option_b, option_c, correct_option, explanation,
+difficulty, source, plus the optional status (active by default) and id. Rows without
+an id get one derived from their concept, text and options, so importing the same
+file again updates the questions instead of duplicating them.
+
+Used by POST /syllabus/questions/import and from the command line, with
+SUPABASE_SERVICE_KEY set since question writes are restricted by RLS:
+    python question_import.py "../Database/Datasheets/Placeholder Questions.csv" [--dry-run]
+    python question_import.py --synthetic 100000    # timed run against a seeded fake Supabase
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import logging
+import os
+import random
+import tempfile
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import BinaryIO, Dict, FrozenSet, Iterator, List, Tuple
+
+from postgrest.types import ReturnMethod
+from supabase import Client, create_client
+
+from etags import invalidate_catalog_version
+from syllabus_tree import syllabus_tree_cache
+
+try:
+    import openpyxl
+except ImportError:  # XLSX imports are unavailable without it
+    openpyxl = None
+
+logger = logging.getLogger(__name__)
+
+# Rows per upsert statement
+IMPORT_BATCH_SIZE = 2000
+# Rejected rows listed in the report; the rest are only counted
+IMPORT_MAX_REPORTED_ERRORS = 100
+
+REQUIRED_COLUMNS = (
+    "concept_id", "text", "option_a", "option_b", "option_c",
+    "correct_option", "explanation", "difficulty"
+)
+OPTIONAL_COLUMNS = ("source", "status", "id")
+QUESTION_STATUSES = ("active", "draft", "archived")
+
+# Namespace of the ids derived from question content
+QUESTION_ID_NAMESPACE = uuid.UUID("ac25041e-6c95-4b81-b366-aa44d4365b8f")
+
+Row = Tuple[int, List[str]]
+Record = Tuple[int, Dict[str, str]]
+
+
+@dataclass
+class ImportReport:
+    """Running totals of an import, yielded after every batch."""
+    rows: int = 0
+    imported: int = 0
+    rejected: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    batches: int = 0
+    elapsed_seconds: float = 0.0
+    finished: bool = False
+    errors: List[Dict] = field(default_factory=list)
+
+    def reject(self, row: int, error: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": error})
+
+    def event(self) -> Dict:
+        """Progress event with the totals, or the done event with the full report."""
+        report = asdict(self)
+        if not self.finished:
+            del report["errors"]
+        return {"event": "done" if self.finished else "progress", **report}
+
+
+# Readers
+
+def _csv_rows(stream: BinaryIO, delimiter: str) -> Iterator[Row]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text, delimiter=delimiter)
+    for cells in reader:
+        yield reader.line_num, cells
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ""
+    # Numeric cells (difficulty, numeric options) come back as floats
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _xlsx_rows(stream: BinaryIO) -> Iterator[Row]:
+    if openpyxl is None:
+        raise ValueError("XLSX imports need openpyxl installed; upload the sheet as CSV instead")
+    # Read-only mode streams the sheet XML instead of loading the workbook
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        for row_number, values in enumerate(workbook.active.iter_rows(values_only=True), start=1):
+            yield row_number, [_cell_text(value) for value in values]
+    finally:
+        workbook.close()
+
+
+def _records(rows: Iterator[Row], columns: List[str]) -> Iterator[Record]:
+    for row_number, cells in rows:
+        if not any(cell.strip() for cell in cells):
+            continue
+        yield row_number, dict(zip(columns, cells))
+
+
+def read_records(stream: BinaryIO, filename: str, delimiter: str = ";") -> Iterator[Record]:
+    """
+    Open a CSV or XLSX file (by extension) and check its header row.
+
+    Args:
+        stream: Binary file object; XLSX files must be seekable
+        filename: Name of the file, to pick the format
+        delimiter: CSV field separator
+
+    Returns:
+        Iterator of (row number, column -> cell text), read lazily
+
+    Raises:
+        ValueError: Unsupported format, unreadable file or missing columns
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".csv":
+        rows = _csv_rows(stream, delimiter)
+    elif extension == ".xlsx":
+        rows = _xlsx_rows(stream)
+    else:
+        raise ValueError("Unsupported file type, expected .csv or .xlsx")
+
+    try:
+        header = next(rows, None)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Unreadable file: {e}")
+    if header is None:
+        raise ValueError("The file is empty")
+    columns = [column.strip().lower() for column in header[1]]
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    return _records(rows, columns)
+
+
+# Validation
+
+def question_id(row: Dict) -> str:
+    """Stable id of a question without one: same concept, text and options, same id."""
+    content = "\x1f".join((row["concept_id"], row["text"], row["option_a"], row["option_b"], row["option_c"]))
+    return str(uuid.uuid5(QUESTION_ID_NAMESPACE, content))
+
+
+def parse_question(record: Dict[str, str], concept_ids: FrozenSet[str]) -> Dict:
+    """
+    Validate one record and build its questions row.
+
+    Raises:
+        ValueError: With the reason the row is rejected
+    """
+    values = {column: (record.get(column) or "").strip() for column in REQUIRED_COLUMNS + OPTIONAL_COLUMNS}
+    empty = [column for column in REQUIRED_COLUMNS if not values[column]]
+    if empty:
+        raise ValueError(f"Empty {', '.join(empty)}")
+
+    try:
+        concept_id = str(uuid.UUID(values["concept_id"]))
+    except ValueError:
+        raise ValueError(f"Invalid concept_id {values['concept_id']!r}")
+    if concept_id not in concept_ids:
+        raise ValueError(f"Unknown concept_id {concept_id}")
+
+    correct_option = values["correct_option"].lower()
+    if correct_option not in ("a", "b", "c"):
+        raise ValueError(f"correct_option must be a, b or c, got {values['correct_option']!r}")
+
+    try:
+        difficulty = int(values["difficulty"])
+    except ValueError:
+        raise ValueError(f"Invalid difficulty {values['difficulty']!r}")
+    if not 1 <= difficulty <= 10:
+        raise ValueError(f"difficulty must be between 1 and 10, got {difficulty}")
+
+    question_status = values["status"].lower() or "active"
+    if question_status not in QUESTION_STATUSES:
+        raise ValueError(f"status must be one of {', '.join(QUESTION_STATUSES)}, got {values['status']!r}")
+
+    row = {
+        "concept_id": concept_id,
+        "text": values["text"],
+        "option_a": values["option_a"],
+        "option_b": values["option_b"],
+        "option_c": values["option_c"],
+        "correct_option": correct_option,
+        "explanation": values["explanation"],
+        "difficulty": difficulty,
+        "source": values["source"] or None,
+        "status": question_status,
+    }
+    if values["id"]:
+        try:
+            row["id"] = str(uuid.UUID(values["id"]))
+        except ValueError:
+            raise ValueError(f"Invalid id {values['id']!r}")
+    else:
+        row["id"] = question_id(row)
+    return row
+
+
+# Import
+
+def _upsert(supabase: Client, token: str, batch: List[Dict]) -> None:
+    supabase.postgrest.auth(token).from_("questions")\
+        .upsert(batch, on_conflict="id", returning=ReturnMethod.minimal)\
+        .execute()
+
+
+def import_questions(
+    supabase: Client,
+    token: str,
+    records: Iterator[Record],
+    concept_ids: FrozenSet[str],
+    batch_size: int = IMPORT_BATCH_SIZE,
+    dry_run: bool = False
+) -> Iterator[ImportReport]:
+    """
+    Validate and upsert records, one statement per batch_size valid rows.
+
+    A row repeated within a batch is written once (the last one wins). A batch the
+    database rejects is counted as failed and the import goes on with the next one.
+
+    Args:
+        supabase: Supabase client used only by this import (auth() sets its header)
+        token: Access token of a content admin, or the service role key
+        records: From read_records
+        concept_ids: Valid concept ids, from syllabus_tree_cache.concept_ids
+        batch_size: Rows per upsert
+        dry_run: Validate only
+
+    Yields:
+        The running report after each batch, and once more when finished
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    # id -> row, so a batch never upserts the same question twice
+    batch: Dict[str, Dict] = {}
+    first_row = 0
+
+    def write() -> None:
+        report.batches += 1
+        if not dry_run:
+            try:
+                _upsert(supabase, token, list(batch.values()))
+            except Exception as e:
+                logger.error("Question import batch starting at row %d failed: %s", first_row, e)
+                report.failed += len(batch)
+                if len(report.errors) < IMPORT_MAX_REPORTED_ERRORS:
+                    report.errors.append({"row": first_row, "error": f"Batch of {len(batch)} rows failed: {e}"})
+                return
+        report.imported += len(batch)
+
+    for row_number, record in records:
+        report.rows += 1
+        try:
+            row = parse_question(record, concept_ids)
+        except ValueError as e:
+            report.reject(row_number, str(e))
+            continue
+        if not batch:
+            first_row = row_number
+        if row["id"] in batch:
+            report.duplicates += 1
+        batch[row["id"]] = row
+        if len(batch) >= batch_size:
+            write()
+            batch.clear()
+            report.elapsed_seconds = round(time.perf_counter() - started, 2)
+            yield report
+
+    if batch:
+        write()
+    if report.imported and not dry_run:
+        invalidate_catalog_version("questions")
+    report.elapsed_seconds = round(time.perf_counter() - started, 2)
+    report.finished = True
+    yield report
+
+
+# Command line
+
+def synthetic_file(supabase: Client, rows: int, directory: str, invalid_every: int = 100) -> str:
+    """Write a Datasheets CSV of rows questions over the seeded concepts, every invalid_every-th row broken."""
+    concept_ids = sorted(asyncio.run(syllabus_tree_cache.concept_ids(supabase, supabase.supabase_key)))
+    path = os.path.join(directory, "synthetic_questions.csv")
+    rng = random.Random(0)
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(REQUIRED_COLUMNS + ("source",))
+        for i in range(rows):
+            correct_option = "abc"[i % 3] if i % invalid_every else "d"
+            writer.writerow((
+                rng.choice(concept_ids), f"¿Pregunta sintética {i + 1}?",
+                f"Opción A {i}", f"Opción B {i}", f"Opción C {i}", correct_option,
+                "Explicación de la respuesta correcta.", rng.randint(1, 10), "Synthetic"
+            ))
+    return path
+
+
+def synthetic_client() -> Client:
+    """A client for a fake Supabase seeded with a syllabus to import into."""
+    import fake_supabase
+
+    schemas, seeds = fake_supabase.load_schema()
+    db = fake_supabase.FakeDatabase(schemas, seeds)
+    auth = fake_supabase.FakeAuth(db)
+    fake_supabase.seed_catalog(db, lessons=20, questions_per_concept=0)
+    url, anon_key = fake_supabase.serve_in_background(db, auth)
+    return create_client(url, anon_key)
+
+
+def run_file(supabase: Client, path: str, delimiter: str, batch_size: int, dry_run: bool) -> ImportReport:
+    token = supabase.supabase_key
+    concept_ids = asyncio.run(syllabus_tree_cache.concept_ids(supabase, token))
+    with open(path, "rb") as stream:
+        records = read_records(stream, path, delimiter)
+        for report in import_questions(supabase, token, records, concept_ids, batch_size, dry_run):
+            rate = report.rows / report.elapsed_seconds if report.elapsed_seconds else 0
+            logger.info(
+                "Read %d rows: %d imported, %d rejected, %d failed (%.0f rows/s)",
+                report.rows, report.imported, report.rejected, report.failed, rate
+            )
+    return report
+
+
+def print_report(report: ImportReport) -> None:
+    print(f"Rows read:   {report.rows}")
+    print(f"Imported:    {report.imported}")
+    print(f"Rejected:    {report.rejected}")
+    print(f"Duplicates:  {report.duplicates}")
+    print(f"Failed:      {report.failed}")
+    print(f"Statements:  {report.batches}")
+    print(f"Elapsed:     {report.elapsed_seconds:.2f} s")
+    for error in report.errors[:20]:
+        print(f"  row {error['row']}: {error['error']}")
+    if report.rejected + report.failed > 20:
+        print(f"  ... and {report.rejected + report.failed - 20} more")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import questions from a Datasheets CSV or XLSX file")
+    parser.add_argument("path", nargs="?", help="The .csv or .xlsx file")
+    parser.add_argument("--delimiter", default=";", help="CSV field separator (default ;)")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="Rows per upsert statement")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and report without writing")
+    parser.add_argument("--synthetic", type=int, metavar="ROWS",
+                        help="Time an import of this many generated rows into a local fake Supabase")
+    args = parser.parse_args()
+    if not args.path and not args.synthetic:
+        parser.error("a file path or --synthetic is required")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    try:
+        if args.synthetic:
+            supabase = synthetic_client()
+            with tempfile.TemporaryDirectory() as directory:
+                path = synthetic_file(supabase, args.synthetic, directory)
+                report = run_file(supabase, path, ";", args.batch_size, args.dry_run)
+        else:
+            from config import settings
+            if not settings.supabase_service_key:
+                raise SystemExit("SUPABASE_SERVICE_KEY must be set: question writes are restricted by RLS")
+            supabase = create_client(settings.supabase_url, settings.supabase_service_key)
+            report = run_file(supabase, args.path, args.delimiter, args.batch_size, args.dry_run)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+In-memory full-text search over the syllabus and questions.
+Keeps a trigram inverted index of block/topic/heading/concept names and descriptions
+and question text/explanations, normalized for accent-insensitive Spanish matching.
+The index is built from the catalog once and then synced incrementally using the
+catalog versions from etags.
+"""
+
+import heapq
+import logging
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from supabase import Client
+
+from etags import get_catalog_version
+from query_filters import fetch_all
+
+logger = logging.getLogger(__name__)
+
+# kind -> (table, indexed fields). Earlier fields rank higher in results.
+SEARCHABLE_KINDS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "block": ("blocks", ("name", "description")),
+    "topic": ("topics", ("name", "description")),
+    "heading": ("headings", ("name", "description")),
+    "concept": ("concepts", ("name", "description")),
+    "question": ("questions", ("text", "explanation")),
+}
+
+# A delta sync reloads the table when its active row count and the index disagree
+# (a delete); a delete offset by an insert in the same window is only caught by the
+# full reload forced at this interval
+SEARCH_INDEX_FULL_RELOAD_SECONDS = 3600
+
+DocKey = Tuple[str, str]
+
+
+def normalize(text: Optional[str]) -> str:
+    """
+    Normalize text for accent-insensitive Spanish search.
+
+    Strips diacritics (á -> a, ü -> u, ñ -> n), lowercases and collapses every
+    non-alphanumeric run into a single space.
+    """
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+    return " ".join("".join(c if c.isalnum() else " " for c in stripped).split())
+
+
+def trigrams(text: str) -> Set[str]:
+    """Return the set of 3-character windows of a normalized string."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Trigram inverted index with substring verification."""
+
+    def __init__(self):
+        self._docs: Dict[DocKey, Dict[str, str]] = {}
+        self._postings: Dict[str, Set[DocKey]] = defaultdict(set)
+        self._kind_counts: Dict[str, int] = defaultdict(int)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def count(self, kind: str) -> int:
+        """Number of indexed documents of a kind."""
+        return self._kind_counts[kind]
+
+    def upsert(self, kind: str, doc_id: str, fields: Dict[str, Optional[str]]) -> None:
+        """Add or replace a document. Only the trigrams that changed are touched."""
+        key = (kind, doc_id)
+        normalized = {name: normalize(value) for name, value in fields.items() if value}
+
+        old_grams = set().union(*(trigrams(t) for t in self._docs[key].values())) if key in self._docs else set()
+        new_grams = set().union(*(trigrams(t) for t in normalized.values())) if normalized else set()
+
+        for gram in old_grams - new_grams:
+            self._discard_posting(gram, key)
+        for gram in new_grams - old_grams:
+            self._postings[gram].add(key)
+
+        if key not in self._docs:
+            self._kind_counts[kind] += 1
+        self._docs[key] = normalized
+
+    def remove(self, kind: str, doc_id: str) -> None:
+        """Remove a document if it is indexed."""
+        key = (kind, doc_id)
+        if key not in self._docs:
+            return
+        fields = self._docs.pop(key)
+        self._kind_counts[kind] -= 1
+        for text in fields.values():
+            for gram in trigrams(text):
+                self._discard_posting(gram, key)
+
+    def clear_kind(self, kind: str) -> None:
+        """Remove every document of a kind."""
+        for key in [k for k in self._docs if k[0] == kind]:
+            self.remove(*key)
+
+    def _discard_posting(self, gram: str, key: DocKey) -> None:
+        posting = self._postings.get(gram)
+        if posting is not None:
+            posting.discard(key)
+            if not posting:
+                del self._postings[gram]
+
+    def _candidates(self, query: str) -> Iterable[DocKey]:
+        grams = trigrams(query)
+        if not grams:
+            # Queries shorter than a trigram fall back to verifying every document
+            return self._docs.keys()
+        postings = sorted((self._postings.get(g, set()) for g in grams), key=len)
+        if not postings[0]:
+            return ()
+        # Intersecting the two rarest trigrams prunes almost everything;
+        # the substring check in search() is cheaper than further intersections
+        if len(postings) == 1:
+            return postings[0]
+        return postings[0] & postings[1]
+
+    def search(
+        self,
+        query: str,
+        kinds: Optional[Set[str]] = None,
+        limit: int = 50
+    ) -> List[Tuple[str, str, str]]:
+        """
+        Find documents whose indexed fields contain the query as a substring.
+
+        Args:
+            query: Free text, matched accent- and case-insensitively
+            kinds: Optional set of kinds to restrict the search to
+            limit: Maximum number of hits
+
+        Returns:
+            List of (kind, id, field) tuples, best matches first
+        """
+        normalized_query = normalize(query)
+        if not normalized_query:
+            return []
+
+        scored = []
+        for key in self._candidates(normalized_query):
+            kind = key[0]
+            if kinds and kind not in kinds:
+                continue
+            fields = self._docs[key]
+            for rank, field in enumerate(SEARCHABLE_KINDS[kind][1]):
+                position = fields.get(field, "").find(normalized_query)
+                if position >= 0:
+                    # Prefer the first field (name/text), then earlier matches
+                    scored.append((rank, position, kind, key[1], field))
+                    break
+
+        return [(kind, doc_id, field) for _, _, kind, doc_id, field in heapq.nsmallest(limit, scored)]
+
+
+class CatalogSearch:
+    """Keeps a SearchIndex in sync with the catalog tables."""
+
+    def __init__(self):
+        self.index = SearchIndex()
+        self._versions: Dict[str, str] = {}
+        self._watermarks: Dict[str, str] = {}
+        self._last_full_reload: Dict[str, float] = {}
+
+    async def ensure_fresh(self, supabase: Client, token: str) -> None:
+        """Sync every indexed table whose catalog version changed since the last sync."""
+        for kind, (table, _) in SEARCHABLE_KINDS.items():
+            version = await get_catalog_version(supabase, token, table)
+            if self._versions.get(table) == version:
+                continue
+
+            expired = time.monotonic() - self._last_full_reload.get(table, 0) > SEARCH_INDEX_FULL_RELOAD_SECONDS
+            if not self._watermarks.get(table) or expired or not self._sync_delta(supabase, token, kind):
+                self._reload(supabase, token, kind)
+            self._versions[table] = version
+
+    def apply_row(self, kind: str, row: Dict) -> None:
+        """Index, re-index or drop a single catalog row after a content change."""
+        table, fields = SEARCHABLE_KINDS[kind]
+        if row.get("status", "active") != "active":
+            self.index.remove(kind, row["id"])
+        else:
+            self.index.upsert(kind, row["id"], {f: row.get(f) for f in fields})
+        updated_at = row.get("updated_at")
+        if updated_at and updated_at > self._watermarks.get(table, ""):
+            self._watermarks[table] = updated_at
+
+    def _columns(self, kind: str) -> str:
+        return ", ".join(("id", "status", "updated_at") + SEARCHABLE_KINDS[kind][1])
+
+    def _reload(self, supabase: Client, token: str, kind: str) -> None:
+        table = SEARCHABLE_KINDS[kind][0]
+        started = time.perf_counter()
+        self.index.clear_kind(kind)
+        self._watermarks.pop(table, None)
+
+        rows = fetch_all(
+            lambda: supabase.postgrest.auth(token).from_(table).select(self._columns(kind)).eq("status", "active")
+        )
+        count = 0
+        for row in rows:
+            self.apply_row(kind, row)
+            count += 1
+
+        self._last_full_reload[table] = time.monotonic()
+        logger.info(f"Search index loaded {count} {table} in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def _sync_delta(self, supabase: Client, token: str, kind: str) -> bool:
+        """
+        Apply rows updated since the last watermark, then compare the table's active
+        row count with the index.
+
+        Returns:
+            False when the counts differ, which means rows were deleted and a full
+            reload of the table is needed.
+        """
+        table = SEARCHABLE_KINDS[kind][0]
+        watermark = self._watermarks.get(table, "")
+        rows = list(fetch_all(
+            lambda: supabase.postgrest.auth(token).from_(table).select(self._columns(kind)).gt("updated_at", watermark)
+        ))
+        for row in rows:
+            self.apply_row(kind, row)
+        if rows:
+            logger.info(f"Search index applied {len(rows)} changed {table}")
+
+        count_response = supabase.postgrest.auth(token).from_(table)\
+            .select("id", count="exact")\
+            .eq("status", "active")\
+            .limit(1)\
+            .execute()
+        return count_response.count == self.index.count(kind)
+
+
+# Process-wide search index
+catalog_search = CatalogSearch()
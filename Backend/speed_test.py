@@ -1,8 +1,31 @@
+"""
+Endpoint speed test and multi-user load harness.
+
+Without arguments, logs in TEST_EMAIL and calls every endpoint once, sequentially.
+With --users, runs N virtual users through the real learning flow
+(login -> available -> next session -> questions -> start -> answer x k -> finish)
+and reports p50/p95/p99 latency and throughput per endpoint.
+
+Usage:
+    python speed_test.py
+    python speed_test.py --users 50 --concurrency 20 --ramp-up 10 --iterations 3 --answers 5 \
+        --output results.json [--baseline previous.json]
+
+Virtual users share TEST_EMAIL/TEST_PASSWORD unless LOAD_TEST_USERS points to a file
+with one "email,password" per line; users are assigned round-robin.
+"""
+
+import argparse
 import httpx
+import json
+import math
+import platform
+import sys
 import time
 import os
 import asyncio
-from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -17,10 +40,7 @@ else:
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000")
 TEST_EMAIL = os.getenv("TEST_EMAIL")
 TEST_PASSWORD = os.getenv("TEST_PASSWORD")
-
-if not TEST_EMAIL or not TEST_PASSWORD:
-    print("Error: TEST_EMAIL and TEST_PASSWORD environment variables must be set.")
-    exit(1)
+LOAD_TEST_USERS = os.getenv("LOAD_TEST_USERS")
 
 async def test_endpoint(client: httpx.AsyncClient, method: str, path: str, name: str, token: str = None, json_data: Dict = None) -> Dict[str, Any]:
     url = f"{API_BASE_URL}{path}"
@@ -157,5 +177,299 @@ async def run_speed_test():
             if res["error"]:
                 print(f"  Error: {res['error']}")
 
+
+
+# ============================================================================
+# LOAD HARNESS
+# ============================================================================
+
+def load_credentials() -> List[Tuple[str, str]]:
+    """Return the (email, password) pairs virtual users log in with."""
+    if LOAD_TEST_USERS:
+        credentials = []
+        with open(LOAD_TEST_USERS, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    email, password = line.split(",", 1)
+                    credentials.append((email.strip(), password.strip()))
+        if credentials:
+            return credentials
+    if TEST_EMAIL and TEST_PASSWORD:
+        return [(TEST_EMAIL, TEST_PASSWORD)]
+    return []
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class LoadRecorder:
+    """Collects one sample per request and a count of flows per outcome."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[Tuple[float, bool]]] = defaultdict(list)
+        self.flows: Dict[str, int] = defaultdict(int)
+
+    def add(self, endpoint: str, duration: float, ok: bool) -> None:
+        self.samples[endpoint].append((duration, ok))
+
+    def summary(self, wall_time: float) -> Dict[str, Dict[str, Any]]:
+        endpoints = {}
+        for endpoint, samples in sorted(self.samples.items()):
+            durations = sorted(d * 1000 for d, _ in samples)
+            errors = sum(1 for _, ok in samples if not ok)
+            endpoints[endpoint] = {
+                "requests": len(samples),
+                "errors": errors,
+                "error_rate": round(errors / len(samples), 4),
+                "throughput_rps": round(len(samples) / wall_time, 3) if wall_time else 0.0,
+                "mean_ms": round(sum(durations) / len(durations), 2),
+                "p50_ms": round(percentile(durations, 50), 2),
+                "p95_ms": round(percentile(durations, 95), 2),
+                "p99_ms": round(percentile(durations, 99), 2),
+                "max_ms": round(durations[-1], 2),
+            }
+        return endpoints
+
+
+async def timed_request(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    recorder: LoadRecorder,
+    method: str,
+    endpoint: str,
+    path: str,
+    token: Optional[str] = None,
+    json_data: Optional[Dict] = None,
+    ok_status: Tuple[int, ...] = (200,)
+) -> Optional[httpx.Response]:
+    """Send one request under the concurrency limit and record its latency under endpoint."""
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    async with semaphore:
+        start_time = time.perf_counter()
+        try:
+            response = await client.request(method, f"{API_BASE_URL}{path}", headers=headers, json=json_data)
+        except Exception:
+            recorder.add(endpoint, time.perf_counter() - start_time, False)
+            return None
+        recorder.add(endpoint, time.perf_counter() - start_time, response.status_code in ok_status)
+    return response if response.status_code in ok_status else None
+
+
+async def run_learning_flow(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    recorder: LoadRecorder,
+    token: str,
+    answers: int
+) -> str:
+    """
+    Run one pass of the learning flow for a logged in virtual user.
+
+    Returns:
+        The flow outcome: completed, or the step it stopped at
+    """
+    def request(method, endpoint, path, **kwargs):
+        return timed_request(client, semaphore, recorder, method, endpoint, path, token=token, **kwargs)
+
+    if await request("GET", "GET /history/sessions/available", "/history/sessions/available") is None:
+        return "failed_available"
+
+    next_res = await request("GET", "GET /history/sessions/next", "/history/sessions/next")
+    session = next_res.json().get("session") if next_res is not None else None
+    if not session:
+        return "no_next_session"
+    session_id = session["id"]
+
+    questions_res = await request(
+        "GET", "GET /learning/session/questions", f"/learning/session/questions?session_id={session_id}"
+    )
+    questions = questions_res.json().get("questions", []) if questions_res is not None else []
+    if not questions:
+        return "no_questions"
+
+    start_res = await request(
+        "POST", "POST /learning/session/start", "/learning/session/start",
+        json_data={"session_id": session_id}, ok_status=(201,)
+    )
+    if start_res is None:
+        return "failed_start"
+    history_id = start_res.json()["id"]
+
+    for i in range(answers):
+        await request("POST", "POST /learning/question/answer", "/learning/question/answer", json_data={
+            "question_id": questions[i % len(questions)]["id"],
+            "user_session_history_id": history_id,
+            "answer": "a",
+            "started_at": datetime.utcnow().isoformat(),
+            "asked_for_explanation": False
+        })
+
+    # Not passing keeps every iteration on the same next session, so runs are repeatable
+    finish_res = await request(
+        "POST", "POST /learning/session/finish", "/learning/session/finish",
+        json_data={"history_id": history_id, "passed": False}, ok_status=(204,)
+    )
+    return "completed" if finish_res is not None else "failed_finish"
+
+
+async def virtual_user(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    recorder: LoadRecorder,
+    credentials: Tuple[str, str],
+    start_delay: float,
+    iterations: int,
+    answers: int
+) -> None:
+    await asyncio.sleep(start_delay)
+    email, password = credentials
+    login_res = await timed_request(
+        client, semaphore, recorder, "POST", "POST /auth/login", "/auth/login",
+        json_data={"email": email, "password": password}
+    )
+    token = login_res.json().get("session", {}).get("access_token") if login_res is not None else None
+    if not token:
+        recorder.flows["failed_login"] += 1
+        return
+
+    for _ in range(iterations):
+        outcome = await run_learning_flow(client, semaphore, recorder, token, answers)
+        recorder.flows[outcome] += 1
+
+
+async def run_load_test(
+    users: int,
+    concurrency: int,
+    ramp_up: float,
+    iterations: int,
+    answers: int
+) -> Dict[str, Any]:
+    """
+    Run the learning flow for N virtual users and return the machine-readable results.
+
+    Virtual users start evenly spread over ramp_up seconds; concurrency caps the
+    number of requests in flight across all of them.
+    """
+    credentials = load_credentials()
+    semaphore = asyncio.Semaphore(concurrency)
+    recorder = LoadRecorder()
+    started_at = datetime.utcnow().isoformat() + "Z"
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=60.0, limits=limits) as client:
+        start_time = time.perf_counter()
+        await asyncio.gather(*(
+            virtual_user(
+                client, semaphore, recorder,
+                credentials[i % len(credentials)],
+                ramp_up * i / users,
+                iterations,
+                answers
+            )
+            for i in range(users)
+        ))
+        wall_time = time.perf_counter() - start_time
+
+    endpoints = recorder.summary(wall_time)
+    total_requests = sum(e["requests"] for e in endpoints.values())
+    return {
+        "config": {
+            "api_base_url": API_BASE_URL,
+            "users": users,
+            "concurrency": concurrency,
+            "ramp_up_s": ramp_up,
+            "iterations": iterations,
+            "answers": answers,
+            "distinct_accounts": len(credentials),
+        },
+        "environment": {"python": platform.python_version(), "host": platform.node()},
+        "started_at": started_at,
+        "duration_s": round(wall_time, 3),
+        "totals": {
+            "requests": total_requests,
+            "errors": sum(e["errors"] for e in endpoints.values()),
+            "throughput_rps": round(total_requests / wall_time, 3) if wall_time else 0.0,
+            "flows": dict(sorted(recorder.flows.items())),
+        },
+        "endpoints": endpoints,
+    }
+
+
+def print_load_report(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    config = results["config"]
+    print(f"\nLoad test against {config['api_base_url']}: {config['users']} users, "
+          f"concurrency {config['concurrency']}, ramp-up {config['ramp_up_s']}s, "
+          f"{config['iterations']} iteration(s), {config['answers']} answer(s)")
+    print("-" * 110)
+    print(f"{'Endpoint':<36} | {'Reqs':>6} | {'Err':>5} | {'RPS':>8} | {'p50 ms':>9} | {'p95 ms':>9} | {'p99 ms':>9} | {'Δp95':>8}")
+    print("-" * 110)
+    baseline_endpoints = (baseline or {}).get("endpoints", {})
+    for endpoint, stats in results["endpoints"].items():
+        delta = ""
+        if endpoint in baseline_endpoints and baseline_endpoints[endpoint]["p95_ms"]:
+            change = stats["p95_ms"] / baseline_endpoints[endpoint]["p95_ms"] - 1
+            delta = f"{change * 100:+.0f}%"
+        print(f"{endpoint:<36} | {stats['requests']:>6} | {stats['errors']:>5} | {stats['throughput_rps']:>8.2f} | "
+              f"{stats['p50_ms']:>9.1f} | {stats['p95_ms']:>9.1f} | {stats['p99_ms']:>9.1f} | {delta:>8}")
+    totals = results["totals"]
+    print("-" * 110)
+    print(f"{totals['requests']} requests, {totals['errors']} errors, {totals['throughput_rps']:.2f} req/s "
+          f"in {results['duration_s']:.1f}s. Flows: {totals['flows']}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Endpoint speed test and multi-user load harness")
+    parser.add_argument("--users", type=int, default=0, help="Number of virtual users (0 runs the single-user speed test)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Maximum requests in flight")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which virtual users are started")
+    parser.add_argument("--iterations", type=int, default=1, help="Learning flows per virtual user")
+    parser.add_argument("--answers", type=int, default=3, help="Questions answered per flow")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Previous results JSON to compare p95 against")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    if not args.users:
+        if not TEST_EMAIL or not TEST_PASSWORD:
+            print("Error: TEST_EMAIL and TEST_PASSWORD environment variables must be set.")
+            return 1
+        asyncio.run(run_speed_test())
+        return 0
+
+    if not load_credentials():
+        print("Error: set TEST_EMAIL and TEST_PASSWORD, or LOAD_TEST_USERS to a file of email,password lines.")
+        return 1
+
+    results = asyncio.run(run_load_test(
+        users=args.users,
+        concurrency=max(1, args.concurrency),
+        ramp_up=max(0.0, args.ramp_up),
+        iterations=max(1, args.iterations),
+        answers=max(0, args.answers)
+    ))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_load_report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nResults written to {args.output}")
+    return 0
+
+
 if __name__ == "__main__":
-    asyncio.run(run_speed_test())
+    sys.exit(main())
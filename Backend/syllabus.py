@@ -2,29 +2,82 @@
 Syllabus management router for fetching and managing syllabus content.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Security
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Security, Request, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials
-from supabase import Client
-from typing import List
+from supabase import Client, create_client
+from typing import BinaryIO, FrozenSet, Iterator, List
 import logging
+import shutil
+import tempfile
 
-from config import get_supabase
+import orjson
+
+from config import get_supabase, settings
 from models import (
     Block, BlockListResponse, BlockQueryResponse,
     Topic, TopicListResponse, TopicQueryResponse,
     Heading, HeadingListResponse, HeadingQueryResponse,
     Concept, ConceptListResponse, ConceptQueryResponse,
-    Question, QuestionListResponse, QuestionQueryResponse
+    Question, QuestionListResponse, QuestionQueryResponse,
+    SearchHit, SearchResponse, SyllabusTreeResponse
 )
 
 from middleware import get_current_user, security
+from etags import catalog_etag, etag_matches, not_modified, set_etag
+from query_filters import compile_filters, EmptyResult
+from question_import import import_questions, read_records, Record
+from search_index import catalog_search, SEARCHABLE_KINDS
+from syllabus_tree import syllabus_tree_cache
 
 logger = logging.getLogger(__name__)
 
+CONTENT_ADMIN_ROLES = ("content_admin", "super_admin")
+# Uploads up to this size are imported from memory, larger ones from a temporary file
+QUESTION_IMPORT_SPOOL_BYTES = 1024 * 1024
+
 router = APIRouter(prefix="/syllabus", tags=["Syllabus"])
 
+@router.get("/tree", response_model=SyllabusTreeResponse)
+async def get_syllabus_tree(
+    http_request: Request,
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    Returns the full syllabus tree (blocks → topics → headings → concepts)
+    and the learning path (lessons → sessions) in one response.
+    
+    The payload is built and serialized once per catalog version and served from memory.
+    Supports If-None-Match.
+    """
+    try:
+        token = credentials.credentials
+        
+        _, etag = await syllabus_tree_cache.current_etag(supabase, token)
+        if etag_matches(http_request, etag):
+            return not_modified(etag)
+        
+        payload, etag = await syllabus_tree_cache.get(supabase, token)
+        return Response(
+            content=payload,
+            media_type="application/json",
+            headers={"ETag": etag, "Cache-Control": "private, no-cache"}
+        )
+
+    except Exception as e:
+        logger.error(f"Error fetching syllabus tree: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+            detail="Failed to fetch syllabus tree"
+        )
+
+
 @router.get("/blocks/fetch", response_model=BlockListResponse)
 async def fetch_blocks(
+    http_request: Request,
+    http_response: Response,
     ids: str = Query(..., description="Comma-separated list of block IDs"),
     current_user = Depends(get_current_user),
     supabase: Client = Depends(get_supabase),
@@ -47,6 +100,12 @@ async def fetch_blocks(
         # Fetch blocks from Supabase
         # 'in_' filter expects a list
         token = credentials.credentials
+
+        # Answer 304 before querying when the client already holds this version
+        etag = await catalog_etag(supabase, token, "blocks", block_ids)
+        if etag_matches(http_request, etag):
+            return not_modified(etag)
+
         response = supabase.postgrest.auth(token).from_("blocks").select("*").in_("id", block_ids).execute()
         
         # Check for errors in response (supabase-py usually raises exception on error, but good to be safe)
@@ -55,6 +114,7 @@ async def fetch_blocks(
         # Determine if any blocks were missing (optional: partial success is usually fine for bulk fetch, 
         # but if strict validation is needed, we could check len(blocks_data) == len(block_ids))
         
+        set_etag(http_response, etag)
         return BlockListResponse(blocks=blocks_data)
 
     except Exception as e:
@@ -84,66 +144,24 @@ async def query_blocks(
     """
     try:
         token = credentials.credentials
-        # Select id, order, name, description to facilitate python-side filtering
-        query = supabase.postgrest.auth(token).from_("blocks").select("id, order, name, description")
-        
-        # Always filter for active blocks
-        query = query.eq("status", "active")
-        
+        # Only ids are selected; every filter is evaluated by the database
+        query = supabase.postgrest.auth(token).from_("blocks").select("id")
+        query = compile_filters(
+            query,
+            equals={
+                "status": "active"
+            },
+            text={
+                "name": (name_text, name_exact),
+                "description": (description_text, description_exact)
+            },
+            numbers={
+                "order": (order_number, order_greater, order_less)
+            }
+        )
+
         response = query.execute()
-        data = response.data
-
-        # Python-side filtering for name, description and order
-        filtered_data = []
-        for item in data:
-            match = True
-            
-            # Name filter
-            if name_text:
-                val = item.get('name') or ""
-                if name_exact:
-                    if val != name_text:
-                        match = False
-                else:
-                    if name_text.lower() not in val.lower():
-                        match = False
-            
-            if not match:
-                continue
-
-            # Description filter
-            if description_text:
-                val = item.get('description') or ""
-                if description_exact:
-                    if val != description_text:
-                        match = False
-                else:
-                    if description_text.lower() not in val.lower():
-                        match = False
-            
-            if not match:
-                continue
-
-            # Order filter
-            if order_number is not None:
-                order_val = item.get('order')
-                if order_val is None:
-                    match = False
-                elif order_greater:
-                    if not (order_val > order_number):
-                        match = False
-                elif order_less:
-                    if not (order_val < order_number):
-                        match = False
-                else:
-                    if not (order_val == order_number):
-                        match = False
-            
-            if match:
-                filtered_data.append(item)
-        
-        ids = [item['id'] for item in filtered_data]
-        return BlockQueryResponse(ids=ids)
+        return BlockQueryResponse(ids=[item['id'] for item in response.data])
 
     except Exception as e:
         logger.error(f"Error querying blocks: {str(e)}")
@@ -174,87 +192,31 @@ async def query_topics(
     """
     try:
         token = credentials.credentials
-        # Select id, order, name, description to facilitate python-side filtering
-        query = supabase.postgrest.auth(token).from_("topics").select("id, order, name, description")
-        
-        # Always filter for active topics
-        query = query.eq("status", "active")
-        
-        if block_ids:
-            # Parse and validate block_ids
-            import uuid
-            valid_ids = []
-            for id_str in block_ids.split(','):
-                id_clean = id_str.strip()
-                if id_clean:
-                    try:
-                        uuid.UUID(id_clean)
-                        valid_ids.append(id_clean)
-                    except ValueError:
-                        pass # Ignore invalid UUIDs
-            
-            if valid_ids:
-                # Topics belong to blocks via block_id
-                query = query.in_("block_id", valid_ids)
-            elif block_ids.strip(): 
-                # If IDs were provided but none were valid, return empty list immediately
-                return TopicQueryResponse(ids=[])
+        # Only ids are selected; every filter is evaluated by the database
+        query = supabase.postgrest.auth(token).from_("topics").select("id")
+        query = compile_filters(
+            query,
+            equals={
+                "status": "active"
+            },
+            ids={
+                "block_id": block_ids
+            },
+            text={
+                "name": (name_text, name_exact),
+                "description": (description_text, description_exact)
+            },
+            numbers={
+                "order": (order_number, order_greater, order_less)
+            }
+        )
 
         response = query.execute()
-        data = response.data
-
-        # Python-side filtering for name, description, and order
-        filtered_data = []
-        for item in data:
-            match = True
-            
-            # Name filter
-            if name_text:
-                val = item.get('name') or ""
-                if name_exact:
-                    if val != name_text:
-                        match = False
-                else:
-                    if name_text.lower() not in val.lower():
-                        match = False
-            
-            if not match:
-                continue
-
-            # Description filter
-            if description_text:
-                val = item.get('description') or ""
-                if description_exact:
-                    if val != description_text:
-                        match = False
-                else:
-                    if description_text.lower() not in val.lower():
-                        match = False
-            
-            if not match:
-                continue
-
-            # Order filter
-            if order_number is not None:
-                order_val = item.get('order')
-                if order_val is None:
-                    match = False
-                elif order_greater:
-                    if not (order_val > order_number):
-                        match = False
-                elif order_less:
-                    if not (order_val < order_number):
-                        match = False
-                else:
-                    if not (order_val == order_number):
-                        match = False
-            
-            if match:
-                filtered_data.append(item)
-        
-        ids = [item['id'] for item in filtered_data]
-        return TopicQueryResponse(ids=ids)
+        return TopicQueryResponse(ids=[item['id'] for item in response.data])
 
+    except EmptyResult:
+        # An id filter was provided but none of its ids were valid
+        return TopicQueryResponse(ids=[])
     except Exception as e:
         logger.error(f"Error querying topics: {str(e)}")
         raise HTTPException(
@@ -265,6 +227,8 @@ async def query_topics(
 
 @router.get("/topics/fetch", response_model=TopicListResponse)
 async def fetch_topics(
+    http_request: Request,
+    http_response: Response,
     ids: str = Query(..., description="Comma-separated list of topic IDs"),
     current_user = Depends(get_current_user),
     supabase: Client = Depends(get_supabase),
@@ -284,7 +248,14 @@ async def fetch_topics(
             return TopicListResponse(topics=[])
 
         token = credentials.credentials
+
+        # Answer 304 before querying when the client already holds this version
+        etag = await catalog_etag(supabase, token, "topics", topic_ids)
+        if etag_matches(http_request, etag):
+            return not_modified(etag)
+
         response = supabase.postgrest.auth(token).from_("topics").select("*").in_("id", topic_ids).execute()
+        set_etag(http_response, etag)
         return TopicListResponse(topics=response.data)
 
     except Exception as e:
@@ -318,87 +289,31 @@ async def query_headings(
     """
     try:
         token = credentials.credentials
-        # Select id, order, name, description, topic_id
-        query = supabase.postgrest.auth(token).from_("headings").select("id, order, name, description, topic_id")
-        
-        # Always filter for active headings
-        query = query.eq("status", "active")
-        
-        if topic_ids:
-            # Parse and validate topic_ids
-            import uuid
-            valid_ids = []
-            for id_str in topic_ids.split(','):
-                id_clean = id_str.strip()
-                if id_clean:
-                    try:
-                        uuid.UUID(id_clean)
-                        valid_ids.append(id_clean)
-                    except ValueError:
-                        pass # Ignore invalid UUIDs
-            
-            if valid_ids:
-                # Headings belong to topics via topic_id
-                query = query.in_("topic_id", valid_ids)
-            elif topic_ids.strip():
-                 # If IDs were provided but none were valid, return empty list
-                return HeadingQueryResponse(ids=[])
+        # Only ids are selected; every filter is evaluated by the database
+        query = supabase.postgrest.auth(token).from_("headings").select("id")
+        query = compile_filters(
+            query,
+            equals={
+                "status": "active"
+            },
+            ids={
+                "topic_id": topic_ids
+            },
+            text={
+                "name": (name_text, name_exact),
+                "description": (description_text, description_exact)
+            },
+            numbers={
+                "order": (order_number, order_greater, order_less)
+            }
+        )
 
         response = query.execute()
-        data = response.data
-
-        # Python-side filtering for name, description, and order
-        filtered_data = []
-        for item in data:
-            match = True
-            
-            # Name filter
-            if name_text:
-                val = item.get('name') or ""
-                if name_exact:
-                    if val != name_text:
-                        match = False
-                else:
-                    if name_text.lower() not in val.lower():
-                        match = False
-            
-            if not match:
-                continue
-
-            # Description filter
-            if description_text:
-                val = item.get('description') or ""
-                if description_exact:
-                    if val != description_text:
-                        match = False
-                else:
-                    if description_text.lower() not in val.lower():
-                        match = False
-            
-            if not match:
-                continue
-
-            # Order filter
-            if order_number is not None:
-                order_val = item.get('order')
-                if order_val is None:
-                    match = False
-                elif order_greater:
-                    if not (order_val > order_number):
-                        match = False
-                elif order_less:
-                    if not (order_val < order_number):
-                        match = False
-                else:
-                    if not (order_val == order_number):
-                        match = False
-            
-            if match:
-                filtered_data.append(item)
-        
-        ids = [item['id'] for item in filtered_data]
-        return HeadingQueryResponse(ids=ids)
+        return HeadingQueryResponse(ids=[item['id'] for item in response.data])
 
+    except EmptyResult:
+        # An id filter was provided but none of its ids were valid
+        return HeadingQueryResponse(ids=[])
     except Exception as e:
         logger.error(f"Error querying headings: {str(e)}")
         raise HTTPException(
@@ -409,6 +324,8 @@ async def query_headings(
 
 @router.get("/headings/fetch", response_model=HeadingListResponse)
 async def fetch_headings(
+    http_request: Request,
+    http_response: Response,
     ids: str = Query(..., description="Comma-separated list of heading IDs"),
     current_user = Depends(get_current_user),
     supabase: Client = Depends(get_supabase),
@@ -428,7 +345,14 @@ async def fetch_headings(
             return HeadingListResponse(headings=[])
 
         token = credentials.credentials
+
+        # Answer 304 before querying when the client already holds this version
+        etag = await catalog_etag(supabase, token, "headings", heading_ids)
+        if etag_matches(http_request, etag):
+            return not_modified(etag)
+
         response = supabase.postgrest.auth(token).from_("headings").select("*").in_("id", heading_ids).execute()
+        set_etag(http_response, etag)
         return HeadingListResponse(headings=response.data)
 
     except Exception as e:
@@ -462,87 +386,31 @@ async def query_concepts(
     """
     try:
         token = credentials.credentials
-        # Select id, order, name, description, heading_id
-        query = supabase.postgrest.auth(token).from_("concepts").select("id, order, name, description, heading_id")
-        
-        # Always filter for active concepts
-        query = query.eq("status", "active")
-        
-        if heading_ids:
-            # Parse and validate heading_ids
-            import uuid
-            valid_ids = []
-            for id_str in heading_ids.split(','):
-                id_clean = id_str.strip()
-                if id_clean:
-                    try:
-                        uuid.UUID(id_clean)
-                        valid_ids.append(id_clean)
-                    except ValueError:
-                        pass # Ignore invalid UUIDs
-            
-            if valid_ids:
-                # Concepts belong to headings via heading_id
-                query = query.in_("heading_id", valid_ids)
-            elif heading_ids.strip():
-                 # If IDs were provided but none were valid, return empty list
-                return ConceptQueryResponse(ids=[])
+        # Only ids are selected; every filter is evaluated by the database
+        query = supabase.postgrest.auth(token).from_("concepts").select("id")
+        query = compile_filters(
+            query,
+            equals={
+                "status": "active"
+            },
+            ids={
+                "heading_id": heading_ids
+            },
+            text={
+                "name": (name_text, name_exact),
+                "description": (description_text, description_exact)
+            },
+            numbers={
+                "order": (order_number, order_greater, order_less)
+            }
+        )
 
         response = query.execute()
-        data = response.data
-
-        # Python-side filtering for name, description, and order
-        filtered_data = []
-        for item in data:
-            match = True
-            
-            # Name filter
-            if name_text:
-                val = item.get('name') or ""
-                if name_exact:
-                    if val != name_text:
-                        match = False
-                else:
-                    if name_text.lower() not in val.lower():
-                        match = False
-            
-            if not match:
-                continue
-
-            # Description filter
-            if description_text:
-                val = item.get('description') or ""
-                if description_exact:
-                    if val != description_text:
-                        match = False
-                else:
-                    if description_text.lower() not in val.lower():
-                        match = False
-            
-            if not match:
-                continue
-
-            # Order filter
-            if order_number is not None:
-                order_val = item.get('order')
-                if order_val is None:
-                    match = False
-                elif order_greater:
-                    if not (order_val > order_number):
-                        match = False
-                elif order_less:
-                    if not (order_val < order_number):
-                        match = False
-                else:
-                    if not (order_val == order_number):
-                        match = False
-            
-            if match:
-                filtered_data.append(item)
-        
-        ids = [item['id'] for item in filtered_data]
-        return ConceptQueryResponse(ids=ids)
+        return ConceptQueryResponse(ids=[item['id'] for item in response.data])
 
+    except EmptyResult:
+        # An id filter was provided but none of its ids were valid
+        return ConceptQueryResponse(ids=[])
     except Exception as e:
         logger.error(f"Error querying concepts: {str(e)}")
         raise HTTPException(
@@ -553,6 +421,8 @@ async def query_concepts(
 
 @router.get("/concepts/fetch", response_model=ConceptListResponse)
 async def fetch_concepts(
+    http_request: Request,
+    http_response: Response,
     ids: str = Query(..., description="Comma-separated list of concept IDs"),
     current_user = Depends(get_current_user),
     supabase: Client = Depends(get_supabase),
@@ -572,7 +442,14 @@ async def fetch_concepts(
             return ConceptListResponse(concepts=[])
 
         token = credentials.credentials
+
+        # Answer 304 before querying when the client already holds this version
+        etag = await catalog_etag(supabase, token, "concepts", concept_ids)
+        if etag_matches(http_request, etag):
+            return not_modified(etag)
+
         response = supabase.postgrest.auth(token).from_("concepts").select("*").in_("id", concept_ids).execute()
+        set_etag(http_response, etag)
         return ConceptListResponse(concepts=response.data)
 
     except Exception as e:
@@ -602,44 +479,27 @@ async def query_questions(
     """
     try:
         token = credentials.credentials
+        # Only ids are selected; every filter is evaluated by the database
         query = supabase.postgrest.auth(token).from_("questions").select("id")
-        
-        # Always filter for active questions
-        query = query.eq("status", "active")
-        
-        if concept_ids:
-            # Parse and validate concept_ids
-            import uuid
-            valid_ids = []
-            for id_str in concept_ids.split(','):
-                id_clean = id_str.strip()
-                if id_clean:
-                    try:
-                        uuid.UUID(id_clean)
-                        valid_ids.append(id_clean)
-                    except ValueError:
-                        pass # Ignore invalid UUIDs
-            
-            if valid_ids:
-                query = query.in_("concept_id", valid_ids)
-            elif concept_ids.strip():
-                 # If IDs were provided but none were valid, return empty list
-                return QuestionQueryResponse(ids=[])
-
-        if difficulty_number is not None:
-            if difficulty_greater:
-                query = query.gt("difficulty", difficulty_number)
-            elif difficulty_less:
-                query = query.lt("difficulty", difficulty_number)
-            else:
-                query = query.eq("difficulty", difficulty_number)
+        query = compile_filters(
+            query,
+            equals={
+                "status": "active"
+            },
+            ids={
+                "concept_id": concept_ids
+            },
+            numbers={
+                "difficulty": (difficulty_number, difficulty_greater, difficulty_less)
+            }
+        )
 
         response = query.execute()
-        data = response.data
-        
-        ids = [item['id'] for item in data]
-        return QuestionQueryResponse(ids=ids)
+        return QuestionQueryResponse(ids=[item['id'] for item in response.data])
 
+    except EmptyResult:
+        # An id filter was provided but none of its ids were valid
+        return QuestionQueryResponse(ids=[])
     except Exception as e:
         logger.error(f"Error querying questions: {str(e)}")
         raise HTTPException(
@@ -650,6 +510,8 @@ async def query_questions(
 
 @router.get("/questions/fetch", response_model=QuestionListResponse)
 async def fetch_questions(
+    http_request: Request,
+    http_response: Response,
     ids: str = Query(..., description="Comma-separated list of question IDs"),
     current_user = Depends(get_current_user),
     supabase: Client = Depends(get_supabase),
@@ -669,7 +531,14 @@ async def fetch_questions(
             return QuestionListResponse(questions=[])
 
         token = credentials.credentials
+
+        # Answer 304 before querying when the client already holds this version
+        etag = await catalog_etag(supabase, token, "questions", question_ids)
+        if etag_matches(http_request, etag):
+            return not_modified(etag)
+
         response = supabase.postgrest.auth(token).from_("questions").select("*").in_("id", question_ids).execute()
+        set_etag(http_response, etag)
         return QuestionListResponse(questions=response.data)
 
     except Exception as e:
@@ -678,3 +547,134 @@ async def fetch_questions(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
             detail="Failed to fetch questions"
         )
+
+
+def stream_question_import(
+    supabase: Client,
+    token: str,
+    upload: BinaryIO,
+    records: Iterator[Record],
+    concept_ids: FrozenSet[str],
+    dry_run: bool
+) -> Iterator[bytes]:
+    """
+    NDJSON import events; a sync generator, so Starlette runs the import in its threadpool.
+    supabase must be a client of its own: auth() sets a header on the client, which
+    must not race with requests made through the shared client on the event loop.
+    """
+    try:
+        for report in import_questions(supabase, token, records, concept_ids, dry_run=dry_run):
+            yield orjson.dumps(report.event()) + b"\n"
+    except Exception as e:
+        # Headers are already sent, so the failure is reported in the stream
+        logger.error("Error importing questions: %s", e)
+        yield orjson.dumps({"event": "error", "error": str(e)}) + b"\n"
+    finally:
+        upload.close()
+
+
+@router.post("/questions/import")
+async def import_questions_file(
+    file: UploadFile = File(..., description="Questions in the Datasheets format: a semicolon-separated .csv (UTF-8) or an .xlsx workbook"),
+    delimiter: str = Query(";", min_length=1, max_length=1, description="CSV field separator."),
+    dry_run: bool = Query(False, description="Validate the file without writing."),
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    Bulk import questions. Content admins only.
+    
+    Rows are parsed one at a time, validated (concept_id in the syllabus, correct_option
+    a/b/c, difficulty 1-10) and upserted in batches with one statement per batch. Rows
+    without an id are keyed by their concept, text and options, so re-importing a file
+    updates its questions.
+    
+    The response streams NDJSON: a `progress` event after each batch, then a `done`
+    event with the totals and the rejected rows (or an `error` event).
+    """
+    try:
+        token = credentials.credentials
+
+        profile = supabase.postgrest.auth(token).from_("users")\
+            .select("role")\
+            .eq("id", current_user.id)\
+            .execute()
+        if not profile.data or profile.data[0]["role"] not in CONTENT_ADMIN_ROLES:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Only content admins can import questions"
+            )
+
+        concept_ids = await syllabus_tree_cache.concept_ids(supabase, token)
+
+        # The upload is closed once this handler returns, before the response streams
+        upload = tempfile.SpooledTemporaryFile(max_size=QUESTION_IMPORT_SPOOL_BYTES)
+        shutil.copyfileobj(file.file, upload)
+        upload.seek(0)
+        try:
+            records = read_records(upload, file.filename or "", delimiter)
+        except ValueError as e:
+            upload.close()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+
+        return StreamingResponse(
+            stream_question_import(
+                create_client(settings.supabase_url, settings.supabase_key),
+                token, upload, records, concept_ids, dry_run
+            ),
+            media_type="application/x-ndjson"
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error importing questions: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+            detail="Failed to import questions"
+        )
+
+
+@router.get("/search", response_model=SearchResponse)
+async def search_syllabus(
+    q: str = Query(..., min_length=3, description="The text to search for (at least 3 characters). Matching ignores case and accents."),
+    kinds: str = Query(None, description="Comma-separated kinds to search: block, topic, heading, concept, question. Defaults to all."),
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of hits."),
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    Full-text search over block, topic, heading and concept names and descriptions,
+    and question text and explanations.
+    
+    Served from an in-memory trigram index that is synced incrementally with the catalog.
+    """
+    try:
+        kind_set = None
+        if kinds:
+            kind_set = {k.strip() for k in kinds.split(',') if k.strip()}
+            unknown = kind_set - SEARCHABLE_KINDS.keys()
+            if unknown:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Unknown kinds: {', '.join(sorted(unknown))}"
+                )
+
+        await catalog_search.ensure_fresh(supabase, credentials.credentials)
+        hits = catalog_search.index.search(q, kinds=kind_set, limit=limit)
+        
+        return SearchResponse(hits=[SearchHit(kind=kind, id=doc_id, field=field) for kind, doc_id, field in hits])
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching syllabus: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, 
+            detail="Failed to search syllabus"
+        )
@@ -0,0 +1,140 @@
+"""
+Whole-syllabus tree cache.
+Builds the block -> topic -> heading -> concept tree plus lessons -> sessions once per
+catalog version, validates it once and keeps the serialized JSON bytes in memory,
+together with the set of concept ids in the tree (used to validate question imports).
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from supabase import Client
+
+from etags import get_catalog_version, make_etag
+from models import SyllabusTreeResponse
+from query_filters import fetch_all
+
+logger = logging.getLogger(__name__)
+
+TREE_TABLES = ("blocks", "topics", "headings", "concepts", "lessons", "sessions")
+
+
+def _children_by_parent(rows: List[Dict], parent_key: str) -> Dict[str, List[Dict]]:
+    """Group rows by their parent id, each group sorted by order."""
+    grouped: Dict[str, List[Dict]] = defaultdict(list)
+    for row in rows:
+        grouped[row[parent_key]].append(row)
+    for children in grouped.values():
+        children.sort(key=lambda r: r["order"])
+    return grouped
+
+
+def build_tree(tables: Dict[str, List[Dict]]) -> Dict:
+    """
+    Assemble the nested syllabus and learning path from flat table rows.
+
+    Args:
+        tables: table name -> list of rows
+
+    Returns:
+        Dictionary matching SyllabusTreeResponse
+    """
+    topics = _children_by_parent(tables["topics"], "block_id")
+    headings = _children_by_parent(tables["headings"], "topic_id")
+    concepts = _children_by_parent(tables["concepts"], "heading_id")
+    sessions = _children_by_parent(tables["sessions"], "lesson_id")
+
+    blocks = []
+    for block in sorted(tables["blocks"], key=lambda r: r["order"]):
+        block_topics = []
+        for topic in topics.get(block["id"], []):
+            topic_headings = []
+            for heading in headings.get(topic["id"], []):
+                topic_headings.append({**heading, "concepts": concepts.get(heading["id"], [])})
+            block_topics.append({**topic, "headings": topic_headings})
+        blocks.append({**block, "topics": block_topics})
+
+    lessons = [
+        {**lesson, "sessions": sessions.get(lesson["id"], [])}
+        for lesson in sorted(tables["lessons"], key=lambda r: r["order"])
+    ]
+
+    return {"blocks": blocks, "lessons": lessons}
+
+
+class SyllabusTreeCache:
+    """Holds the serialized syllabus tree for the current catalog version."""
+
+    def __init__(self):
+        self._key: Optional[Tuple[str, ...]] = None
+        self._payload: bytes = b""
+        self._etag: str = ""
+        self._concept_ids: FrozenSet[str] = frozenset()
+        self._lock = asyncio.Lock()
+
+    async def current_etag(self, supabase: Client, token: str) -> Tuple[Tuple[str, ...], str]:
+        """Return the catalog version key and the ETag the tree has for it."""
+        key = tuple([await get_catalog_version(supabase, token, table) for table in TREE_TABLES])
+        return key, make_etag("syllabus/tree", *key)
+
+    async def get(self, supabase: Client, token: str) -> Tuple[bytes, str]:
+        """
+        Return the serialized tree and its ETag, rebuilding it if the catalog changed.
+
+        Returns:
+            Tuple of (json_bytes, etag)
+        """
+        await self._refresh(supabase, token)
+        return self._payload, self._etag
+
+    async def concept_ids(self, supabase: Client, token: str) -> FrozenSet[str]:
+        """Return the ids of the concepts the current tree serves (active, under active ancestors)."""
+        await self._refresh(supabase, token)
+        return self._concept_ids
+
+    async def _refresh(self, supabase: Client, token: str) -> None:
+        """Rebuild the tree if the catalog changed."""
+        key, etag = await self.current_etag(supabase, token)
+        if key == self._key:
+            return
+
+        async with self._lock:
+            # Another request may have rebuilt it while we waited
+            if key != self._key:
+                self._payload, self._concept_ids = self._build(supabase, token)
+                self._key = key
+                self._etag = etag
+
+    def _build(self, supabase: Client, token: str) -> Tuple[bytes, FrozenSet[str]]:
+        started = time.perf_counter()
+        tables = {}
+        for table in TREE_TABLES:
+            def query_factory(table=table):
+                query = supabase.postgrest.auth(token).from_(table).select("*")
+                # Sessions have no status column, they follow their lesson
+                return query if table == "sessions" else query.eq("status", "active")
+            tables[table] = list(fetch_all(query_factory))
+
+        tree = build_tree(tables)
+        payload = SyllabusTreeResponse(**tree).model_dump_json().encode("utf-8")
+        # Walk the tree rather than the concepts table: an active concept under an
+        # inactive heading, topic or block is not served
+        concept_ids = frozenset(
+            concept["id"]
+            for block in tree["blocks"]
+            for topic in block["topics"]
+            for heading in topic["headings"]
+            for concept in heading["concepts"]
+        )
+        logger.info(
+            f"Syllabus tree rebuilt: {sum(len(rows) for rows in tables.values())} rows, "
+            f"{len(payload)} bytes in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+        return payload, concept_ids
+
+
+# Process-wide syllabus tree cache
+syllabus_tree_cache = SyllabusTreeCache()
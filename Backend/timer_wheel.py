@@ -0,0 +1,92 @@
+"""
+Hierarchical timer wheel.
+Timers are keyed (one per key) and bucketed by their due tick. Level 0 has one slot
+per tick; each higher level has slots SLOTS times as wide, and its slots are cascaded
+down a level when the clock reaches them. Scheduling and cancelling are dictionary
+operations whatever the number of timers, advancing one tick touches one slot per
+level at most, and memory is one slot entry per pending timer (no tombstones for
+cancelled or rescheduled timers).
+
+With the default 1 s tick and 4 levels of 256 slots a timer can be up to
+2^32 s ahead; timers further out wait in the top level and are re-placed on each pass.
+"""
+
+import math
+import time
+from typing import Dict, Hashable, List, Optional
+
+SLOT_BITS = 8
+SLOTS = 1 << SLOT_BITS
+SLOT_MASK = SLOTS - 1
+LEVELS = 4
+
+
+class TimerWheel:
+    """
+    Args:
+        tick_seconds: Resolution; timers fire on the first tick at or after their time
+        now: Start of the clock (epoch seconds), the current time by default
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, now: Optional[float] = None):
+        self.tick_seconds = tick_seconds
+        # levels[level][slot]: key -> due tick
+        self._levels: List[List[Dict[Hashable, int]]] = [[{} for _ in range(SLOTS)] for _ in range(LEVELS)]
+        # key -> the slot holding it, to cancel without searching
+        self._where: Dict[Hashable, Dict[Hashable, int]] = {}
+        self._tick = self._to_tick(time.time() if now is None else now)
+
+    def _to_tick(self, when: float) -> int:
+        return math.floor(when / self.tick_seconds)
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._where
+
+    def _place(self, key: Hashable, due: int) -> None:
+        # The lowest level whose higher digits are the same for the clock and the due
+        # tick: the slot is reached (and cascaded or fired) before the timer is due
+        level = 0
+        while level < LEVELS - 1 and (due >> (SLOT_BITS * (level + 1))) != (self._tick >> (SLOT_BITS * (level + 1))):
+            level += 1
+        slot = self._levels[level][(due >> (SLOT_BITS * level)) & SLOT_MASK]
+        slot[key] = due
+        self._where[key] = slot
+
+    def schedule(self, key: Hashable, when: float) -> None:
+        """Schedule (or move) the timer of key to fire at when (epoch seconds)."""
+        self.cancel(key)
+        self._place(key, max(math.ceil(when / self.tick_seconds), self._tick + 1))
+
+    def cancel(self, key: Hashable) -> bool:
+        slot = self._where.pop(key, None)
+        if slot is None:
+            return False
+        del slot[key]
+        return True
+
+    def advance(self, now: Optional[float] = None) -> List[Hashable]:
+        """Move the clock to now and return the keys of every timer that fell due."""
+        target = self._to_tick(time.time() if now is None else now)
+        fired: List[Hashable] = []
+        while self._tick < target:
+            self._tick += 1
+            tick = self._tick
+            # Cascade the higher-level slots that start at this tick, top level first
+            for level in range(LEVELS - 1, 0, -1):
+                if tick & ((1 << (SLOT_BITS * level)) - 1) == 0:
+                    slot = self._levels[level][(tick >> (SLOT_BITS * level)) & SLOT_MASK]
+                    if slot:
+                        entries = list(slot.items())
+                        slot.clear()
+                        for key, due in entries:
+                            self._place(key, due)
+            slot = self._levels[0][tick & SLOT_MASK]
+            if slot:
+                fired.extend(slot)
+                for key in slot:
+                    del self._where[key]
+                slot.clear()
+        return fired
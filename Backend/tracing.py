@@ -0,0 +1,282 @@
+"""
+Lightweight span-based request tracing.
+Spans nest route -> service -> Supabase call through a context variable. Every
+finished trace is exported as Zipkin v2 JSON, one trace per line, to a local file
+and optionally to a collector. Traces are kept at the sample rate, and always when
+the request was slow or failed, so p99 outliers can be attributed to a stage.
+"""
+
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import httpx
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from metrics import current_request_stats, register_upstream_hooks, upstream_target
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "polilingo-backend"
+
+# Upper bound on spans recorded for a single request
+MAX_SPANS_PER_TRACE = 1000
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "remote", "start_us", "_started", "duration_us", "tags")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, kind: Optional[str] = None, remote: Optional[str] = None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.remote = remote
+        self.start_us = time.time_ns() // 1000
+        self._started = time.perf_counter()
+        self.duration_us = 0
+        self.tags: Dict[str, str] = {}
+
+    def set_tag(self, key: str, value: Any) -> None:
+        self.tags[key] = str(value)
+
+    def finish(self) -> None:
+        self.duration_us = max(1, int((time.perf_counter() - self._started) * 1_000_000))
+
+    def to_zipkin(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "id": self.span_id,
+            "name": self.name,
+            "timestamp": self.start_us,
+            "duration": self.duration_us,
+            "localEndpoint": {"serviceName": SERVICE_NAME},
+            "tags": self.tags,
+        }
+        if self.parent_id:
+            span["parentId"] = self.parent_id
+        if self.kind:
+            span["kind"] = self.kind
+        if self.remote:
+            span["remoteEndpoint"] = {"serviceName": self.remote}
+        return span
+
+
+class Trace:
+    """Spans recorded for one request."""
+
+    __slots__ = ("trace_id", "spans", "dropped")
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = []
+        self.dropped = 0
+
+    def start_span(self, name: str, parent: Optional[Span], kind: Optional[str] = None, remote: Optional[str] = None) -> Optional[Span]:
+        if len(self.spans) >= MAX_SPANS_PER_TRACE:
+            self.dropped += 1
+            return None
+        span = Span(self.trace_id, parent.span_id if parent else None, name, kind, remote)
+        self.spans.append(span)
+        return span
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("polilingo_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("polilingo_span", default=None)
+
+
+@contextmanager
+def span(name: str, **tags: Any) -> Iterator[Optional[Span]]:
+    """
+    Record a child span of the current span. A no-op outside a traced request.
+
+    Usage:
+        with span("answer.record_history", question_id=qid):
+            ...
+    """
+    trace = _current_trace.get()
+    current = trace.start_span(name, _current_span.get()) if trace else None
+    if current is None:
+        yield None
+        return
+    for key, value in tags.items():
+        current.set_tag(key, value)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set_tag("error", type(e).__name__)
+        raise
+    finally:
+        current.finish()
+        _current_span.reset(token)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator recording a span around a sync or async function."""
+    def decorator(fn: Callable) -> Callable:
+        span_name = name or fn.__qualname__
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ============================================================================
+# SUPABASE CALLS
+# ============================================================================
+
+def _on_request(request: httpx.Request) -> None:
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    service, target = upstream_target(request.url)
+    call = trace.start_span(f"{request.method} {service}/{target}", _current_span.get(), kind="CLIENT", remote=f"supabase-{service}")
+    if call is not None:
+        call.set_tag("http.method", request.method)
+        call.set_tag("http.path", request.url.path)
+        request.extensions["polilingo_span"] = call
+
+
+def _on_response(response: httpx.Response) -> None:
+    call = response.request.extensions.get("polilingo_span")
+    if call is not None:
+        call.set_tag("http.status_code", response.status_code)
+        if response.status_code >= 400:
+            call.set_tag("error", str(response.status_code))
+        call.finish()
+
+
+register_upstream_hooks(_on_request, _on_response)
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+class TraceExporter:
+    """
+    Writes kept traces from a background thread so requests never block on I/O.
+
+    Args:
+        path: JSON Lines file, one Zipkin v2 span list per line (None to disable)
+        collector_url: Zipkin-compatible /api/v2/spans endpoint (None to disable)
+        max_queue: Traces buffered before new ones are dropped
+    """
+
+    def __init__(self, path: Optional[str], collector_url: Optional[str] = None, max_queue: int = 1000):
+        self.path = path
+        self.collector_url = collector_url
+        self._queue: "queue.Queue[List[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            logger.warning("Trace export queue full, dropping trace")
+
+    def _run(self) -> None:
+        client = httpx.Client(timeout=5.0) if self.collector_url else None
+        while True:
+            spans = self._queue.get()
+            try:
+                if self.path:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(spans, separators=(",", ":")) + "\n")
+                if client is not None:
+                    client.post(self.collector_url, json=spans)
+            except Exception as e:
+                logger.warning(f"Failed to export trace: {str(e)}")
+
+
+class TracingMiddleware:
+    """
+    Open a root span per HTTP request and export the trace when it is kept.
+
+    A trace is kept when it is sampled, when the request took at least slow_ms,
+    or when it answered a 5xx. Every request is recorded in memory so that slow
+    tail requests are never lost to sampling. Event streams stay open by design,
+    so for them only the time to the response start counts as slow.
+
+    Args:
+        app: Wrapped ASGI app
+        exporter: Destination for kept traces
+        sample_rate: Fraction of ordinary requests kept (0.0 - 1.0)
+        slow_ms: Requests at least this slow are always kept
+    """
+
+    def __init__(self, app: ASGIApp, exporter: TraceExporter, sample_rate: float = 0.01, slow_ms: float = 1000.0):
+        self.app = app
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = current_request_stats()
+        route = stats.route if stats else scope["path"]
+        trace = Trace()
+        root = trace.start_span(f"{scope['method']} {route}", None, kind="SERVER")
+        root.set_tag("http.method", scope["method"])
+        root.set_tag("http.route", route)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(root)
+        status_code = 500
+        response_start_us: Optional[int] = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_start_us
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = Headers(raw=message["headers"]).get("content-type", "")
+                if content_type.startswith("text/event-stream"):
+                    response_start_us = int((time.perf_counter() - root._started) * 1_000_000)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            root.finish()
+            root.set_tag("http.status_code", status_code)
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+
+            slow = (root.duration_us if response_start_us is None else response_start_us) >= self.slow_ms * 1000
+            if slow or status_code >= 500 or random.random() < self.sample_rate:
+                if slow:
+                    root.set_tag("trace.kept", "slow")
+                elif status_code >= 500:
+                    root.set_tag("trace.kept", "error")
+                if trace.dropped:
+                    root.set_tag("trace.dropped_spans", trace.dropped)
+                self.exporter.export([s.to_zipkin() for s in trace.spans])
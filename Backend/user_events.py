@@ -0,0 +1,196 @@
+"""
+Live user events.
+Clients subscribed to /events/stream get their lives, XP and streak pushed as they
+change instead of polling /users/profile. For each subscribed user the hub keeps the
+stats read once when the stream opened and moves them forward from in-process answer
+and finish events; life refills are timers on a TimerWheel keyed by user id and due at
+next_life_at, so no query runs while the user just waits for a life.
+
+Only subscribers connected to the process that handled an action see its events;
+every event carries absolute values, so a missed or dropped one is corrected by the next.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Set
+
+from config import get_supabase
+from lives_service import LivesService
+from timer_wheel import TimerWheel
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per connection; a client this far behind loses the oldest events
+USER_EVENT_QUEUE_SIZE = 64
+# Resolution of life refill timers
+USER_EVENT_TICK_SECONDS = 1.0
+
+
+@dataclass
+class LiveUser:
+    token: str
+    # total_xp, current_level, current_streak, longest_streak, last_streak_date,
+    # lives, last_life_lost_at as last known
+    stats: Dict[str, Any]
+    queues: Set[asyncio.Queue] = field(default_factory=set)
+
+
+def _parse_date(value: Any) -> Optional[date]:
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+class UserEventHub:
+    """Process-wide registry of event stream subscribers."""
+
+    def __init__(self):
+        self._users: Dict[str, LiveUser] = {}
+        self._wheel = TimerWheel(tick_seconds=USER_EVENT_TICK_SECONDS)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start firing refill timers; called from the application lifespan."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            # Wake on tick boundaries, when timers fall due
+            await asyncio.sleep(USER_EVENT_TICK_SECONDS - time.time() % USER_EVENT_TICK_SECONDS)
+            for user_id in self._wheel.advance():
+                try:
+                    await self._refill(user_id)
+                except Exception as e:
+                    logger.warning("Life refill event for %s failed: %s", user_id, e)
+
+    def subscribe(self, user_id: str, token: str, stats: Dict[str, Any], lives_status: Dict[str, Any]) -> asyncio.Queue:
+        """
+        Register a connection and queue its snapshot event. stats is the user's
+        user_gamification_stats row and lives_status what get_current_lives returned for it.
+        """
+        user = self._users.get(user_id)
+        if user is None:
+            user = self._users[user_id] = LiveUser(token, {})
+        user.token = token
+        user.stats = {**stats, "last_streak_date": _parse_date(stats.get("last_streak_date"))}
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=USER_EVENT_QUEUE_SIZE)
+        user.queues.add(queue)
+        self._set_lives(user_id, user, lives_status, publish=False)
+        queue.put_nowait(("snapshot", {
+            "total_xp": user.stats.get("total_xp", 0),
+            "current_level": user.stats.get("current_level"),
+            "current_streak": user.stats.get("current_streak", 0),
+            "longest_streak": user.stats.get("longest_streak", 0),
+            "last_streak_date": user.stats["last_streak_date"],
+            **self._lives_payload(lives_status)
+        }))
+        logger.debug("Event stream opened for %s (%d connections)", user_id, len(user.queues))
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue) -> None:
+        user = self._users.get(user_id)
+        if user is None:
+            return
+        user.queues.discard(queue)
+        if not user.queues:
+            del self._users[user_id]
+            self._wheel.cancel(user_id)
+        logger.debug("Event stream closed for %s", user_id)
+
+    def publish(self, user_id: str, event: str, data: Dict[str, Any]) -> None:
+        user = self._users.get(user_id)
+        if user is None:
+            return
+        for queue in user.queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait((event, data))
+
+    def record_answer(self, user_id: str, xp_gained: int = 0, lives_status: Optional[Dict[str, Any]] = None) -> None:
+        """An answer was recorded: it counts as activity for the streak, may earn XP and may cost a life."""
+        user = self._users.get(user_id)
+        if user is None:
+            return
+        self.record_activity(user_id)
+        if xp_gained:
+            user.stats["total_xp"] = user.stats.get("total_xp", 0) + xp_gained
+            self.publish(user_id, "xp", {"xp_gained": xp_gained, "total_xp": user.stats["total_xp"]})
+        if lives_status is not None:
+            self._set_lives(user_id, user, lives_status)
+
+    def record_activity(self, user_id: str) -> None:
+        """
+        Mirror the streak trigger (fn_log_activity_and_update_streak): the first
+        activity of a UTC day extends the streak if yesterday was active, else restarts it.
+        """
+        user = self._users.get(user_id)
+        if user is None:
+            return
+        today = datetime.now(timezone.utc).date()
+        last = user.stats.get("last_streak_date")
+        if last == today:
+            return
+        if last is None or last < today - timedelta(days=1):
+            streak = 1
+        else:
+            streak = user.stats.get("current_streak", 0) + 1
+        user.stats.update({
+            "current_streak": streak,
+            "longest_streak": max(user.stats.get("longest_streak", 0), streak),
+            "last_streak_date": today
+        })
+        self.publish(user_id, "streak", {
+            "current_streak": streak,
+            "longest_streak": user.stats["longest_streak"],
+            "last_streak_date": today
+        })
+
+    def _set_lives(self, user_id: str, user: LiveUser, lives_status: Dict[str, Any], publish: bool = True) -> None:
+        if "last_life_lost_at" in lives_status:
+            user.stats["lives"] = lives_status["lives"]
+            user.stats["last_life_lost_at"] = lives_status["last_life_lost_at"]
+        next_life_at = lives_status.get("next_life_at")
+        if next_life_at is not None:
+            self._wheel.schedule(user_id, next_life_at.timestamp())
+        else:
+            self._wheel.cancel(user_id)
+        if publish:
+            self.publish(user_id, "lives", self._lives_payload(lives_status))
+
+    @staticmethod
+    def _lives_payload(lives_status: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "current_lives": lives_status["current_lives"],
+            "next_life_at": lives_status.get("next_life_at"),
+            "seconds_to_next_life": lives_status.get("seconds_to_next_life")
+        }
+
+    async def _refill(self, user_id: str) -> None:
+        user = self._users.get(user_id)
+        if user is None or user.stats.get("last_life_lost_at") is None:
+            return
+        # Computed from the remembered stats: only the cached config is read
+        lives_status = await LivesService(get_supabase(), user.token).get_current_lives(user_id, stats_data={
+            "lives": user.stats["lives"],
+            "last_life_lost_at": user.stats["last_life_lost_at"]
+        })
+        if user_id in self._users:
+            self._set_lives(user_id, user, lives_status)
+
+
+# Process-wide event hub
+user_events = UserEventHub()
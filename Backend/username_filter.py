@@ -0,0 +1,200 @@
+"""
+Offensive-word filter for usernames.
+The lexicon is bundled in lexicon/ (curated from LDNOOBW) and compiled once into an
+Aho-Corasick automaton, so every blocked term, including one embedded in a longer
+username, is found in a single pass over the username with no network access.
+
+Usage:
+    python username_filter.py --check some_username
+    python username_filter.py --refresh     # replace lexicon/<lang>.txt with upstream LDNOOBW
+"""
+
+import argparse
+import logging
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Generic, Iterable, Iterator, List, Optional, Set, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+LEXICON_DIR = Path(__file__).resolve().parent / "lexicon"
+LEXICON_LANGUAGES = ("en", "es")
+LDNOOBW_URL = "https://raw.githubusercontent.com/LDNOOBW/List-of-Dirty-Naughty-Obscene-and-Otherwise-Bad-Words/master/{language}"
+
+# Shorter terms only match a whole username or a whole "_"-separated part of it
+SUBSTRING_MIN_LENGTH = 4
+# Terms that normalize to fewer characters are ignored
+MIN_TERM_LENGTH = 3
+
+# Digits commonly used in place of letters
+_LEET = str.maketrans("013457", "oieast")
+
+T = TypeVar("T")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents, undo leetspeak digits and keep only a-z."""
+    decomposed = unicodedata.normalize("NFKD", text.lower().translate(_LEET))
+    return "".join(c for c in decomposed if "a" <= c <= "z")
+
+
+class AhoCorasick(Generic[T]):
+    """
+    Multi-pattern matcher: finds every occurrence of every pattern in one pass.
+
+    Args:
+        patterns: (pattern, value) pairs; value is returned with each match
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, T]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # state -> (pattern length, value) for every pattern ending in that state
+        self._out: List[List[Tuple[int, T]]] = [[]]
+
+        for pattern, value in patterns:
+            state = 0
+            for char in pattern:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((len(pattern), value))
+
+        # Breadth-first so each failure target is complete before it is used
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, T]]:
+        """Yield (start, end, value) for every pattern occurrence in text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, value in out[state]:
+                yield end - length, end, value
+
+
+class UsernameFilter:
+    """
+    Finds offensive terms in usernames.
+
+    Args:
+        blocked: Offensive terms, matched anywhere in the username
+        whole_word: Terms only matched as the whole username or a whole "_" part
+        allowed: Harmless words; a blocked match inside one of them is ignored
+    """
+
+    def __init__(self, blocked: Iterable[str], whole_word: Iterable[str] = (), allowed: Iterable[str] = ()):
+        whole = {normalize(term) for term in whole_word}
+        terms = {normalize(term) for term in blocked} | whole
+        terms = {term for term in terms if len(term) >= MIN_TERM_LENGTH}
+
+        self.whole_words: Set[str] = {term for term in terms if term in whole or len(term) < SUBSTRING_MIN_LENGTH}
+        substring_terms = terms - self.whole_words
+        patterns: List[Tuple[str, Tuple[bool, str]]] = [(term, (True, term)) for term in substring_terms]
+        patterns += [(word, (False, word)) for word in {normalize(w) for w in allowed} if word]
+        self._automaton: AhoCorasick[Tuple[bool, str]] = AhoCorasick(patterns)
+        self.term_count = len(terms)
+
+    def find(self, username: str) -> Optional[str]:
+        """Return the first offensive term found in username, or None."""
+        parts = [normalize(part) for part in username.split("_")]
+        text = "".join(parts)
+        for part in parts + [text]:
+            if part in self.whole_words:
+                return part
+
+        blocked: List[Tuple[int, int, str]] = []
+        allowed: List[Tuple[int, int]] = []
+        for start, end, (is_blocked, term) in self._automaton.iter_matches(text):
+            if is_blocked:
+                blocked.append((start, end, term))
+            else:
+                allowed.append((start, end))
+
+        for start, end, term in blocked:
+            if not any(a_start <= start and end <= a_end for a_start, a_end in allowed):
+                return term
+        return None
+
+
+def _read_terms(path: Path) -> List[str]:
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def load_username_filter(directory: Path = LEXICON_DIR) -> UsernameFilter:
+    """Compile the bundled lexicon in directory into a UsernameFilter."""
+    blocked = [term for language in LEXICON_LANGUAGES for term in _read_terms(directory / f"{language}.txt")]
+    username_filter = UsernameFilter(
+        blocked,
+        whole_word=_read_terms(directory / "whole_word.txt"),
+        allowed=_read_terms(directory / "allow.txt")
+    )
+    logger.info("Username filter compiled: %d terms, %d automaton states", username_filter.term_count, len(username_filter._automaton))
+    return username_filter
+
+
+@lru_cache(maxsize=1)
+def get_username_filter() -> UsernameFilter:
+    """Return the process-wide username filter, compiling it on first use."""
+    return load_username_filter()
+
+
+def refresh_lexicon(directory: Path = LEXICON_DIR) -> None:
+    """Download the upstream LDNOOBW lists into directory/<language>.txt."""
+    import httpx
+
+    for language in LEXICON_LANGUAGES:
+        response = httpx.get(LDNOOBW_URL.format(language=language), timeout=30.0)
+        response.raise_for_status()
+        terms = sorted({line.strip() for line in response.text.splitlines() if line.strip()})
+        with open(directory / f"{language}.txt", "w", encoding="utf-8") as f:
+            f.write(
+                f"# Offensive terms ({language}) for username validation, one per line.\n"
+                f"# From the LDNOOBW list (https://github.com/LDNOOBW/List-of-Dirty-Naughty-Obscene-and-Otherwise-Bad-Words, CC BY 4.0).\n"
+                f"# Regenerate from upstream with: python username_filter.py --refresh\n"
+            )
+            f.writelines(f"{term}\n" for term in terms)
+        print(f"{language}: {len(terms)} terms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bundled offensive-word lexicon for usernames")
+    parser.add_argument("--refresh", action="store_true", help="Download the upstream LDNOOBW lists into lexicon/")
+    parser.add_argument("--check", nargs="+", metavar="USERNAME", help="Print the blocked term found in each username")
+    args = parser.parse_args()
+
+    if args.refresh:
+        refresh_lexicon()
+    if args.check:
+        username_filter = load_username_filter()
+        for username in args.check:
+            print(f"{username}: {username_filter.find(username) or 'ok'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+In-process index of taken usernames for the availability check.
+A Bloom filter of every lowercase username is built at warm-up (or by the first
+availability request), extended as profiles are created here and rebuilt every
+USERNAME_INDEX_REBUILD_SECONDS to pick up names taken through other workers, so
+a name that was never taken is answered without a database round trip. Possible
+hits are confirmed against the users table; the UNIQUE constraint stays
+authoritative.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Iterable, Optional
+
+from supabase import Client
+
+from query_filters import fetch_all
+
+logger = logging.getLogger(__name__)
+
+# Target false positive rate: the share of free names that still cost a lookup
+USERNAME_INDEX_ERROR_RATE = 0.01
+# Minimum capacity, and the headroom factor over the current user count
+USERNAME_INDEX_MIN_CAPACITY = 10_000
+USERNAME_INDEX_GROWTH = 2
+# Filters older than this are rebuilt from the users table
+USERNAME_INDEX_REBUILD_SECONDS = 60.0
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings: no false negatives, tunable false positives.
+
+    Args:
+        capacity: Number of items the filter is sized for
+        error_rate: False positive rate at capacity
+    """
+
+    def __init__(self, capacity: int, error_rate: float = USERNAME_INDEX_ERROR_RATE):
+        self.capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # Double hashing (Kirsch-Mitzenmacher): k positions from one 128-bit digest
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class UsernameIndex:
+    """Holds the Bloom filter of taken usernames for this process."""
+
+    def __init__(self):
+        self._filter: BloomFilter = BloomFilter(1)
+        self._ready = False
+        self._built_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def _stale(self) -> bool:
+        return (
+            not self._ready or self._built_at is None
+            or time.monotonic() - self._built_at > USERNAME_INDEX_REBUILD_SECONDS
+        )
+
+    async def ensure_loaded(self, supabase: Client, token: str) -> None:
+        """Build the filter from the users table unless a fresh one is already built."""
+        if not self._stale():
+            return
+        async with self._lock:
+            # Another request may have built it while we waited
+            if self._stale():
+                self._build(supabase, token)
+
+    def _build(self, supabase: Client, token: str) -> None:
+        """
+        Read every username and replace the filter.
+
+        Rows are read with the caller's token, so RLS limits them to active
+        accounts (and the caller's own): names held by suspended or deleted
+        accounts are not in the filter and report as available until
+        /users/create hits the UNIQUE constraint.
+        """
+        started = time.perf_counter()
+        usernames = [
+            row["username"].lower()
+            for row in fetch_all(lambda: supabase.postgrest.auth(token).from_("users").select("id, username"))
+            if row.get("username")
+        ]
+        bloom = BloomFilter(max(USERNAME_INDEX_MIN_CAPACITY, USERNAME_INDEX_GROWTH * len(usernames)))
+        for username in usernames:
+            bloom.add(username)
+        self._filter = bloom
+        self._ready = True
+        self._built_at = time.monotonic()
+        logger.info(
+            "Username index built: %d usernames, %d KiB, %d hashes in %.1f ms",
+            len(usernames), len(bloom._bits) // 1024, bloom.hash_count, (time.perf_counter() - started) * 1000
+        )
+
+    def add(self, username: str) -> None:
+        """Record a newly taken username."""
+        if not self._ready:
+            return
+        self._filter.add(username.lower())
+        if self._filter.count > self._filter.capacity:
+            # Past capacity the false positive rate climbs; resize on the next check
+            self._ready = False
+
+    def might_contain(self, username: str) -> bool:
+        """False only if username is certainly not taken; always True before the filter is built."""
+        return not self._ready or username.lower() in self._filter
+
+
+# Process-wide username index
+username_index = UsernameIndex()
@@ -2,13 +2,13 @@
 User management router for creating and managing user profiles.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Security
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Security
 from fastapi.security import HTTPAuthorizationCredentials
 from supabase import Client
 from gotrue.errors import AuthApiError
+from postgrest.exceptions import APIError
 import logging
 import re
-import httpx
 from typing import Optional, List, Set
 from datetime import time as Time
 
@@ -17,10 +17,12 @@ from models import (
     CreateUserRequest, CreateUserResponse,
     UpdateUserRequest, UpdateUserResponse, DeleteUserResponse,
     UserProfileData, UserProfileResponse, UserGamificationStats,
-    UserProfilePublic
+    UserProfilePublic, UsernameAvailabilityResponse
 )
 from middleware import get_current_user, security
 from lives_service import LivesService
+from username_filter import UsernameFilter, get_username_filter
+from username_index import username_index
 
 logger = logging.getLogger(__name__)
 
@@ -33,50 +35,13 @@ RESERVED_USERNAMES: Set[str] = {
     "api", "login"
 }
 
-# Cached offensive words list
-_offensive_words_cache: Optional[Set[str]] = None
-
-
-async def fetch_offensive_words() -> Set[str]:
-    """
-    Fetch the LDNOOBW (List of Dirty, Naughty, Obscene, and Otherwise Bad Words) list.
-    
-    Returns:
-        Set of offensive words in lowercase
-    """
-    global _offensive_words_cache
-    
-    # Return cached version if available
-    if _offensive_words_cache is not None:
-        return _offensive_words_cache
-    
-    try:
-        url = "https://raw.githubusercontent.com/LDNOOBW/List-of-Dirty-Naughty-Obscene-and-Otherwise-Bad-Words/master/en"
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            
-            # Parse the list (one word per line)
-            words = set(word.strip().lower() for word in response.text.split('\n') if word.strip())
-            _offensive_words_cache = words
-            
-            logger.info(f"Successfully loaded {len(words)} offensive words from LDNOOBW")
-            return words
-            
-    except Exception as e:
-        logger.warning(f"Failed to fetch LDNOOBW list: {str(e)}. Offensive word filtering will be disabled.")
-        # Fail-open: return empty set so validation continues
-        _offensive_words_cache = set()
-        return set()
-
-
-def validate_username(username: str, offensive_words: Set[str]) -> tuple[bool, Optional[str]]:
+def validate_username(username: str, username_filter: UsernameFilter) -> tuple[bool, Optional[str]]:
     """
     Validate username according to the specified rules.
     
     Args:
         username: The username to validate
-        offensive_words: Set of offensive words to check against
+        username_filter: Compiled offensive-word filter
         
     Returns:
         Tuple of (is_valid, error_message)
@@ -106,13 +71,63 @@ def validate_username(username: str, offensive_words: Set[str]) -> tuple[bool, O
     if username_lower in RESERVED_USERNAMES:
         return False, "This username is reserved and cannot be used"
     
-    # Check offensive words
-    if username_lower in offensive_words:
+    # Check offensive words, also embedded in the username
+    if username_filter.find(username_lower):
         return False, "This username contains inappropriate content"
     
     return True, None
 
 
+# Unique-violation messages for create_user, by constraint name
+UNIQUE_VIOLATION_MESSAGES = {
+    "users_pkey": "User profile already exists for this account",
+    "users_username_key": "Username is already taken",
+}
+
+
+@router.get("/availability", response_model=UsernameAvailabilityResponse)
+async def check_username_availability(
+    username: str = Query(..., description="Username to check"),
+    current_user = Depends(get_current_user),
+    supabase: Client = Depends(get_supabase),
+    credentials: HTTPAuthorizationCredentials = Security(security)
+):
+    """
+    Check whether a username is valid and not yet taken, e.g. while the user types.
+
+    Names that were never taken are answered from the in-process username index
+    without a database query; only possible matches are looked up. The answer is
+    advisory: /users/create still rejects a name taken in the meantime.
+    """
+    try:
+        is_valid, error_message = validate_username(username, get_username_filter())
+        if not is_valid:
+            return UsernameAvailabilityResponse(username=username, available=False, reason=error_message)
+
+        token = credentials.credentials
+        username_lower = username.lower()
+        await username_index.ensure_loaded(supabase, token)
+        if username_index.might_contain(username_lower):
+            existing = supabase.postgrest.auth(token).from_("users")\
+                .select("id")\
+                .eq("username", username_lower)\
+                .limit(1)\
+                .execute()
+            if existing.data:
+                return UsernameAvailabilityResponse(
+                    username=username, available=False, reason="Username is already taken"
+                )
+
+        return UsernameAvailabilityResponse(username=username, available=True)
+
+    except Exception as e:
+        logger.error("Error checking username availability: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to check username availability"
+        )
+
+
 @router.post("/create", response_model=CreateUserResponse, status_code=status.HTTP_201_CREATED)
 async def create_user(
     request: CreateUserRequest,
@@ -134,11 +149,8 @@ async def create_user(
     Email is automatically filled from the authenticated user's account.
     """
     try:
-        # Fetch offensive words list
-        offensive_words = await fetch_offensive_words()
-        
         # Validate username
-        is_valid, error_message = validate_username(request.username, offensive_words)
+        is_valid, error_message = validate_username(request.username, get_username_filter())
         if not is_valid:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -151,22 +163,6 @@ async def create_user(
         # Get email from authenticated user
         email = current_user.email
         
-        # Check if user already exists in the users table
-        existing_user = supabase.table("users").select("id").eq("id", current_user.id).execute()
-        if existing_user.data:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="User profile already exists for this account"
-            )
-        
-        # Check if username is already taken
-        existing_username = supabase.table("users").select("username").eq("username", username_lower).execute()
-        if existing_username.data:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Username is already taken"
-            )
-        
         # Prepare user data for insertion
         user_data = {
             "id": current_user.id,
@@ -188,8 +184,18 @@ async def create_user(
         if request.notification_preferences is not None:
             user_data["notification_preferences"] = request.notification_preferences
         
-        # Insert user into database
-        response = supabase.table("users").insert(user_data).execute()
+        # Insert user into database; the primary key and the UNIQUE username
+        # constraint reject an existing profile or a taken name atomically
+        try:
+            response = supabase.table("users").insert(user_data).execute()
+        except APIError as e:
+            if e.code != "23505":
+                raise
+            constraint = next((name for name in UNIQUE_VIOLATION_MESSAGES if name in (e.message or "")), None)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=UNIQUE_VIOLATION_MESSAGES.get(constraint, "User profile already exists")
+            )
         
         if not response.data:
             raise HTTPException(
@@ -199,6 +205,7 @@ async def create_user(
         
         # Get the created user data
         created_user = response.data[0]
+        username_index.add(created_user["username"])
         
         # Convert to response model
         user_profile = UserProfileData(
@@ -0,0 +1,108 @@
+"""
+Startup warm-up.
+Preloads the process-wide caches (username filter automaton, learning_path_config,
+catalog versions, the syllabus tree, the search index and the username index) so the first requests
+after a deploy do not pay cold-cache latency. /ready reports 503 until it is done.
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+from supabase import Client
+
+from config import settings
+from lives_service import get_learning_path_config
+from search_index import catalog_search
+from syllabus_tree import syllabus_tree_cache
+from username_filter import get_username_filter
+from username_index import username_index
+
+logger = logging.getLogger(__name__)
+
+# Pause between warm-up steps so requests queued meanwhile are served
+WARMUP_STEP_PAUSE_SECONDS = 0.01
+
+
+class WarmupState:
+    """Progress of the startup warm-up, as reported by /ready."""
+
+    def __init__(self):
+        self.ready = False
+        self.steps: Dict[str, str] = {}
+        self.duration_ms: Optional[float] = None
+
+    def mark_ready(self) -> None:
+        self.ready = True
+
+    def as_dict(self) -> Dict:
+        return {
+            "status": "ready" if self.ready else "warming_up",
+            "steps": self.steps,
+            "duration_ms": self.duration_ms,
+        }
+
+
+# Process-wide warm-up state
+warmup_state = WarmupState()
+
+
+async def _run_step(name: str, step: Callable[[], object]) -> None:
+    """Run one warm-up step; a failure is logged and left to the lazy path."""
+    started = time.perf_counter()
+    try:
+        result = step()
+        if inspect.isawaitable(result):
+            await result
+        warmup_state.steps[name] = "ok"
+        logger.info("Warm-up %s done in %.1f ms", name, (time.perf_counter() - started) * 1000)
+    except Exception as e:
+        warmup_state.steps[name] = f"failed: {e}"
+        logger.warning("Warm-up %s failed, it will load on first use: %s", name, e)
+    # Steps block the loop like any request does (the shared client is not thread safe:
+    # postgrest.auth() mutates its session headers), so let pending probes through in between
+    await asyncio.sleep(WARMUP_STEP_PAUSE_SECONDS)
+
+
+def _sign_in(supabase: Client) -> Optional[str]:
+    """Return an access token for the warm-up account, if one is configured."""
+    if not settings.warmup_email or not settings.warmup_password:
+        return None
+    response = supabase.auth.sign_in_with_password({
+        "email": settings.warmup_email,
+        "password": settings.warmup_password
+    })
+    return response.session.access_token if response.session else None
+
+
+async def warm_up(supabase: Client) -> None:
+    """
+    Preload the caches, then flip warmup_state to ready.
+
+    Every step is best effort: whatever fails is loaded lazily by the first request
+    that needs it, exactly as without a warm-up, and readiness is still reported.
+    """
+    started = time.perf_counter()
+    await _run_step("username_filter", get_username_filter)
+
+    token = None
+    try:
+        token = _sign_in(supabase)
+    except Exception as e:
+        logger.warning("Warm-up sign in failed: %s", e)
+
+    if token:
+        await _run_step("learning_path_config", lambda: get_learning_path_config(supabase, token))
+        await _run_step("syllabus_tree", lambda: syllabus_tree_cache.get(supabase, token))
+        await _run_step("search_index", lambda: catalog_search.ensure_fresh(supabase, token))
+        await _run_step("username_index", lambda: username_index.ensure_loaded(supabase, token))
+    else:
+        for name in ("learning_path_config", "syllabus_tree", "search_index", "username_index"):
+            warmup_state.steps[name] = "skipped"
+        logger.info("No warm-up account (WARMUP_EMAIL / WARMUP_PASSWORD), catalog caches load on first use")
+
+    warmup_state.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    warmup_state.mark_ready()
+    logger.info("Warm-up finished in %.1f ms, ready", warmup_state.duration_ms)
@@ -0,0 +1,47 @@
+-- ============================================================================
+-- KEYSET-PAGINATED ANSWERED QUESTIONS STATS
+-- ============================================================================
+-- Page-at-a-time variant of get_answered_questions_stats.
+-- Rows are ordered by question_id and resumed from the last question_id of the
+-- previous page, so each page is an index range scan regardless of how much
+-- history the user has.
+-- ============================================================================
+
+-- Composite index backing the (user_id, question_id) range scan
+CREATE INDEX IF NOT EXISTS idx_user_questions_history_user_question
+    ON public.user_questions_history(user_id, question_id);
+
+CREATE OR REPLACE FUNCTION get_answered_questions_stats_page(
+    p_user_id UUID,
+    p_after_question_id UUID DEFAULT NULL,
+    p_limit INTEGER DEFAULT 500
+)
+RETURNS TABLE (
+    question_id UUID,
+    total_attempts BIGINT,
+    correct_answers BIGINT
+)
+LANGUAGE plpgsql
+SECURITY INVOKER -- Use the caller's permissions (RLS will apply)
+SET search_path = public
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        uqh.question_id,
+        COUNT(*)::BIGINT as total_attempts,
+        COUNT(*) FILTER (WHERE uqh.correct = TRUE)::BIGINT as correct_answers
+    FROM user_questions_history uqh
+    WHERE uqh.user_id = p_user_id
+      AND (p_after_question_id IS NULL OR uqh.question_id > p_after_question_id)
+    GROUP BY uqh.question_id
+    ORDER BY uqh.question_id
+    LIMIT p_limit;
+END;
+$$;
+
+-- Grant execution permission to authenticated users
+GRANT EXECUTE ON FUNCTION get_answered_questions_stats_page(UUID, UUID, INTEGER) TO authenticated;
+
+-- Comments for documentation
+COMMENT ON FUNCTION get_answered_questions_stats_page IS 'Keyset-paginated aggregated statistics for questions answered by a specific user, ordered by question_id.';
@@ -0,0 +1,51 @@
+-- ============================================================================
+-- LEAGUE XP ON CORRECT ANSWER
+-- ============================================================================
+-- 35_fix_xp_trigger.sql dropped the league points update together with the
+-- league_points_this_week column, so weekly league XP was never recorded.
+-- Credit the reward to the user's row in the active league as well; the
+-- backend leaderboard ranks leagues by league_participants.xp_earned_this_week.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION fn_award_xp_on_correct_answer()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_xp_reward INTEGER;
+    v_today DATE := (now() AT TIME ZONE 'UTC')::date;
+BEGIN
+    -- Only award XP if the answer is correct
+    IF NEW.correct = true THEN
+        -- 1. Get the XP reward amount from configuration
+        SELECT config_value::INTEGER INTO v_xp_reward
+        FROM learning_path_config
+        WHERE config_key = 'xp_per_correct_answer';
+
+        -- Default to 10 if not found
+        IF v_xp_reward IS NULL THEN
+            v_xp_reward := 10;
+        END IF;
+
+        -- 2. Update user_gamification_stats
+        UPDATE user_gamification_stats
+        SET total_xp = total_xp + v_xp_reward,
+            updated_at = NOW()
+        WHERE user_id = NEW.user_id;
+
+        -- 3. Update daily_activity_log
+        -- (The log entry is ensured to exist by fn_log_activity_and_update_streak)
+        UPDATE daily_activity_log
+        SET xp_earned = xp_earned + v_xp_reward
+        WHERE user_id = NEW.user_id AND activity_date = v_today;
+
+        -- 4. Credit the week's XP in the user's active league
+        UPDATE league_participants lp
+        SET xp_earned_this_week = lp.xp_earned_this_week + v_xp_reward
+        FROM leagues l
+        WHERE lp.league_id = l.id
+          AND l.active = true
+          AND lp.user_id = NEW.user_id;
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
@@ -0,0 +1,31 @@
+-- ============================================================================
+-- WEEKLY LEAGUE ROLLOVER
+-- ============================================================================
+-- Bulk write of a week's final standings, used by Backend/league_rollover.py.
+-- The job ranks every league in memory and sends the results in chunks; each
+-- chunk is applied with a single set-based UPDATE instead of one per user.
+-- Called with the service role key.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION apply_league_results(p_results JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE league_participants lp
+    SET current_rank = r.current_rank,
+        promoted = r.promoted,
+        demoted = r.demoted
+    FROM jsonb_to_recordset(p_results)
+        AS r(id UUID, current_rank INTEGER, promoted BOOLEAN, demoted BOOLEAN)
+    WHERE lp.id = r.id;
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
+
+REVOKE EXECUTE ON FUNCTION apply_league_results(JSONB) FROM PUBLIC, anon, authenticated;
+
+-- Due leagues are looked up by active flag and end date
+CREATE INDEX IF NOT EXISTS idx_leagues_active_end_date ON leagues(active, end_date);
@@ -0,0 +1,32 @@
+-- ============================================================================
+-- LAST CHALLENGE ATTEMPTS
+-- ============================================================================
+-- The latest started_at per challenge template for one user, used by the
+-- backend to apply challenge_templates.cooldown_period. One row per template
+-- the user has tried, read through an index-only scan.
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_user_challenges_history_user_template_started
+    ON public.user_challenges_history(user_id, challenge_template_id, started_at DESC);
+
+CREATE OR REPLACE FUNCTION get_last_challenge_attempts(p_user_id UUID)
+RETURNS TABLE (
+    challenge_template_id UUID,
+    last_started_at TIMESTAMPTZ
+)
+LANGUAGE sql
+STABLE
+SECURITY INVOKER -- Use the caller's permissions (RLS will apply)
+SET search_path = public
+AS $$
+    SELECT uch.challenge_template_id, MAX(uch.started_at) AS last_started_at
+    FROM user_challenges_history uch
+    WHERE uch.user_id = p_user_id
+    GROUP BY uch.challenge_template_id;
+$$;
+
+-- Grant execution permission to authenticated users
+GRANT EXECUTE ON FUNCTION get_last_challenge_attempts(UUID) TO authenticated;
+
+-- Comments for documentation
+COMMENT ON FUNCTION get_last_challenge_attempts IS 'Latest challenge start per template for a specific user, for cooldown checks.';
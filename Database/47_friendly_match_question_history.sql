@@ -0,0 +1,21 @@
+-- ============================================================================
+-- FRIENDLY MATCH QUESTION HISTORY
+-- ============================================================================
+-- Link question attempts to friendly matches, as a third source next to
+-- sessions and challenges. The backend keeps a running match in memory and
+-- bulk-inserts each player's attempts when the match ends.
+-- ============================================================================
+
+ALTER TABLE user_questions_history
+ADD COLUMN IF NOT EXISTS friendly_match_id UUID REFERENCES friendly_matches(id) ON DELETE CASCADE;
+
+-- A question attempt belongs to exactly one of a session, a challenge or a match
+ALTER TABLE user_questions_history DROP CONSTRAINT IF EXISTS check_history_source;
+
+ALTER TABLE user_questions_history
+ADD CONSTRAINT check_history_source CHECK (
+    num_nonnulls(user_session_history_id, user_challenges_history_id, friendly_match_id) = 1
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_questions_history_friendly_match_id
+    ON public.user_questions_history(friendly_match_id);
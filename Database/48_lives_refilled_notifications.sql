@@ -0,0 +1,22 @@
+-- ============================================================================
+-- LIVES REFILLED NOTIFICATIONS
+-- ============================================================================
+-- The backend's gamification scheduler notifies users when their lives refill
+-- (back from zero, or full again) and before their streak lapses.
+-- ============================================================================
+
+ALTER TABLE notifications DROP CONSTRAINT IF EXISTS notifications_type_check;
+
+ALTER TABLE notifications
+ADD CONSTRAINT notifications_type_check CHECK (type IN (
+    'streak_reminder',
+    'friend_request',
+    'league_update',
+    'achievement_unlock',
+    'match_challenge',
+    'level_up',
+    'match_result',
+    'promotion',
+    'demotion',
+    'lives_refilled'
+));
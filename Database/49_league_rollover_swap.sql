@@ -0,0 +1,42 @@
+-- ============================================================================
+-- WEEKLY LEAGUE ROLLOVER: ATOMIC SWAP
+-- ============================================================================
+-- Backend/league_rollover.py writes next week's leagues inactive and then swaps
+-- them in. The swap deactivates every league that ended by the week start and
+-- activates every league starting then in one statement, so an interrupted run
+-- never leaves a week half switched over. A run interrupted before the swap
+-- leaves inactive leagues behind; the next run discards them before writing
+-- its own. Called with the service role key.
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION swap_league_week(p_week_start TIMESTAMPTZ)
+RETURNS INTEGER AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE leagues
+    SET active = (start_date = p_week_start)
+    WHERE (active AND end_date <= p_week_start)
+       OR (NOT active AND start_date = p_week_start);
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Leftovers of an interrupted run; their participant rows go with them (ON DELETE CASCADE)
+CREATE OR REPLACE FUNCTION discard_pending_leagues(p_week_start TIMESTAMPTZ)
+RETURNS INTEGER AS $$
+DECLARE
+    v_deleted INTEGER;
+BEGIN
+    DELETE FROM leagues
+    WHERE NOT active AND start_date = p_week_start;
+
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+    RETURN v_deleted;
+END;
+$$ LANGUAGE plpgsql;
+
+REVOKE EXECUTE ON FUNCTION swap_league_week(TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION discard_pending_leagues(TIMESTAMPTZ) FROM PUBLIC, anon, authenticated;
@@ -0,0 +1,15 @@
+-- ============================================================================
+-- FRIENDLY MATCH STATUS
+-- ============================================================================
+-- A match is set to in_progress when both players have connected, and the
+-- backend only loads pending matches, so a match is played (and its answers
+-- written) at most once. A match that ends because a player did not come back
+-- is stored as abandoned rather than completed.
+-- ============================================================================
+
+ALTER TABLE friendly_matches DROP CONSTRAINT IF EXISTS friendly_matches_status_check;
+
+ALTER TABLE friendly_matches
+ADD CONSTRAINT friendly_matches_status_check CHECK (
+    status IN ('pending', 'in_progress', 'completed', 'abandoned', 'declined')
+);